@@ -0,0 +1,165 @@
+"""
+Admission control for the API, so bursts of expensive requests cannot take
+every worker away from cheap reads.
+
+Each route belongs to a class in ADMISSION_CLASSES (see ADMISSION_ROUTES).
+Every class has a concurrency limit, a bounded FIFO wait queue and a
+maximum wait. A request over the limit waits in its class's queue. It is
+turned away immediately with 429 and Retry-After when that queue is full,
+or with 429 when its wait runs out. Classes are also ranked: a class only
+starts a request while no higher-priority class has requests waiting, so
+queued reads go ahead of queued scrapes and retrains.
+
+Queue depth, active requests, wait time and rejections per class are
+exported through metrics.py. Set ADMISSION_ENABLED=0 to turn it off.
+"""
+import itertools
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from flask import g, jsonify, request
+
+from config import ADMISSION_CLASSES, ADMISSION_ROUTES, ADMISSION_EXEMPT
+from metrics import inc, observe, set_gauge
+
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', '1') == '1'
+
+
+class Rejected(Exception):
+    """The request was not admitted; retry_after is a hint in seconds."""
+
+    def __init__(self, name, reason, retry_after):
+        super().__init__(f"{name} requests are over capacity ({reason})")
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Class:
+    def __init__(self, name, priority, limit, queue, timeout):
+        self.name = name
+        self.priority = priority
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = deque()  # tickets, oldest first
+        self.service_seconds = None  # moving average of admitted request durations
+
+
+class AdmissionController:
+    """Per-class concurrency limits with bounded, priority-ordered wait queues."""
+
+    def __init__(self, classes=ADMISSION_CLASSES, routes=ADMISSION_ROUTES):
+        self.classes = {name: _Class(name, *settings) for name, settings in classes.items()}
+        self.routes = dict(routes)
+        self.condition = threading.Condition()
+        self.tickets = itertools.count()
+
+    def class_for(self, rule):
+        return self.routes.get(rule, 'read')
+
+    def _higher_waiting(self, cls):
+        return any(other.waiting for other in self.classes.values() if other.priority < cls.priority)
+
+    def _can_start(self, cls, ticket):
+        if cls.active >= cls.limit or cls.waiting[0] != ticket:
+            return False
+        return not self._higher_waiting(cls)
+
+    def _retry_after(self, cls):
+        """Seconds until a slot is likely free: the queue ahead of us at the observed service rate."""
+        per_request = cls.service_seconds or 1.0
+        return max(1, math.ceil(per_request * (len(cls.waiting) + 1) / cls.limit))
+
+    def _publish(self, cls):
+        set_gauge('viralyze_admission_active', cls.active, 'Requests running per admission class.',
+                  admission_class=cls.name)
+        set_gauge('viralyze_admission_queue_depth', len(cls.waiting), 'Requests waiting per admission class.',
+                  admission_class=cls.name)
+
+    def acquire(self, name):
+        """Block until the request may run. Raises Rejected when the queue is full or the wait runs out."""
+        cls = self.classes[name]
+        started = time.monotonic()
+        with self.condition:
+            # The queue bound only applies to requests that would have to wait
+            immediate = cls.active < cls.limit and not cls.waiting and not self._higher_waiting(cls)
+            if not immediate and len(cls.waiting) >= cls.queue:
+                self._reject(cls, 'queue_full')
+            ticket = next(self.tickets)
+            cls.waiting.append(ticket)
+            self._publish(cls)
+            deadline = started + cls.timeout
+            try:
+                while not self._can_start(cls, ticket):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject(cls, 'timeout')
+                    self.condition.wait(remaining)
+            finally:
+                cls.waiting.remove(ticket)
+                # Whoever is now first in line (here or in a lower class) may be able to start
+                self.condition.notify_all()
+            cls.active += 1
+            self._publish(cls)
+        observe('viralyze_admission_wait_seconds', time.monotonic() - started,
+                'Time requests spent queued before running.', admission_class=name)
+        return time.monotonic()
+
+    def release(self, name, admitted_at):
+        cls = self.classes[name]
+        elapsed = time.monotonic() - admitted_at
+        with self.condition:
+            cls.active -= 1
+            cls.service_seconds = elapsed if cls.service_seconds is None else \
+                0.8 * cls.service_seconds + 0.2 * elapsed
+            self._publish(cls)
+            self.condition.notify_all()
+
+    def _reject(self, cls, reason):
+        inc('viralyze_admission_rejected_total', help_text='Requests turned away with 429.',
+            admission_class=cls.name, reason=reason)
+        raise Rejected(cls.name, reason, self._retry_after(cls))
+
+    def status(self):
+        with self.condition:
+            return {cls.name: {'active': cls.active, 'limit': cls.limit, 'waiting': len(cls.waiting),
+                               'queue': cls.queue, 'priority': cls.priority,
+                               'service_seconds': round(cls.service_seconds or 0, 3)}
+                    for cls in self.classes.values()}
+
+
+controller = AdmissionController()
+
+
+def admit():
+    rule = request.url_rule.rule if request.url_rule else None
+    if rule is None or rule in ADMISSION_EXEMPT or request.method == 'OPTIONS':
+        return None
+    name = controller.class_for(rule)
+    try:
+        g.admission = (name, controller.acquire(name))
+    except Rejected as e:
+        response = jsonify({'error': str(e), 'retryAfter': e.retry_after})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    return None
+
+
+def release(exc):
+    admission = g.pop('admission', None)
+    if admission:
+        controller.release(*admission)
+
+
+def init_app(app):
+    """Register the admission hooks unless ADMISSION_ENABLED=0."""
+    if not ADMISSION_ENABLED:
+        return
+    app.before_request(admit)
+    app.teardown_request(release)
@@ -1,22 +1,40 @@
 import os
-import joblib
+import time
 import logging
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, g, Response, send_from_directory, send_file
 from flask_cors import CORS
 from datetime import datetime
 from pathlib import Path
 
-from config import LOCAL_DATA_DIR, LOCAL_MODEL_DIR, LOCAL_PROFILE_DIR
-from predict_like import extract_features, predict_likes
+from config import LOCAL_DATA_DIR, LOCAL_MODEL_DIR, LOCAL_PROFILE_DIR, REQUEST_PROFILE_DIR, MEDIA_MAX_AGE_SECONDS, MEDIA_PROFILE_MAX_AGE_SECONDS, COMPARE_MAX_PROFILES, SCHEDULE_MAX_DAYS, SCHEDULE_MAX_POSTS, TUNE_REQUEST_TIME_BUDGET_SECONDS, TUNE_REQUEST_WORKERS
+from predict_like import extract_features, predict_likes, profile_features
 from utils import load_data, download_data_from_server
-from retrain_model import main as retrain_the_model, prepare_data, train_model
+from retrain_model import main as retrain_the_model, main_corpus as retrain_corpus_model, update_model, prepare_data, train_model
 from scraper import scrape_user_data, store_posts_into_json, scrape_using_apify
+from refresh_scheduler import RefreshScheduler
+from hashtag_index import HashtagIndex
+from viral import ViralIndex
+import schedule_optimizer
+from snapshot import restore_snapshot
+from profile_index import get_index, SORT_COLUMNS
+from profile_layout import profile_path
+from feature_store import get_store, compare_profiles
+from caption_features import draft_caption_features
+from downsample import BUCKETS
+from model_registry import ModelWatcher, MODEL_PATH, publish_model, read_pointer
+from media_cache import MediaCache, MediaError, PROFILE_PICTURES
+import metrics
+import request_profiler
+import admission
+from fast_json import FastJSONProvider, compress_response
 import hashlib
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
 
-model, feature_names = None, None
+# Current model, reloaded in the background when another worker publishes a new version
+model_watcher = ModelWatcher()
 
 # Configure logging for production
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s' )
@@ -33,18 +51,80 @@ try:
     LOCAL_DATA_DIR.mkdir(parents=True, exist_ok=True)
     
     # Check if the model file exists
-    if not (LOCAL_MODEL_DIR / 'likes_predictor.joblib').exists():
+    if not MODEL_PATH.exists():
         # raise FileNotFoundError("Model file not found. Please train the model first.")
         retrain_the_model()
-    # Load the model and feature names from the joblib file
-    model_data_path = LOCAL_MODEL_DIR / 'likes_predictor.joblib'
-    model_data = joblib.load(model_data_path)
-    model = model_data['model']
-    feature_names = model_data['feature_names']
-    print("💫 Model and feature names loaded successfully.")
+    elif read_pointer() is None:
+        # Model from before versioning: publish it as the first version
+        publish_model()
+    # Load the published version the pointer file names
+    model_watcher.reload()
+    if model_watcher.state[0] is None:
+        raise FileNotFoundError(MODEL_PATH)
 except FileNotFoundError:
     print("Error: app.py 'likes_predictor.joblib' not found. Please train the model first.")
 
+# Per-route request metrics, exposed on /metrics
+@app.before_request
+def start_request_metrics():
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_started = time.perf_counter()
+    metrics.add_gauge('viralyze_http_requests_in_flight', 1, 'Requests currently being handled.',
+                      route=g.metrics_route)
+
+
+@app.after_request
+def count_request(response):
+    metrics.inc('viralyze_http_requests_total', help_text='Requests by route, method and status.',
+                route=g.get('metrics_route', 'unmatched'), method=request.method, status=response.status_code)
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if 'metrics_started' not in g:
+        return
+    metrics.add_gauge('viralyze_http_requests_in_flight', -1, route=g.metrics_route)
+    metrics.observe('viralyze_http_request_duration_seconds', time.perf_counter() - g.metrics_started,
+                    help_text='Request latency by route.', route=g.metrics_route)
+
+
+# Negotiated gzip/brotli for large JSON and text responses
+@app.after_request
+def compress(response):
+    return compress_response(response, request.accept_encodings)
+
+
+# Opt-in request profiling (PROFILING_ENABLED=1); no hooks are registered otherwise
+request_profiler.init_app(app)
+
+# Concurrency limits and bounded queues per route class; over capacity answers 429 (ADMISSION_ENABLED=0 disables)
+admission.init_app(app)
+
+
+def is_admin():
+    """Admin endpoints need an X-Admin-Key header matching the ADMIN_KEY env var."""
+    admin_key = os.getenv('ADMIN_KEY')
+    return bool(admin_key) and request.headers.get('X-Admin-Key') == admin_key
+
+
+# Cross-profile hashtag index, refreshed incrementally from LOCAL_PROFILE_DIR
+hashtag_index = HashtagIndex()
+
+# Breakout posts per profile, re-scored when a profile's posts.json changes
+viral_index = ViralIndex()
+
+# SQLite summary of all profiles for leaderboards and search
+profile_index = get_index()
+
+# Post and profile pictures, fetched once and served from disk
+media_cache = MediaCache()
+
+# Background refresh of tracked profiles (opt-in; every worker starts one, only the lock holder dispatches)
+refresh_scheduler = RefreshScheduler()
+if os.getenv('REFRESH_SCHEDULER_ENABLED') == '1':
+    refresh_scheduler.start()
+
 
 # API endpoint for the API details
 @app.route('/', methods=['GET']) # ⭐
@@ -67,26 +147,33 @@ def index():
             {
                 'method': 'GET, POST',
                 'endpoint': '/api/stats',
-                'description': 'Fetches statistics and engagement trends.',
+                'description': 'Fetches statistics and engagement trends. bucket and max_points are optional.',
                 'example_payload': {
-                    "username": "<username>"
+                    "username": "<username>",
+                    "bucket": "day | week | month",
+                    "max_points": 200
                 }
             },
             {
                 'method': 'POST',
                 'endpoint': '/api/predict/likes',
-                'description': 'Predicts the number of likes based on hour and day.',
+                'description': 'Predicts the number of likes based on hour and day. Followers, posts_count and a draft caption are optional; without a caption a typical one is assumed.',
                 'example_payload': {
                     "hour": 12,
-                    "day": "Monday"
+                    "day": "Monday",
+                    "caption": "finally it's that time of the year #mango #summer",
+                    "followers": 100000
                 }
             },
             {
                 'method': 'POST',
                 'endpoint': '/api/retrain',
-                'description': 'Retrains the model with new data.',
+                'description': 'Retrains the model on one user\'s posts, or on every local profile with "corpus": true. "incremental": true only boosts on posts newer than the model, "tune": true searches hyperparameters first.',
                 'example_payload': {
-                    "username": "<username>"
+                    "username": "<username>",
+                    "corpus": False,
+                    "incremental": False,
+                    "tune": False
                 }
             },
             {
@@ -114,35 +201,170 @@ def index():
             {
                 'method': 'POST',
                 'endpoint': '/api/download_data/<key>',
-                'description': 'Downloads data from the server.',
+                'description': 'Downloads data from the server. With {"snapshot": true} the latest snapshot archive is restored instead (see snapshot.py).',
+            },
+            {
+                'method': 'GET',
+                'endpoint': '/metrics',
+                'description': 'Request, dependency and cache metrics in the Prometheus text format.'
+            },
+            {
+                'method': 'GET',
+                'endpoint': '/api/admin/profiles',
+                'description': 'Lists recent request profiling reports (requires X-Admin-Key).'
+            },
+            {
+                'method': 'GET',
+                'endpoint': '/api/admin/admission',
+                'description': 'Shows active and queued requests per admission class (requires X-Admin-Key).'
+            },
+            {
+                'method': 'GET',
+                'endpoint': '/api/admin/profiles/<file_name>',
+                'description': 'Downloads a request profiling report (requires X-Admin-Key).'
+            },
+            {
+                'method': 'GET',
+                'endpoint': '/api/refresh/status',
+                'description': 'Returns refresh queue depth, lag and remaining scrape budget.'
+            },
+            {
+                'method': 'GET',
+                'endpoint': '/api/hashtags/<tag>',
+                'description': 'Usage count, average engagement and top posts for a hashtag across all profiles.'
+            },
+            {
+                'method': 'GET',
+                'endpoint': '/api/hashtags/top',
+                'description': 'Top hashtags across all profiles.',
+                'example_payload': {
+                    "limit": 20,
+                    "sort": "usage_count | avg_likes | avg_comments",
+                    "min_count": 1
+                }
+            },
+            {
+                'method': 'GET',
+                'endpoint': '/api/profiles',
+                'description': 'Search and rank indexed profiles, paginated.',
+                'example_payload': {
+                    "sort": "followers | engagement_rate | avg_likes | ... | username",
+                    "order": "desc",
+                    "q": "username prefix",
+                    "min_followers": 1000,
+                    "verified": 1,
+                    "limit": 20,
+                    "offset": 0
+                }
+            },
+            {
+                'method': 'GET',
+                'endpoint': '/api/media/<username>/<post_id>',
+                'description': 'Cached post image; post_id "profile" or "profile_hd" for the profile picture. Optional w (150, 320, 640) for a thumbnail.'
+            },
+            {
+                'method': 'GET',
+                'endpoint': '/api/profiles/<username>',
+                'description': 'Indexed summary (followers, averages, engagement rate) for one profile.'
+            },
+            {
+                'method': 'POST',
+                'endpoint': '/api/stats/compare',
+                'description': 'Side-by-side metrics for up to 50 profiles, with engagement trends aligned on one timeline.',
+                'example_payload': {
+                    "usernames": ["swiggyindia", "zomato"],
+                    "bucket": "day | week | month"
+                }
+            },
+            {
+                'method': 'GET',
+                'endpoint': '/api/viral',
+                'description': 'Breakout posts across all profiles, ranked by likes or comments vs. the trailing median. Query: limit, since, min_score.'
+            },
+            {
+                'method': 'GET',
+                'endpoint': '/api/viral/<username>',
+                'description': 'Breakout posts for one profile, newest first.'
+            },
+            {
+                'method': 'POST',
+                'endpoint': '/api/schedule/optimize',
+                'description': 'Best UTC posting times for the next N posts in a date range, at least min_gap_hours apart and outside blocked_hours.',
+                'example_payload': {
+                    "start": "2025-03-01",
+                    "end": "2025-03-15",
+                    "posts": 5,
+                    "min_gap_hours": 24,
+                    "blocked_hours": [0, 1, 2, 3, 4, 5],
+                    "username": "<username>",
+                    "caption": "optional draft caption"
+                }
             }
             
         ]
     }), 200
 
+@app.route('/api/stats/compare', methods=['POST'])
+def compare_stats():
+    """Compare several profiles: headline metrics plus engagement trends on a shared timeline."""
+    data = request.get_json() or {}
+    usernames = data.get('usernames')
+    bucket = data.get('bucket', 'week')
+    if not isinstance(usernames, list) or not usernames or not all(isinstance(u, str) for u in usernames):
+        return jsonify({'error': 'usernames must be a non-empty list of strings'}), 400
+    usernames = list(dict.fromkeys(usernames))
+    if len(usernames) > COMPARE_MAX_PROFILES:
+        return jsonify({'error': f'At most {COMPARE_MAX_PROFILES} usernames can be compared at once'}), 400
+    if bucket not in BUCKETS:
+        return jsonify({'error': f'Unsupported bucket: {bucket}'}), 400
+
+    try:
+        timeline, profiles, missing = compare_profiles(usernames, bucket)
+        if not profiles:
+            return jsonify({'error': 'Data not found', 'missing': missing}), 404
+        return jsonify({'bucket': bucket, 'timeline': timeline, 'profiles': profiles, 'missing': missing}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 # API endpoint for stats
 @app.route('/api/stats', methods=['GET', 'POST']) # ⭐
 def get_stats():
+    # Optional trend shaping: bucket (day/week/month) and max_points (LTTB downsampling)
+    options = request.get_json() if request.method == 'POST' else request.args
+    bucket = options.get('bucket')
+    max_points = options.get('max_points')
+    if bucket and bucket not in BUCKETS:
+        return jsonify({'error': f'Unsupported bucket: {bucket}'}), 400
+    try:
+        max_points = int(max_points) if max_points else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'max_points must be an integer'}), 400
+    if max_points is not None and max_points < 3:
+        return jsonify({'error': 'max_points must be at least 3'}), 400
+
     if request.method == 'POST':
-        # Handle POST request to update the data
-        data = request.get_json()
-        username = data['username']
-        username_data_path = LOCAL_PROFILE_DIR / f"{username}/posts.json"
-        data = load_data(username_data_path)
+        # Handle POST request: read the profile's feature store
+        username = options['username']
+        username_data_path = profile_path(username, 'posts.json')
+        if not username_data_path.exists():
+            return jsonify({'error': 'Data not found'}), 404
+        result = get_store(username).stats(bucket, max_points)
     else:
         # Handle GET request to load the data
         username_data_path =  'swiggyindia_posts.json'
         data = load_data(username_data_path)
+        result = extract_features(data, bucket, max_points) if data else None
 
-    if not data:
+    if not result:
         return jsonify({'error': 'Data not found'}), 404
 
-    # Extract features and calculate statistics
-    stats, best_time, best_day, top_post, engagement_trend = extract_features(data)
+    # Statistics computed from the feature columns and hour x day aggregates
+    stats, best_time, best_day, top_post, engagement_trend = result
     
     return jsonify({
         'stats': stats,
-        'bestTime': int(best_time),
+        'bestTime': best_time,
         'bestDay': best_day,
         'topPost': top_post,
         'engagementTrend': engagement_trend
@@ -153,7 +375,9 @@ def get_stats():
 def predict():
     """
     Predict the number of likes based on hour and day of the week.
-    Expects a JSON payload with 'hour' (0-23) and 'day' (e.g., 'Monday').
+    Expects a JSON payload with 'hour' (0-23) and 'day' (e.g., 'Monday'),
+    and optionally a draft 'caption'. Without 'caption' the prediction is
+    for a typical caption of the training data, as before caption features.
     Returns the predicted number of likes.
     e.g. {
         "hour": '12',
@@ -171,36 +395,110 @@ def predict():
         if not (0 <= hour <= 23):
             return jsonify({'error': 'Hour must be between 0 and 23'}), 400
 
+        # Optional profile context for the corpus model
+        extra_features = {}
+        if 'followers' in data:
+            extra_features.update(profile_features(int(data['followers']), int(data.get('posts_count', 0))))
+        # A draft caption (even an empty one) opts in to the caption/hashtag features;
+        # without one the prediction assumes the model's typical caption
+        model, feature_names, model_version = model_watcher.current()
+        if 'caption' in data:
+            extra_features.update(draft_caption_features(str(data['caption'] or '')))
+        else:
+            extra_features.update(model_watcher.caption_defaults)
+
         # Make prediction
-        predicted_likes = predict_likes(model, feature_names, hour, day_of_week)
-        return jsonify({'predictedLikes': predicted_likes})
+        predicted_likes = predict_likes(model, feature_names, hour, day_of_week, extra_features)
+        return jsonify({'predictedLikes': predicted_likes, 'modelVersion': model_version})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/schedule/optimize', methods=['POST'])
+def optimize_schedule():
+    """
+    Pick the best posting slots in a date range with the served model.
+    Optional username (or followers/posts_count) and caption add the same
+    context /api/predict/likes accepts.
+    """
+    try:
+        data = request.get_json() or {}
+        start, end = schedule_optimizer.parse_range(data.get('start'), data.get('end'))
+        posts = int(data.get('posts', 3))
+        min_gap_hours = float(data.get('min_gap_hours', 24))
+        blocked_hours = [int(hour) for hour in data.get('blocked_hours') or []]
+        followers = int(data['followers']) if 'followers' in data else None
+        posts_count = int(data.get('posts_count', 0))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if end <= start:
+        return jsonify({'error': 'end must be after start'}), 400
+    if (end - start).days > SCHEDULE_MAX_DAYS:
+        return jsonify({'error': f'The range can span at most {SCHEDULE_MAX_DAYS} days'}), 400
+    if not 1 <= posts <= SCHEDULE_MAX_POSTS:
+        return jsonify({'error': f'posts must be between 1 and {SCHEDULE_MAX_POSTS}'}), 400
+    if min_gap_hours < 0 or not all(0 <= hour <= 23 for hour in blocked_hours):
+        return jsonify({'error': 'min_gap_hours must be >= 0 and blocked_hours between 0 and 23'}), 400
+    if (followers is not None and followers < 0) or posts_count < 0:
+        return jsonify({'error': 'followers and posts_count must be >= 0'}), 400
+
+    try:
+        extra_features = {}
+        if followers is not None:
+            extra_features.update(profile_features(followers, posts_count))
+        elif data.get('username'):
+            summary = get_index().get(data['username'])
+            if summary and summary['followers'] is not None:
+                extra_features.update(profile_features(summary['followers'], summary['posts_count'] or 0))
+        model, feature_names, model_version = model_watcher.current()
+        if 'caption' in data:
+            extra_features.update(draft_caption_features(str(data['caption'] or '')))
+        else:
+            extra_features.update(model_watcher.caption_defaults)
+        if model is None:
+            return jsonify({'error': 'Model not trained.'}), 503
+        schedule, candidates = schedule_optimizer.optimize(model, feature_names, start, end, posts, min_gap_hours,
+                                                           blocked_hours, extra_features)
+        return jsonify({
+            'schedule': schedule,
+            'totalPredictedLikes': sum(slot['predictedLikes'] for slot in schedule),
+            'requested': posts,
+            'candidates': candidates,
+            'modelVersion': model_version,
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/retrain', methods=['POST'])
 def retrain_model():
-    global model
-    global feature_names    
     try:
         # Load and prepare new data
         data = request.get_json()
-        username = data['username']
-        username_data_path = LOCAL_PROFILE_DIR / f"{username}/posts.json"
-        print(f"Loading posts.json from: {username_data_path}")
-
-        new_model, feature_names = retrain_the_model(username_data_path)
+        if data.get('corpus'):
+            # Global model over every profile under LOCAL_PROFILE_DIR
+            new_model, feature_names = retrain_corpus_model()
+        else:
+            username = data['username']
+            username_data_path = profile_path(username, 'posts.json')
+            print(f"Loading posts.json from: {username_data_path}")
+
+            if data.get('incremental'):
+                # Warm-start from the saved booster with posts newer than its watermark
+                new_model, feature_names = update_model(username_data_path)
+            else:
+                # "tune": true runs a hyperparameter search first and saves the result; the
+                # search runs in this request, so it gets a short budget and few workers
+                # (tune_model.py from the command line for a full search)
+                new_model, feature_names = retrain_the_model(
+                    username_data_path, tune=bool(data.get('tune')),
+                    tune_options={'time_budget': TUNE_REQUEST_TIME_BUDGET_SECONDS, 'workers': TUNE_REQUEST_WORKERS})
 
         if new_model:
-            # Save the new model and feature names
-            LOCAL_MODEL_DIR.mkdir(parents=True, exist_ok=True)
-            model_path = LOCAL_MODEL_DIR / 'likes_predictor.joblib'
-            joblib.dump({'model': new_model, 'feature_names': feature_names}, model_path)
-            print(f"Model saved to {model_path}")
-            # Update the global model and feature names
-            model = new_model
-            feature_names = feature_names
-
-            return jsonify({'message': 'Model retrained and updated successfully.'}), 200
+            # The retrain functions save and publish the model themselves; other
+            # workers pick up the new version from the pointer file
+            _, _, model_version = model_watcher.reload()
+            return jsonify({'message': 'Model retrained and updated successfully.',
+                            'modelVersion': model_version}), 200
         else:
             return jsonify({'error': 'Model retraining failed.'}), 500
 
@@ -216,7 +514,7 @@ def scrape_user(username):
     Expects a username in the URL path.
     """
     try:
-        if os.path.exists(os.path.join(str(LOCAL_PROFILE_DIR), username, 'profile.json')) or os.path.exists(os.path.join(str(LOCAL_PROFILE_DIR), username, 'posts.json')):
+        if profile_path(username, 'profile.json').exists() or profile_path(username, 'posts.json').exists():
             return jsonify({'message': f'Scraping data for {username} exists .'}), 200
         # Assuming you have a function to scrape user data
         # posts = scrape_user_data(username)  # Implement this function in your scraper module
@@ -225,6 +523,8 @@ def scrape_user(username):
 
         if not status:
             return jsonify({'error': 'Failed to save posts.'}), 500
+        hashtag_index.update_profile(username)
+        viral_index.update_profile(username)
         # Return success message
         return jsonify({'message': f'Scraping data for {username} completed successfully.',
         "posts":data_posts}), 200
@@ -240,7 +540,7 @@ def get_profile(username):
     """
     try:
         # Load user data from the JSON file
-        user_data_path = LOCAL_PROFILE_DIR / f"{username}/profile.json"
+        user_data_path = profile_path(username, 'profile.json')
         data = load_data(user_data_path)
 
         if not data:
@@ -260,7 +560,7 @@ def get_posts(username):
     """
     try:
         # Load user data from the JSON file
-        posts_data_path = LOCAL_PROFILE_DIR / f"{username}/posts.json"
+        posts_data_path = profile_path(username, 'posts.json')
         data = load_data(posts_data_path)
 
         if not data:
@@ -271,6 +571,24 @@ def get_posts(username):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/media/<username>/<post_id>', methods=['GET'])
+def get_media(username, post_id):
+    """
+    Serve a post image (or 'profile'/'profile_hd') from the disk cache.
+    Query params: w (thumbnail width).
+    """
+    try:
+        path, etag, content_type = media_cache.get(username, post_id, request.args.get('w', type=int))
+        profile_picture = post_id in PROFILE_PICTURES
+        response = send_file(path, mimetype=content_type, etag=etag, conditional=True,
+                             max_age=MEDIA_PROFILE_MAX_AGE_SECONDS if profile_picture else MEDIA_MAX_AGE_SECONDS)
+        response.cache_control.immutable = not profile_picture
+        return response
+    except MediaError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/download_data/<key>', methods=['POST']) # ⭐
 def download_data(key):
     """
@@ -282,6 +600,11 @@ def download_data(key):
         if provided_hashed_key != 'b304a8f82c0e013c62e3103de303a1ed96e0398a3bb036381a8dd862eb241212':
             return jsonify({'error': f'Invalid key: {key}'}), 403
     try:
+        # {"snapshot": true} restores the latest single-archive snapshot instead of syncing file by file
+        if (request.get_json(silent=True) or {}).get('snapshot'):
+            summary = restore_snapshot()
+            return jsonify({'message': 'Snapshot restored successfully.', **summary}), 200
+
         # Assuming you have a function to download data
         # Implement this function in your utils module
         status = download_data_from_server()
@@ -294,6 +617,176 @@ def download_data(key):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/refresh/status', methods=['GET'])
+def refresh_status():
+    """
+    Report the refresh scheduler's queue depth, lag and budget.
+    """
+    try:
+        if not refresh_scheduler.queue:
+            refresh_scheduler.rebuild_queue()
+        return jsonify(refresh_scheduler.status()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/hashtags/top', methods=['GET'])
+def top_hashtags():
+    """
+    Rank hashtags across all profiles.
+    Query params: limit (default 20), sort (usage_count, avg_likes, avg_comments), min_count (default 1).
+    """
+    try:
+        limit = int(request.args.get('limit', 20))
+        sort = request.args.get('sort', 'usage_count')
+        min_count = int(request.args.get('min_count', 1))
+        if sort not in ('usage_count', 'avg_likes', 'avg_comments'):
+            return jsonify({'error': f'Unsupported sort: {sort}'}), 400
+        hashtag_index.refresh()
+        return jsonify({'hashtags': hashtag_index.top(limit, sort, min_count)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/hashtags/<tag>', methods=['GET'])
+def get_hashtag(tag):
+    """
+    Fetch usage and engagement for one hashtag across all profiles.
+    Query params: limit (number of top posts, default 10).
+    """
+    try:
+        hashtag_index.refresh()
+        summary = hashtag_index.lookup(tag, int(request.args.get('limit', 10)))
+        if not summary:
+            return jsonify({'error': f'Hashtag {tag} not found'}), 404
+        return jsonify(summary), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/viral', methods=['GET'])
+def top_viral_posts():
+    """
+    Breakout posts across all profiles, highest score first.
+    Query params: limit (default 20), since (ISO date), min_score.
+    """
+    try:
+        limit = int(request.args.get('limit', 20))
+        min_score = request.args.get('min_score', type=float)
+        viral_index.refresh()
+        return jsonify({'threshold': viral_index.threshold,
+                        'posts': viral_index.top(limit, request.args.get('since'), min_score)}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/viral/<username>', methods=['GET'])
+def get_viral_posts(username):
+    """Breakout posts for one profile, newest first."""
+    try:
+        viral_index.update_profile(username)
+        summary = viral_index.profile(username)
+        if not summary:
+            return jsonify({'error': 'Posts data not found'}), 404
+        return jsonify(summary), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    """
+    Search and rank profiles from the summary index.
+    Query params: sort (followers, following, posts_count, posts_scraped, avg_likes, avg_comments,
+    engagement_rate, last_post_at, username), order (asc/desc), q (username prefix), min_followers,
+    max_followers, min_engagement, verified (0/1), limit (default 20, max 100), offset.
+    """
+    args = request.args
+    try:
+        limit = max(1, min(int(args.get('limit', 20)), 100))
+        offset = max(int(args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    try:
+        sort = args.get('sort', 'followers')
+        if sort not in SORT_COLUMNS + ['username']:
+            return jsonify({'error': f'Unsupported sort: {sort}'}), 400
+        profile_index.refresh()
+        total, profiles = profile_index.search(
+            sort=sort,
+            order=args.get('order', 'asc' if sort == 'username' else 'desc'),
+            prefix=args.get('q'),
+            min_followers=args.get('min_followers', type=int),
+            max_followers=args.get('max_followers', type=int),
+            min_engagement=args.get('min_engagement', type=float),
+            verified=args.get('verified', type=int),
+            limit=limit,
+            offset=offset,
+        )
+        return jsonify({'total': total, 'limit': limit, 'offset': offset, 'profiles': profiles}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/profiles/<username>', methods=['GET'])
+def get_profile_summary(username):
+    """
+    Fetch the indexed summary for one profile.
+    """
+    try:
+        profile_index.refresh()
+        summary = profile_index.get(username)
+        if not summary:
+            return jsonify({'error': f'Profile {username} not indexed'}), 404
+        return jsonify(summary), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Expose request, dependency and cache metrics for Prometheus.
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_request_profiles():
+    """
+    List recent request profiling reports, newest first.
+    """
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify({'enabled': request_profiler.PROFILING_ENABLED,
+                    'profiles': request_profiler.list_reports()}), 200
+
+
+@app.route('/api/admin/admission', methods=['GET'])
+def admission_status():
+    """
+    Show active and queued requests per admission class.
+    """
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify({'enabled': admission.ADMISSION_ENABLED, 'classes': admission.controller.status()}), 200
+
+
+@app.route('/api/admin/profiles/<file_name>', methods=['GET'])
+def download_request_profile(file_name):
+    """
+    Download one report file (.txt/.prof from cProfile, .folded from the sampler).
+    """
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    if not (REQUEST_PROFILE_DIR / file_name).is_file():
+        return jsonify({'error': f'Profile {file_name} not found'}), 404
+    return send_from_directory(REQUEST_PROFILE_DIR.resolve(), file_name, as_attachment=True)
+
 if __name__ == '__main__':
     logger.info("Starting the Flask app in production mode...")
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
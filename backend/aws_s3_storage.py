@@ -3,6 +3,10 @@ import os
 import json
 from config import LOCAL_DATA_DIR, LOCAL_MODEL_DIR, LOCAL_PROFILE_DIR
 from dotenv import load_dotenv
+from metrics import timer
+from profile_index import profile_written
+from profile_layout import profile_path
+from backends import STORAGE_BACKEND, s3_client
 
 load_dotenv()
 
@@ -11,15 +15,20 @@ aws_access_key = os.getenv('AWS_ACCESS_KEY')
 aws_secret_key = os.getenv('AWS_SECRET_KEY')
 bucket_name = os.getenv('BUCKET_NAME')
 
-if not aws_access_key or not aws_secret_key or not bucket_name:
-    raise EnvironmentError("AWS credentials or bucket name not set in environment variables.")
+if STORAGE_BACKEND != 's3':
+    # Local or in-memory stand-in (see backends.py); no credentials needed
+    bucket_name = bucket_name or 'viralyze-local'
+    s3 = s3_client(STORAGE_BACKEND)
+else:
+    if not aws_access_key or not aws_secret_key or not bucket_name:
+        raise EnvironmentError("AWS credentials or bucket name not set in environment variables.")
 
-# Initialize AWS S3 client
-s3 = boto3.client(
-    's3',
-    aws_access_key_id=aws_access_key,
-    aws_secret_access_key=aws_secret_key
-)
+    # Initialize AWS S3 client
+    s3 = boto3.client(
+        's3',
+        aws_access_key_id=aws_access_key,
+        aws_secret_access_key=aws_secret_key
+    )
 
 
 def ensure_data_dir():
@@ -38,10 +47,10 @@ def upload_to_s3(username, file_type='profile'):
 
     # Determine file path and S3 key based on file type
     if file_type == 'profile':
-        file_path = LOCAL_PROFILE_DIR / username / "profile.json"
+        file_path = profile_path(username, "profile.json")
         s3_key = f"profiles/{username}/profile.json"
     elif file_type == 'posts':
-        file_path = LOCAL_PROFILE_DIR / username / "posts.json"
+        file_path = profile_path(username, "posts.json")
         s3_key = f"profiles/{username}/posts.json"
         
     elif file_type == 'cache':
@@ -62,7 +71,8 @@ def upload_to_s3(username, file_type='profile'):
 
     try:
         # Upload the file to S3
-        s3.upload_file(str(file_path), bucket_name, s3_key)
+        with timer('s3_upload'):
+            s3.upload_file(str(file_path), bucket_name, s3_key)
         print(f"Uploaded {file_path} to S3 at {s3_key}.")
         return f"https://{bucket_name}.s3.amazonaws.com/{s3_key}"
     except Exception as e:
@@ -79,7 +89,8 @@ def upload_model_to_s3(model_name):
         print(f"Model file {model_path} does not exist.")
         return None
     try:
-        s3.upload_file(str(model_path), bucket_name, s3_key)
+        with timer('s3_upload'):
+            s3.upload_file(str(model_path), bucket_name, s3_key)
         print(f"Uploaded model to S3 at {s3_key}.")
         return f"https://{bucket_name}.s3.amazonaws.com/{s3_key}"
     except Exception as e:
@@ -87,7 +98,7 @@ def upload_model_to_s3(model_name):
         return None
 
 def load_profile_data(username):
-    file_path = LOCAL_PROFILE_DIR / f"{username}/profile.json"
+    file_path = profile_path(username, "profile.json")
 
     if file_path.exists():
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -97,7 +108,10 @@ def load_profile_data(username):
     try:
         s3_key = f"profiles/{username}/profile.json"
         ensure_data_dir()
-        s3.download_file(bucket_name, s3_key, str(file_path))
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with timer('s3_download'):
+            s3.download_file(bucket_name, s3_key, str(file_path))
+        profile_written(username)
         with open(file_path, 'r', encoding='utf-8') as f:
             return json.load(f)
     except Exception as e:
@@ -108,7 +122,8 @@ def fetch_folder_names_from_s3(prefix="profiles/"):
     """Fetch all folder names from S3 bucket."""
     # Fetch profile folder names from S3
     try:
-        response = s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix, Delimiter="/")
+        with timer('s3_list'):
+            response = s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix, Delimiter="/")
         profile_folders = [prefix['Prefix'].split('/')[-2] for prefix in response.get('CommonPrefixes', [])]
     except Exception as e:
         print(f"Failed to fetch profile folders from S3: {e}")
@@ -118,7 +133,27 @@ def fetch_folder_names_from_s3(prefix="profiles/"):
 def download_file_from_s3(s3_key, local_path):
     """Download a file from S3 to a local path."""
     try:
-        s3.download_file(bucket_name, s3_key, local_path)
+        with timer('s3_download'):
+            s3.download_file(bucket_name, s3_key, local_path)
         print(f"Downloaded {s3_key} to {local_path}.")
     except Exception as e:
-        print(f"Error downloading {s3_key} from S3: {e}")
\ No newline at end of file
+        print(f"Error downloading {s3_key} from S3: {e}")
+
+def upload_file_to_s3(local_path, s3_key):
+    """Upload any local file under s3_key. Returns True on success."""
+    try:
+        with timer('s3_upload'):
+            s3.upload_file(str(local_path), bucket_name, s3_key)
+        return True
+    except Exception as e:
+        print(f"S3 Upload Error for {s3_key}: {e}")
+        return False
+
+def fetch_from_s3(s3_key, local_path):
+    """Download s3_key if it exists. Returns True on success; a missing key is not an error."""
+    try:
+        with timer('s3_download'):
+            s3.download_file(bucket_name, s3_key, str(local_path))
+        return True
+    except Exception:
+        return False
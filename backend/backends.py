@@ -0,0 +1,306 @@
+"""
+Local stand-ins for the external services, selected with environment variables:
+
+    STORAGE_BACKEND=s3|local|memory      S3 (default), files under LOCAL_S3_DIR, or a dict
+    FIRESTORE_BACKEND=firestore|memory   Firebase (default) or an in-memory document store
+    APIFY_BACKEND=apify|synthetic        the Apify actor (default) or seeded synthetic profiles
+    STANDIN_LATENCY_MS=20                added latency per stand-in call, to mimic the network
+    MEDIA_ORIGIN_URL=http://...          image host in synthetic profiles (e.g. a MediaOrigin)
+
+The stand-ins implement only the calls this code base makes. MediaOrigin is
+a local HTTP server that stands in for the Instagram image CDN.
+"""
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from config import LOCAL_S3_DIR
+
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 's3')
+FIRESTORE_BACKEND = os.getenv('FIRESTORE_BACKEND', 'firestore')
+APIFY_BACKEND = os.getenv('APIFY_BACKEND', 'apify')
+STANDIN_LATENCY = float(os.getenv('STANDIN_LATENCY_MS', '0')) / 1000
+MEDIA_ORIGIN_URL = os.getenv('MEDIA_ORIGIN_URL', 'https://cdn.example')
+
+
+def _delay():
+    if STANDIN_LATENCY > 0:
+        time.sleep(STANDIN_LATENCY)
+
+
+# S3
+
+class MemoryS3Client:
+    """upload_file/download_file/list_objects_v2 of a boto3 S3 client, backed by a dict."""
+
+    def __init__(self):
+        self.objects = {}  # (bucket, key) -> bytes
+        self.lock = threading.Lock()
+
+    def _put(self, bucket, key, body):
+        with self.lock:
+            self.objects[(bucket, key)] = body
+
+    def _get(self, bucket, key):
+        with self.lock:
+            body = self.objects.get((bucket, key))
+        if body is None:
+            raise FileNotFoundError(f"s3://{bucket}/{key} does not exist")
+        return body
+
+    def _keys(self, bucket):
+        with self.lock:
+            return [key for (b, key) in self.objects if b == bucket]
+
+    def upload_file(self, filename, bucket, key):
+        _delay()
+        with open(filename, 'rb') as file:
+            self._put(bucket, key, file.read())
+
+    def download_file(self, bucket, key, filename):
+        _delay()
+        body = self._get(bucket, key)
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        with open(filename, 'wb') as file:
+            file.write(body)
+
+    def list_objects_v2(self, Bucket, Prefix='', Delimiter=None, **kwargs):
+        _delay()
+        keys = sorted(key for key in self._keys(Bucket) if key.startswith(Prefix))
+        if not Delimiter:
+            return {'Contents': [{'Key': key} for key in keys], 'KeyCount': len(keys)}
+        contents, prefixes = [], set()
+        for key in keys:
+            rest = key[len(Prefix):]
+            if Delimiter in rest:
+                prefixes.add(Prefix + rest.split(Delimiter, 1)[0] + Delimiter)
+            else:
+                contents.append({'Key': key})
+        return {'Contents': contents, 'CommonPrefixes': [{'Prefix': p} for p in sorted(prefixes)],
+                'KeyCount': len(contents) + len(prefixes)}
+
+
+class LocalS3Client(MemoryS3Client):
+    """MemoryS3Client persisted as files under root/<bucket>/<key>, so objects survive restarts."""
+
+    def __init__(self, root=LOCAL_S3_DIR):
+        super().__init__()
+        self.root = Path(root)
+
+    def _path(self, bucket, key):
+        return self.root / bucket / key
+
+    def _put(self, bucket, key, body):
+        path = self._path(bucket, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        tmp_path.write_bytes(body)
+        os.replace(tmp_path, path)
+
+    def _get(self, bucket, key):
+        try:
+            return self._path(bucket, key).read_bytes()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"s3://{bucket}/{key} does not exist")
+
+    def _keys(self, bucket):
+        base = self.root / bucket
+        if not base.exists():
+            return []
+        return [path.relative_to(base).as_posix() for path in base.rglob('*')
+                if path.is_file() and not path.name.endswith('.tmp')]
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def s3_client(backend=STORAGE_BACKEND):
+    """The stand-in client for a non-s3 STORAGE_BACKEND."""
+    if backend == 'memory':
+        return MemoryS3Client()
+    if backend == 'local':
+        return LocalS3Client()
+    raise ValueError(f"Unsupported STORAGE_BACKEND: {backend}")
+
+
+# Firestore
+
+class _Snapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class _DocumentRef:
+    def __init__(self, store, collection, doc_id):
+        self.store = store
+        self.key = (collection, doc_id)
+        self.id = doc_id
+
+    def get(self):
+        _delay()
+        with self.store.lock:
+            return _Snapshot(self.id, self.store.documents.get(self.key))
+
+    def set(self, data, merge=False):
+        _delay()
+        with self.store.lock:
+            current = self.store.documents.get(self.key) if merge else None
+            self.store.documents[self.key] = {**(current or {}), **data}
+
+    def delete(self):
+        _delay()
+        with self.store.lock:
+            self.store.documents.pop(self.key, None)
+
+
+class _CollectionRef:
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+
+    def document(self, doc_id):
+        return _DocumentRef(self.store, self.name, doc_id)
+
+
+class MemoryFirestore:
+    """collection().document().get()/set()/delete() of a Firestore client, backed by a dict."""
+
+    def __init__(self):
+        self.documents = {}  # (collection, id) -> dict
+        self.lock = threading.Lock()
+
+    def collection(self, name):
+        return _CollectionRef(self, name)
+
+
+# Apify
+
+class SyntheticApifyClient:
+    """
+    Stand-in for apify_client.ApifyClient that answers every actor run with a
+    synthetic profile for the requested username. Posts are seeded by the
+    username, so the same account always scrapes to the same data.
+    """
+
+    def __init__(self, token=None, posts_per_profile=60):
+        self.posts_per_profile = posts_per_profile
+        self.datasets = {}
+        self.lock = threading.Lock()
+        self.runs = 0
+
+    def actor(self, actor_id):
+        return _SyntheticActor(self)
+
+    def dataset(self, dataset_id):
+        return _SyntheticDataset(self, dataset_id)
+
+
+class _SyntheticActor:
+    def __init__(self, client):
+        self.client = client
+
+    def call(self, run_input=None, **kwargs):
+        from replay import synthesize_apify
+        from synthetic_posts import generate_posts
+
+        _delay()
+        username = run_input['directUrls'][0].rstrip('/').rsplit('/', 1)[-1]
+        limit = min(run_input.get('resultsLimit') or self.client.posts_per_profile, self.client.posts_per_profile)
+        posts = generate_posts(limit, seed=zlib.crc32(username.encode()))
+        with self.client.lock:
+            self.client.runs += 1
+            dataset_id = f"dataset_{self.client.runs}"
+            self.client.datasets[dataset_id] = synthesize_apify(username, posts, MEDIA_ORIGIN_URL)['items']
+        return {'id': f"run_{self.client.runs}", 'defaultDatasetId': dataset_id}
+
+
+class _SyntheticDataset:
+    def __init__(self, client, dataset_id):
+        self.client = client
+        self.dataset_id = dataset_id
+
+    def iterate_items(self):
+        with self.client.lock:
+            items = self.client.datasets.pop(self.dataset_id, [])
+        yield from items
+
+
+def apify_client_class(backend=APIFY_BACKEND):
+    """The ApifyClient class (or stand-in) scraper.scrape_using_apify should construct."""
+    if backend == 'synthetic':
+        return SyntheticApifyClient
+    if backend != 'apify':
+        raise ValueError(f"Unsupported APIFY_BACKEND: {backend}")
+    from apify_client import ApifyClient
+    return ApifyClient
+
+
+# Image CDN
+
+def synthetic_png(seed, size=64):
+    """A deterministic solid-colour PNG, distinct per seed."""
+    color = zlib.crc32(str(seed).encode()).to_bytes(4, 'big')[:3]
+    raw = b''.join(b'\x00' + color * size for _ in range(size))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b'')
+
+
+class MediaOrigin:
+    """
+    Local stand-in for the image CDN: serves a synthetic PNG for any path and
+    403 for paths under /expired/, like an expired Instagram link.
+
+        with MediaOrigin() as origin:
+            url = origin.url('/p/abc.png')
+    """
+
+    def __init__(self, latency=STANDIN_LATENCY):
+        self.latency = latency
+        self.requests = 0
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                origin.requests += 1
+                if origin.latency > 0:
+                    time.sleep(origin.latency)
+                if self.path.startswith('/expired/'):
+                    self.send_error(403)
+                    return
+                body = synthetic_png(self.path)
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
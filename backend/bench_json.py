@@ -0,0 +1,97 @@
+"""
+Payload size and serialization benchmark for the /api/posts and /api/stats
+responses.
+
+Uses the largest profiles under LOCAL_PROFILE_DIR, or synthetic posts when
+--posts is given. Times Flask's default encoder against each fast_json
+backend and reports gzip/brotli sizes and compression time.
+
+    python bench_json.py --profiles 3
+    python bench_json.py --posts 10000 100000 --output bench_json.json
+"""
+import argparse
+import gzip
+import json
+import time
+from pathlib import Path
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import fast_json
+from config import LOCAL_PROFILE_DIR, COMPRESS_GZIP_LEVEL, COMPRESS_BROTLI_QUALITY
+from feature_store import FeatureStore
+import profile_layout
+from synthetic_posts import generate_posts
+
+
+def _best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def stats_payload(posts):
+    stats, best_time, best_day, top_post, engagement_trend = FeatureStore.from_posts(posts).stats()
+    return {'stats': stats, 'bestTime': best_time, 'bestDay': best_day, 'topPost': top_post,
+            'engagementTrend': engagement_trend}
+
+
+def payloads(profile_count, post_counts):
+    """(name, object) pairs for the posts and stats responses of each source."""
+    if post_counts:
+        sources = [(f'synthetic_{count}', generate_posts(count)) for count in post_counts]
+    else:
+        files = [profile_layout.profile_path(username, 'posts.json') for username in profile_layout.list_usernames()]
+        files = sorted((p for p in files if p.exists()), key=lambda p: p.stat().st_size, reverse=True)
+        sources = []
+        for path in files[:profile_count]:
+            with open(path, 'r', encoding='utf-8') as file:
+                sources.append((path.parent.name, json.load(file)))
+    for name, posts in sources:
+        yield f'{name}/posts', posts
+        yield f'{name}/stats', stats_payload(posts)
+
+
+def run(profile_count, post_counts, repeat):
+    encoders = {'flask_default': DefaultJSONProvider(Flask(__name__)).dumps,
+                'fast_json[json]': lambda obj: fast_json.dumps_bytes(obj, backend='json'),
+                'fast_json[orjson]': lambda obj: fast_json.dumps_bytes(obj, backend='orjson')}
+
+    results = []
+    for name, obj in payloads(profile_count, post_counts):
+        body = fast_json.dumps_bytes(obj)
+        result = {'payload': name, 'bytes': len(body)}
+        for encoder, dumps in encoders.items():
+            result[f'{encoder}_ms'] = round(_best_of(lambda: dumps(obj), repeat)[0] * 1000, 3)
+        seconds, packed = _best_of(lambda: gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0), repeat)
+        result.update(gzip_bytes=len(packed), gzip_ms=round(seconds * 1000, 3))
+        seconds, packed = _best_of(lambda: fast_json.brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY), repeat)
+        result.update(br_bytes=len(packed), br_ms=round(seconds * 1000, 3))
+        results.append(result)
+        print(', '.join(f'{key} {value}' for key, value in result.items()))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', type=int, default=3, help='number of largest local profiles to use')
+    parser.add_argument('--posts', type=int, nargs='+', help='use synthetic profiles of these sizes instead')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement (best is kept)')
+    parser.add_argument('--output', help='write results as JSON')
+    args = parser.parse_args()
+
+    results = run(args.profiles, args.posts, args.repeat)
+    if not results:
+        raise SystemExit(f"No profiles found under {LOCAL_PROFILE_DIR}; pass --posts for synthetic data.")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'results': results}, file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Scraper throughput benchmark, run entirely against replay.py fixtures.
+
+    python bench_scraper.py --posts 1000 10000 --latency 0.01 --error-rate 0.05 --output bench_scraper.json
+    python bench_scraper.py --baseline bench_scraper.json   # flag regressions against a previous run
+
+Reports posts/sec and peak traced memory for scrape_user_data,
+scrape_using_apify and store_posts_into_json, from the fastest successful
+repeat, plus how many repeats failed with a replayed error.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+# aws_s3_storage refuses to import without credentials; uploads are stubbed by replay().
+for _var in ('AWS_ACCESS_KEY', 'AWS_SECRET_KEY', 'BUCKET_NAME'):
+    os.environ.setdefault(_var, 'replay')
+
+import scraper
+from profile_layout import profile_dir
+from replay import replay, synthesize_profile_info, synthesize_apify, _epoch
+
+SOURCE_POSTS = Path(__file__).parent / 'swiggyindia_posts.json'
+USERNAME = 'bench_user'
+
+
+def make_posts(count):
+    """Repeat the bundled sample posts (with unique ids) up to `count` posts."""
+    with open(SOURCE_POSTS, 'r', encoding='utf-8') as file:
+        sample = json.load(file)
+    posts = []
+    for i in range(count):
+        post = dict(sample[i % len(sample)])
+        post['id'] = f"{post['id']}_{i}"
+        post['shortcode'] = f"{post['shortcode']}{i}"
+        posts.append(post)
+    return posts
+
+
+@contextmanager
+def fresh_workdir():
+    """
+    Run inside a new empty directory. The scraper writes ./data/..., including
+    its fetch cache, and a cached cursor would turn later runs into no-ops.
+    """
+    workdir = tempfile.mkdtemp(prefix='viralyze_bench_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        yield workdir
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def measure(fn):
+    """Run fn once, returning (seconds, peak_bytes)."""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_scrape_user_data(posts, args, seed=42):
+    fixture = synthesize_profile_info(USERNAME, posts)
+    with replay(profile_info=fixture, latency=args.latency, jitter=args.jitter,
+                error_rate=args.error_rate, seed=seed) as (stub, _):
+        elapsed, peak = measure(lambda: scraper.scrape_user_data(USERNAME, max_posts=len(posts)))
+    return stub.posts_served, elapsed, peak
+
+
+def bench_scrape_using_apify(posts, args, seed=42):
+    fixture = synthesize_apify(USERNAME, posts)
+    with replay(apify=fixture, latency=args.latency, jitter=args.jitter,
+                error_rate=args.error_rate, seed=seed) as (_, stub):
+        try:
+            elapsed, peak = measure(lambda: scraper.scrape_using_apify(USERNAME, max_posts=len(posts)))
+        except RuntimeError:
+            # Replayed actor failure: run() counts it as an error, not a timing
+            tracemalloc.stop()
+            return None
+    return stub.posts_served, elapsed, peak
+
+
+def bench_store_posts_into_json(posts, args, seed=42):
+    items = [{
+        'id': post['id'],
+        'shortcode': post['shortcode'],
+        'taken_at_timestamp': _epoch(post['timestamp']),
+        'caption': post.get('caption', ''),
+        'comments_count': post['comments_count'],
+        'likes_count': post['likes_count'],
+    } for post in posts]
+    os.makedirs(profile_dir(USERNAME), exist_ok=True)
+    elapsed, peak = measure(lambda: scraper.store_posts_into_json(items, USERNAME))
+    return len(items), elapsed, peak
+
+
+BENCHMARKS = {
+    'scrape_user_data': bench_scrape_user_data,
+    'scrape_using_apify': bench_scrape_using_apify,
+    'store_posts_into_json': bench_store_posts_into_json,
+}
+
+
+def run(args):
+    results = []
+    for count in args.posts:
+        posts = make_posts(count)
+        for name, bench in BENCHMARKS.items():
+            best, errors = None, 0
+            for repeat in range(args.repeat):
+                # Every measured run starts from an empty data directory and fetch cache, and
+                # draws its own replayed errors
+                with fresh_workdir():
+                    outcome = bench(posts, args, seed=42 + repeat)
+                if outcome is None:
+                    errors += 1
+                elif best is None or outcome[1] < best[1]:
+                    best = outcome
+            served, elapsed, peak = best or (0, None, 0)
+            results.append({
+                'benchmark': name,
+                'posts': count,
+                'posts_served': served,
+                'seconds': round(elapsed, 4) if elapsed is not None else None,
+                'posts_per_sec': round(served / elapsed, 1) if elapsed else 0,
+                'peak_mb': round(peak / 1e6, 2),
+                'runs': args.repeat,
+                'errors': errors,
+            })
+    return results
+
+
+def compare(results, baseline_path, tolerance):
+    """Print throughput regressions beyond `tolerance` against a baseline file."""
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = {(r['benchmark'], r['posts']): r for r in json.load(file)['results']}
+    regressions = 0
+    for result in results:
+        base = baseline.get((result['benchmark'], result['posts']))
+        if not base or not base['posts_per_sec'] or result['seconds'] is None:
+            continue
+        change = result['posts_per_sec'] / base['posts_per_sec'] - 1
+        flag = 'REGRESSION' if change < -tolerance else 'ok'
+        regressions += flag == 'REGRESSION'
+        print(f"{result['benchmark']:<24}{result['posts']:>9}  {change:+.1%}  {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every replayed request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra uniform random latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of replayed requests that fail')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--baseline', help='compare against a previous --output file')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed throughput drop vs baseline')
+    args = parser.parse_args()
+
+    results = run(args)
+    print(f"{'benchmark':<24}{'posts':>9}{'posts/sec':>14}{'peak MB':>10}{'errors':>9}")
+    for r in results:
+        print(f"{r['benchmark']:<24}{r['posts']:>9}{r['posts_per_sec']:>14}{r['peak_mb']:>10}"
+              f"{r['errors']:>5}/{r['runs']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'args': vars(args), 'results': results},
+                      file, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        if compare(results, args.baseline, args.tolerance):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark node bootstrap: per-file S3 sync versus a single snapshot archive.
+
+Runs in a scratch directory against the S3 stand-in from backends.py, with
+STANDIN_LATENCY_MS of added latency per request to mimic S3 round trips.
+
+    python bench_snapshot.py --profiles 1000 --latency-ms 20
+    python bench_snapshot.py --profiles 1000 --output snapshot.json
+    python bench_snapshot.py --profiles 1000 --baseline snapshot.json
+
+Reports wall time and S3 request counts for pushing and bootstrapping the
+same profiles both ways, and checks that both restores produce identical files.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def seed_profiles(count, posts_per_profile, seed):
+    from synthetic_posts import generate_posts
+    import profile_layout
+
+    usernames = []
+    for i in range(count):
+        username = f'bench_{i:05d}'
+        folder = profile_layout.profile_dir(username)
+        folder.mkdir(parents=True, exist_ok=True)
+        with open(folder / 'posts.json', 'w', encoding='utf-8') as file:
+            json.dump(generate_posts(posts_per_profile, seed + i), file)
+        with open(folder / 'profile.json', 'w', encoding='utf-8') as file:
+            json.dump({'username': username, 'followersCount': 1000 * (i + 1)}, file)
+        usernames.append(username)
+    profile_layout.build_manifest()
+    return usernames
+
+
+def tree_digest():
+    """sha256 over every profile file's name and contents."""
+    import snapshot
+
+    digest = hashlib.sha256()
+    members = [(name, path) for name, path in snapshot.snapshot_members() if name.startswith('profiles/')]
+    for name, path in sorted(members):
+        digest.update(name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest(), len(members)
+
+
+def wipe_profiles():
+    from config import LOCAL_PROFILE_DIR
+
+    shutil.rmtree(LOCAL_PROFILE_DIR, ignore_errors=True)
+
+
+def count_requests(client):
+    """Wrap the S3 client's calls with a counter; returns the dict of counts."""
+    counts = {}
+    for method in ('upload_file', 'download_file', 'list_objects_v2'):
+        original = getattr(client, method)
+
+        def counted(*args, _original=original, _method=method, **kwargs):
+            counts[_method] = counts.get(_method, 0) + 1
+            return _original(*args, **kwargs)
+
+        setattr(client, method, counted)
+    return counts
+
+
+def measure(label, fn, counts):
+    counts.clear()
+    started = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - started
+    result = {'step': label, 'seconds': round(seconds, 3), 'requests': sum(counts.values())}
+    print(f"{label:<22}{result['seconds']:>10.3f}s{result['requests']:>10} requests")
+    return result
+
+
+def run(profiles, posts_per_profile, seed, workers):
+    import aws_s3_storage
+    import snapshot
+    import utils
+
+    usernames = seed_profiles(profiles, posts_per_profile, seed)
+    expected, files = tree_digest()
+    counts = count_requests(aws_s3_storage.s3)
+
+    def push_per_file():
+        for username in usernames:
+            aws_s3_storage.upload_to_s3(username, 'profile')
+            aws_s3_storage.upload_to_s3(username, 'posts')
+
+    results = [measure('push per file', push_per_file, counts),
+               measure('push snapshot', snapshot.export_snapshot, counts)]
+
+    wipe_profiles()
+    results.append(measure('bootstrap per file', utils.download_data_from_server, counts))
+    per_file_ok = tree_digest() == (expected, files)
+
+    wipe_profiles()
+    results.append(measure('bootstrap snapshot', lambda: snapshot.restore_snapshot(workers=workers), counts))
+    snapshot_ok = tree_digest() == (expected, files)
+
+    print(f"{files} files; per-file restore {'matches' if per_file_ok else 'DIFFERS'}, "
+          f"snapshot restore {'matches' if snapshot_ok else 'DIFFERS'}")
+    if not (per_file_ok and snapshot_ok):
+        raise SystemExit(1)
+    return results
+
+
+def compare(results, baseline_path, tolerance):
+    """Print slowdowns beyond `tolerance` against a baseline file."""
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = {r['step']: r for r in json.load(file)['results']}
+    regressions = 0
+    for result in results:
+        base = baseline.get(result['step'])
+        if not base or not base['seconds']:
+            continue
+        change = result['seconds'] / base['seconds'] - 1
+        flag = 'REGRESSION' if change > tolerance else 'ok'
+        regressions += flag == 'REGRESSION'
+        print(f"{result['step']:<22} {change:+.1%}  {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', type=int, default=300)
+    parser.add_argument('--posts-per-profile', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=20, help='added latency per S3 request')
+    parser.add_argument('--storage', choices=['memory', 'local'], default='memory', help='S3 stand-in to use')
+    parser.add_argument('--workers', type=int, help='snapshot extraction threads')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--baseline', help='compare against a previous --output file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown vs baseline')
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # The stand-ins read their settings at import time
+    os.environ['STORAGE_BACKEND'] = args.storage
+    os.environ['STANDIN_LATENCY_MS'] = str(args.latency_ms)
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from config import SNAPSHOT_WORKERS
+
+    with tempfile.TemporaryDirectory(prefix='viralyze_snapshot_') as workdir:
+        os.chdir(workdir)
+        print(f"{args.profiles} profiles, {args.latency_ms:g} ms per request, {args.storage} S3 stand-in")
+        results = run(args.profiles, args.posts_per_profile, args.seed, args.workers or SNAPSHOT_WORKERS)
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'profiles': args.profiles,
+                       'latency_ms': args.latency_ms, 'results': results}, file, indent=2)
+        print(f"Results written to {output}")
+    if baseline:
+        if compare(results, baseline, args.tolerance):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Training pipeline benchmark on synthetic posts.
+
+Times retrain_model.load_data, extract_features, prepare_data and train_model
+at each size and records each stage's peak traced memory (measured in a
+separate pass so tracing does not skew the timings).
+
+    python bench_training.py --sizes 1000 10000 100000 1000000 --output bench_training.json
+    python bench_training.py --sizes 1000 10000 --baseline bench_training.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import retrain_model
+from synthetic_posts import write_posts
+
+STAGES = ['load_data', 'extract_features', 'prepare_data', 'train_model']
+
+
+def _run_stages(path, stage_hook):
+    """Run the pipeline on `path`, calling stage_hook(name, fn) around each stage."""
+    data = stage_hook('load_data', lambda: retrain_model.load_data(path))
+    df = stage_hook('extract_features', lambda: retrain_model.extract_features(data))
+    X, y = stage_hook('prepare_data', lambda: retrain_model.prepare_data(df))
+    stage_hook('train_model', lambda: retrain_model.train_model(X, y, retrain_model.DEFAULT_PARAMS))
+
+
+def time_stages(path):
+    seconds = {}
+
+    def hook(name, fn):
+        started = time.perf_counter()
+        result = fn()
+        seconds[name] = round(time.perf_counter() - started, 4)
+        return result
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        _run_stages(path, hook)
+    return seconds
+
+
+def memory_stages(path):
+    peaks = {}
+
+    def hook(name, fn):
+        tracemalloc.start()
+        result = fn()
+        peaks[name] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+        tracemalloc.stop()
+        return result
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        _run_stages(path, hook)
+    return peaks
+
+
+def run(sizes, seed, measure_memory=True):
+    results = []
+    with tempfile.TemporaryDirectory(prefix='viralyze_bench_') as workdir:
+        for size in sizes:
+            path = os.path.join(workdir, f'posts_{size}.json')
+            write_posts(size, path, seed)
+            seconds = time_stages(path)
+            peaks = memory_stages(path) if measure_memory else {}
+            for stage in STAGES:
+                results.append({
+                    'stage': stage,
+                    'posts': size,
+                    'seconds': seconds[stage],
+                    'posts_per_sec': round(size / seconds[stage], 1) if seconds[stage] else 0,
+                    'peak_mb': peaks.get(stage),
+                })
+            print(f"{size:>9} posts: " + ', '.join(f"{stage} {seconds[stage]}s" for stage in STAGES))
+    return results
+
+
+def compare(results, baseline_path, tolerance):
+    """Print per-stage slowdowns beyond `tolerance` against a baseline file."""
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = {(r['stage'], r['posts']): r for r in json.load(file)['results']}
+    regressions = 0
+    for result in results:
+        base = baseline.get((result['stage'], result['posts']))
+        if not base or not base['seconds']:
+            continue
+        change = result['seconds'] / base['seconds'] - 1
+        flag = 'REGRESSION' if change > tolerance else 'ok'
+        regressions += flag == 'REGRESSION'
+        print(f"{result['stage']:<18}{result['posts']:>9}  {change:+.1%}  {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--skip-memory', action='store_true', help='only time the stages')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--baseline', help='compare against a previous --output file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown vs baseline')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.seed, not args.skip_memory)
+    print(f"{'stage':<18}{'posts':>9}{'seconds':>10}{'posts/sec':>14}{'peak MB':>10}")
+    for r in results:
+        print(f"{r['stage']:<18}{r['posts']:>9}{r['seconds']:>10}{r['posts_per_sec']:>14}{str(r['peak_mb']):>10}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seed': args.seed, 'results': results},
+                      file, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        if compare(results, args.baseline, args.tolerance):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
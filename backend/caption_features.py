@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from config import HASHTAG_BUCKETS
+
+MENTION_PATTERN = r'@[\w.]+'
+# Pictographs, symbols, dingbats and regional indicators (flags count as two)
+EMOJI_PATTERN = '[\U0001F300-\U0001FAFF\U0001F1E6-\U0001F1FF\u2600-\u27BF\u2B00-\u2BFF]'
+CAPTION_COLUMNS = ['caption_length', 'hashtag_count', 'mention_count', 'emoji_count']
+HASHTAG_COLUMNS = [f'tag_{i}' for i in range(HASHTAG_BUCKETS)]
+
+
+def caption_columns(captions, hashtags):
+    """
+    Caption features for whole columns at once: length, hashtag, mention and
+    emoji counts (int32) and a hashed bag of hashtags (n x HASHTAG_BUCKETS, int16).
+    `captions` is a sequence of strings, `hashtags` a sequence of hashtag lists.
+    """
+    n = len(captions)
+    text = pd.Series(captions, dtype=object).fillna('').astype(str)
+    columns = {
+        'caption_length': text.str.len().to_numpy(dtype=np.int32),
+        'mention_count': text.str.count(MENTION_PATTERN).to_numpy(dtype=np.int32),
+        'emoji_count': text.str.count(EMOJI_PATTERN).to_numpy(dtype=np.int32),
+    }
+
+    # One row per (post, hashtag); the index points back at the post
+    tags = pd.Series(list(hashtags), dtype=object).explode().dropna().astype(str)
+    tags = tags.str.lstrip('#').str.lower()
+    tags = tags[tags != '']
+    rows = tags.index.to_numpy(dtype=np.int64)
+    columns['hashtag_count'] = np.bincount(rows, minlength=n).astype(np.int32)
+
+    bag = np.zeros((n, HASHTAG_BUCKETS), dtype=np.int16)
+    if len(tags):
+        buckets = (pd.util.hash_array(tags.to_numpy(dtype=object)) % HASHTAG_BUCKETS).astype(np.int64)
+        np.add.at(bag, (rows, buckets), 1)
+    columns['hashtag_bag'] = bag
+    return columns
+
+
+def draft_caption_features(caption):
+    """Model features for a draft caption, keyed like the training columns."""
+    hashtags = [word for word in caption.split() if word.startswith("#")]
+    columns = caption_columns([caption], [hashtags])
+    features = {name: int(columns[name][0]) for name in CAPTION_COLUMNS}
+    features.update({name: int(value) for name, value in zip(HASHTAG_COLUMNS, columns['hashtag_bag'][0])})
+    return features
+
+
+def caption_defaults(X):
+    """
+    Mean caption features of the training rows, stored with the model and
+    used for requests that send no caption, so their predictions reflect a
+    typical caption rather than an empty one.
+    """
+    columns = [name for name in CAPTION_COLUMNS + HASHTAG_COLUMNS if name in X.columns]
+    return {name: float(value) for name, value in X[columns].mean().items()} if len(X) else {}
@@ -3,3 +3,115 @@ from pathlib import Path
 LOCAL_DATA_DIR = Path("data")
 LOCAL_MODEL_DIR = LOCAL_DATA_DIR / 'models'
 LOCAL_PROFILE_DIR = LOCAL_DATA_DIR / 'profiles'
+
+# Refresh scheduler
+REFRESH_STATE_FILE = LOCAL_DATA_DIR / 'refresh_state.json'
+REFRESH_LEADER_LOCK = LOCAL_DATA_DIR / 'refresh_scheduler.lock'  # held by the one worker that dispatches
+REFRESH_BASE_INTERVAL_HOURS = 7 * 24  # refresh interval of an account with weight 1
+REFRESH_MIN_INTERVAL_HOURS = 1
+REFRESH_MAX_CONCURRENCY = 2
+REFRESH_HOURLY_BUDGET = 20
+REFRESH_TICK_SECONDS = 60
+
+# Hashtag index
+HASHTAG_INDEX_FILE = LOCAL_DATA_DIR / 'hashtag_index.json'
+HASHTAG_INDEX_REFRESH_SECONDS = 30
+HASHTAG_INDEX_SAVE_SECONDS = 30  # at most one rewrite of the index file per interval
+
+# Incremental model updates
+INCREMENTAL_TREES = 25  # boosting rounds added per update
+INCREMENTAL_MAX_TREES = 600  # full retrain once the booster grows past this
+INCREMENTAL_DRIFT_TOLERANCE = 1.0  # full retrain when MAE on new posts exceeds (1 + tolerance) x baseline
+
+# Hyperparameter search
+TUNE_MAX_TRIALS = 24
+TUNE_TIME_BUDGET_SECONDS = 120
+# "tune": true on /api/retrain searches inside the request, so it stays under the retrain admission wait
+TUNE_REQUEST_TIME_BUDGET_SECONDS = 20
+TUNE_REQUEST_WORKERS = 2
+TUNE_EARLY_STOPPING_ROUNDS = 20
+
+# Content-addressed model cache
+MODEL_CACHE_DIR = LOCAL_MODEL_DIR / 'cache'
+MODEL_CACHE_KEEP = 10  # most recently used artifacts kept even when unreferenced
+MODEL_CACHE_TMP_MAX_AGE_SECONDS = 3600  # older *.tmp files are left over from crashed copies
+
+# Caption features
+HASHTAG_BUCKETS = 32  # width of the hashed bag-of-hashtags features
+
+# Per-profile feature stores
+FEATURE_STORE_CACHE_SIZE = 256  # stores kept in memory by feature_store.get_store
+
+# Request profiling reports
+REQUEST_PROFILE_DIR = LOCAL_DATA_DIR / 'request_profiles'
+REQUEST_PROFILE_MAX_REPORTS = 50
+
+# Response compression
+COMPRESS_MIN_BYTES = 1024  # smaller responses are sent as-is
+COMPRESS_GZIP_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 5
+
+# Profile summary index
+PROFILE_INDEX_DB = LOCAL_DATA_DIR / 'profile_index.sqlite3'
+PROFILE_INDEX_REFRESH_SECONDS = 60
+
+# Local S3 stand-in (STORAGE_BACKEND=local)
+LOCAL_S3_DIR = LOCAL_DATA_DIR / 'local_s3'
+
+# Model versions and hot reload
+MODEL_POINTER_FILE = LOCAL_MODEL_DIR / 'likes_predictor.current.json'
+MODEL_VERSIONS_DIR = LOCAL_MODEL_DIR / 'versions'
+MODEL_VERSIONS_KEEP = 5
+MODEL_POLL_SECONDS = 5  # how often each worker checks the pointer file
+
+# Image proxy cache
+MEDIA_CACHE_DIR = LOCAL_DATA_DIR / 'media_cache'
+MEDIA_CACHE_MAX_BYTES = 512 * 1024 * 1024
+MEDIA_THUMBNAIL_WIDTHS = (150, 320, 640)
+MEDIA_MAX_AGE_SECONDS = 365 * 24 * 3600  # post images never change
+MEDIA_PROFILE_MAX_AGE_SECONDS = 24 * 3600  # profile pictures do
+MEDIA_FETCH_TIMEOUT = 10
+MEDIA_MAX_IMAGE_BYTES = 15 * 1024 * 1024
+MEDIA_CACHE_TMP_MAX_AGE_SECONDS = 3600  # older *.tmp files are left over from crashed writes
+
+# Profile folder layout (see profile_layout.py)
+PROFILE_SHARD_CHARS = 2  # hex chars of sha1(username) per shard folder: 256 shards
+MANIFEST_JOURNAL_MAX_BYTES = 256 * 1024  # manifest.journal is folded into manifest.json past this size
+
+# Multi-profile comparison (/api/stats/compare)
+COMPARE_MAX_PROFILES = 50
+COMPARE_WORKERS = 8
+
+# Viral post detection
+VIRAL_INDEX_FILE = LOCAL_DATA_DIR / 'viral_index.json'
+VIRAL_INDEX_REFRESH_SECONDS = 30
+VIRAL_WINDOW = 30  # previous posts in each post's baseline
+VIRAL_MIN_HISTORY = 10  # posts with fewer earlier posts are not scored
+VIRAL_RATIO_THRESHOLD = 3.0  # likes or comments vs. the trailing median
+
+# Posting schedule optimizer
+SCHEDULE_MAX_DAYS = 92
+SCHEDULE_MAX_POSTS = 100
+
+# Data directory snapshots (see snapshot.py)
+SNAPSHOT_DIR = LOCAL_DATA_DIR / 'snapshots'  # staging for archives being uploaded or restored
+SNAPSHOT_WORKERS = 8
+SNAPSHOT_COMPRESS_LEVEL = 6
+
+# Admission control (see admission.py): class -> (priority, concurrent, queued, max wait seconds).
+# A lower priority number wins: classes only start requests while no higher class has any waiting.
+ADMISSION_CLASSES = {
+    'read': (0, 64, 128, 5),
+    'batch': (1, 4, 16, 10),
+    'scrape': (2, 2, 8, 30),
+    'retrain': (3, 1, 2, 30),
+}
+# Route rule -> class; unlisted routes are 'read'
+ADMISSION_ROUTES = {
+    '/api/stats/compare': 'batch',
+    '/api/schedule/optimize': 'batch',
+    '/api/scrape/<username>': 'scrape',
+    '/api/retrain': 'retrain',
+    '/api/download_data/<key>': 'retrain',
+}
+ADMISSION_EXEMPT = ('/metrics',)
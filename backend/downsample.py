@@ -0,0 +1,48 @@
+import numpy as np
+
+BUCKETS = ('day', 'week', 'month')
+DAY_SECONDS = 86400
+
+
+def bucket_starts(ts, bucket):
+    """Start of the day, week (Monday) or month containing each unix timestamp, as datetime64[D]."""
+    days = np.asarray(ts, dtype=np.int64) // DAY_SECONDS
+    if bucket == 'day':
+        return days.astype('datetime64[D]')
+    if bucket == 'week':
+        # 1970-01-01 was a Thursday, so shifting by 3 days aligns weeks on Monday
+        return ((days + 3) // 7 * 7 - 3).astype('datetime64[D]')
+    if bucket == 'month':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(f"Unsupported bucket: {bucket}")
+
+
+def lttb(x, y, max_points):
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+    The first and last points are always kept. From each of the max_points - 2
+    middle buckets it keeps the point that forms the largest triangle with the
+    previous kept point and the mean of the next bucket. x must be sorted.
+    """
+    n = len(x)
+    if max_points >= n or n <= 2:
+        return np.arange(n)
+    if max_points < 3:
+        raise ValueError("max_points must be at least 3")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)  # bucket boundaries over the middle points
+    # Mean point of each bucket, plus the last point as the final "next bucket"
+    sizes = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes, x[-1])
+    mean_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes, y[-1])
+
+    keep = np.empty(max_points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        px, py = x[previous], y[previous]
+        areas = np.abs((px - mean_x[i + 1]) * (y[start:end] - py) - (px - x[start:end]) * (mean_y[i + 1] - py))
+        previous = keep[i + 1] = start + int(np.argmax(areas))
+    return keep
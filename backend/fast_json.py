@@ -0,0 +1,109 @@
+"""
+JSON encoding and response compression for the Flask app.
+
+FastJSONProvider serializes NumPy and pandas scalars/arrays natively. It uses
+orjson by default; JSON_BACKEND=json switches to the standard library.
+compress_response brotli- or gzip-encodes responses larger than
+COMPRESS_MIN_BYTES when the client accepts it.
+"""
+import gzip
+import json
+import math
+import os
+from datetime import date, datetime
+
+import brotli
+import numpy as np
+import orjson
+import pandas as pd
+from flask.json.provider import DefaultJSONProvider
+
+from config import COMPRESS_MIN_BYTES, COMPRESS_GZIP_LEVEL, COMPRESS_BROTLI_QUALITY
+
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'orjson')
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+def default(value):
+    """Fallback for types the encoders do not handle themselves."""
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        value = float(value)
+        return None if math.isnan(value) or math.isinf(value) else value
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (pd.Series, pd.Index)):
+        return value.tolist()
+    if isinstance(value, pd.DataFrame):
+        return value.to_dict('records')
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj, backend=None, sort_keys=False):
+    """Serialize obj to UTF-8 JSON bytes with the selected backend."""
+    backend = backend or JSON_BACKEND
+    if backend == 'orjson':
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option)
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':'),
+                      sort_keys=sort_keys).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by dumps_bytes; used by jsonify()."""
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj, sort_keys=kwargs.get('sort_keys', False)).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if JSON_BACKEND == 'orjson':
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
+
+
+def negotiate_encoding(accept_encoding):
+    """Best supported content coding from an Accept-Encoding header, or None."""
+    if accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response, accept_encoding, min_bytes=COMPRESS_MIN_BYTES):
+    """Compress a buffered text/JSON response in place when it is large enough and the client accepts it."""
+    if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+            or not 200 <= response.status_code < 300
+            or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
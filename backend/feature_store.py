@@ -0,0 +1,377 @@
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from caption_features import caption_columns, CAPTION_COLUMNS, HASHTAG_COLUMNS
+from config import LOCAL_PROFILE_DIR, HASHTAG_BUCKETS, COMPARE_WORKERS, FEATURE_STORE_CACHE_SIZE
+from downsample import bucket_starts, lttb
+from file_lock import atomic_write
+from metrics import cache_result
+import profile_layout
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+STORE_FILE = 'features.npz'
+STORE_VERSION = 3  # bump when the stored columns change; older stores are rebuilt from posts.json
+
+
+def _empty_columns():
+    return {
+        'post_id': np.array([], dtype=str),
+        'timestamp': np.array([], dtype=str),
+        'ts': np.array([], dtype=np.int64),
+        'hour': np.array([], dtype=np.int8),
+        'weekday': np.array([], dtype=np.int8),
+        'is_peak_hour': np.array([], dtype=np.int8),
+        'is_weekday': np.array([], dtype=np.int8),
+        'likes': np.array([], dtype=np.int64),
+        'comments': np.array([], dtype=np.int64),
+        'caption_length': np.array([], dtype=np.int32),
+        'hashtag_count': np.array([], dtype=np.int32),
+        'mention_count': np.array([], dtype=np.int32),
+        'emoji_count': np.array([], dtype=np.int32),
+        'hashtag_bag': np.zeros((0, HASHTAG_BUCKETS), dtype=np.int16),
+    }
+
+
+def posts_to_columns(posts):
+    """Typed feature columns for a list of posts (rows with a bad timestamp or likes are dropped)."""
+    if not posts:
+        return _empty_columns()
+    timestamps = pd.to_datetime([post.get('timestamp') for post in posts], utc=True, format='ISO8601', errors='coerce')
+    likes = pd.to_numeric(pd.Series([post.get('likes_count') for post in posts]), errors='coerce').to_numpy()
+    comments = pd.to_numeric(pd.Series([post.get('comments_count') for post in posts]), errors='coerce').to_numpy()
+    valid = ~(timestamps.isna() | np.isnan(likes))
+    hour = timestamps.hour.to_numpy()[valid].astype(np.int8)
+    weekday = timestamps.weekday.to_numpy()[valid].astype(np.int8)
+    captions = caption_columns([post.get('caption') for post in posts], [post.get('hashtags') or [] for post in posts])
+    return {
+        **{name: column[valid] for name, column in captions.items()},
+        'post_id': np.array([str(post.get('id')) for post in posts])[valid],
+        'timestamp': np.array([str(post.get('timestamp')) for post in posts])[valid],
+        'ts': timestamps[valid].as_unit('s').asi8.astype(np.int64),
+        'hour': hour,
+        'weekday': weekday,
+        'is_peak_hour': ((hour >= 12) & (hour <= 18)).astype(np.int8),
+        'is_weekday': (weekday < 5).astype(np.int8),
+        'likes': likes[valid].astype(np.int64),
+        'comments': np.nan_to_num(comments[valid]).astype(np.int64),
+    }
+
+
+class FeatureStore:
+    """
+    Precomputed feature columns for one profile plus hour x weekday aggregates
+    (sum, count and max likes per slot). Syncing with posts.json appends new
+    posts and patches the aggregates instead of rebuilding them, so best time
+    and best day are read from a 7x24 table. Persisted as features.npz next to
+    the profile's posts.json. If posts drop out of posts.json the store is
+    rebuilt from the file, so deleted posts leave the aggregates too.
+    """
+
+    def __init__(self, profile_path=None):
+        self.profile_path = Path(profile_path) if profile_path else None
+        self.lock = threading.Lock()
+        self.reset()
+        if self.profile_path:
+            self.load()
+
+    def reset(self):
+        """Drop every post and aggregate."""
+        self.columns = _empty_columns()
+        self.slot_sum = np.zeros((7, 24), dtype=np.int64)
+        self.slot_count = np.zeros((7, 24), dtype=np.int64)
+        self.slot_max = np.zeros((7, 24), dtype=np.int64)
+        self.source = (0.0, 0)  # posts.json (mtime, size) at the last sync
+        self.summaries = {}  # (source, bucket) -> summary(), dropped whenever the store changes
+
+    @classmethod
+    def from_posts(cls, posts):
+        """In-memory store for posts that do not belong to a profile directory."""
+        store = cls()
+        store.append(posts, merge=False)
+        return store
+
+    def __len__(self):
+        return len(self.columns['likes'])
+
+    @property
+    def store_path(self):
+        return self.profile_path / STORE_FILE
+
+    def load(self):
+        try:
+            with np.load(self.store_path) as data:
+                if int(data['version']) != STORE_VERSION:
+                    return
+                self.columns = {name: data[name] for name in _empty_columns()}
+                self.slot_sum, self.slot_count, self.slot_max = data['slot_sum'], data['slot_count'], data['slot_max']
+                self.source = (float(data['source'][0]), int(data['source'][1]))
+        except (FileNotFoundError, KeyError, ValueError):
+            pass
+
+    def save(self):
+        # Workers, corpus training and the viral index may save the same profile at once
+        with atomic_write(self.store_path) as file:
+            np.savez(file, slot_sum=self.slot_sum, slot_count=self.slot_count, slot_max=self.slot_max,
+                     source=np.array(self.source, dtype=np.float64), version=STORE_VERSION, **self.columns)
+
+    def append(self, posts, merge=True):
+        """
+        Add unseen posts and refresh the like counts of known ones. Returns the
+        number of new posts. With merge=False every row is appended as-is.
+        """
+        new = posts_to_columns(posts)
+        if not len(new['likes']):
+            return 0
+        if merge:
+            _, first = np.unique(new['post_id'][::-1], return_index=True)  # last occurrence of each id wins
+            keep = np.sort(len(new['post_id']) - 1 - first)
+            new = {name: col[keep] for name, col in new.items()}
+            known = np.isin(new['post_id'], self.columns['post_id'])
+        else:
+            known = np.zeros(len(new['likes']), dtype=bool)
+        if known.any():
+            self._update_known({name: col[known] for name, col in new.items()})
+        fresh = {name: col[~known] for name, col in new.items()}
+        count = len(fresh['likes'])
+        if count:
+            slots = (fresh['weekday'], fresh['hour'])
+            np.add.at(self.slot_sum, slots, fresh['likes'])
+            np.add.at(self.slot_count, slots, 1)
+            np.maximum.at(self.slot_max, slots, fresh['likes'])
+            self.columns = {name: np.concatenate([self.columns[name], fresh[name]]) for name in self.columns}
+        return count
+
+    def _update_known(self, updated):
+        """Apply new like/comment counts for posts already in the store."""
+        index = {post_id: i for i, post_id in enumerate(self.columns['post_id'])}
+        rows = np.array([index[post_id] for post_id in updated['post_id']])
+        old_likes = self.columns['likes'][rows]
+        changed = old_likes != updated['likes']
+        self.columns['comments'][rows] = updated['comments']
+        if not changed.any():
+            return
+        rows, new_likes = rows[changed], updated['likes'][changed]
+        slots = (self.columns['weekday'][rows], self.columns['hour'][rows])
+        np.add.at(self.slot_sum, slots, new_likes - old_likes[changed])
+        self.columns['likes'][rows] = new_likes
+        # A max can go down, so recompute it for the touched slots only
+        for day, hour in set(zip(*slots)):
+            in_slot = (self.columns['weekday'] == day) & (self.columns['hour'] == hour)
+            self.slot_max[day, hour] = self.columns['likes'][in_slot].max()
+
+    def sync(self):
+        """
+        Bring the store up to date with posts.json if the file changed since the
+        last sync. New posts are appended; if any stored post is no longer in
+        the file the store is rebuilt from it. An empty store is kept in memory
+        when posts.json is gone.
+        """
+        posts_path = self.profile_path / 'posts.json'
+        with self.lock:
+            if not posts_path.exists():
+                if self.source != (0.0, 0):
+                    self.reset()
+                return 0
+            stat = posts_path.stat()
+            unchanged = (stat.st_mtime, stat.st_size) == self.source
+            cache_result('feature_store', unchanged)
+            if unchanged:
+                return 0
+            with open(posts_path, 'r', encoding='utf-8') as file:
+                posts = json.load(file)
+            if not np.isin(self.columns['post_id'], [str(post.get('id')) for post in posts]).all():
+                self.reset()
+            added = self.append(posts)
+            self.source = (stat.st_mtime, stat.st_size)
+            self.save()
+            return added
+
+    # Reads
+
+    def best_time(self):
+        """Hour with the highest average likes, from the slot aggregates."""
+        counts = self.slot_count.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            averages = np.where(counts > 0, self.slot_sum.sum(axis=0) / counts, -np.inf)
+        return int(np.argmax(averages))
+
+    def best_day(self):
+        """Weekday with the highest average likes, from the slot aggregates."""
+        counts = self.slot_count.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            averages = np.where(counts > 0, self.slot_sum.sum(axis=1) / counts, -np.inf)
+        return DAYS[int(np.argmax(averages))]
+
+    def engagement_trend(self, bucket=None, max_points=None):
+        """
+        Average likes per distinct timestamp, in timestamp order. With a bucket
+        ('day', 'week' or 'month') points are per bucket start and also carry
+        the post count; with max_points the series is thinned with LTTB.
+        """
+        if bucket:
+            starts, inverse = np.unique(bucket_starts(self.columns['ts'], bucket), return_inverse=True)
+            counts = np.bincount(inverse)
+            means = np.bincount(inverse, weights=self.columns['likes']) / counts
+            x = starts.astype(np.int64)
+            labels = np.datetime_as_string(starts, unit='D')
+        else:
+            labels, first, inverse = np.unique(self.columns['timestamp'], return_index=True, return_inverse=True)
+            counts = None
+            means = np.bincount(inverse, weights=self.columns['likes']) / np.bincount(inverse)
+            x = self.columns['ts'][first]
+        keep = lttb(x, means, max_points) if max_points else np.arange(len(means))
+        if counts is None:
+            return [{'timestamp': str(labels[i]), 'likes_count': float(means[i])} for i in keep]
+        return [{'timestamp': str(labels[i]), 'likes_count': float(means[i]), 'posts': int(counts[i])} for i in keep]
+
+    def stats(self, bucket=None, max_points=None):
+        """
+        The (stats, best_time, best_day, top_post, engagement_trend) tuple served
+        by /api/stats; bucket and max_points shape the trend (see engagement_trend).
+        Holds the lock, since sync updates the columns in place.
+        """
+        with self.lock:
+            if not len(self):
+                return None
+            likes = self.columns['likes']
+            stats = [
+                {'name': 'Total Posts', 'value': len(self)},
+                {'name': 'Average Likes', 'value': int(likes.mean())},
+                {'name': 'Average Comments', 'value': int(self.columns['comments'].mean())}
+            ]
+            top = int(np.argmax(likes))
+            top_post = {
+                'id': str(self.columns['post_id'][top]),
+                'likes': int(likes[top]),
+                'timestamp': str(self.columns['timestamp'][top])
+            }
+            return stats, self.best_time(), self.best_day(), top_post, self.engagement_trend(bucket, max_points)
+
+    def summary(self, bucket='week'):
+        """
+        Headline metrics for side-by-side comparison, plus the bucketed
+        engagement trend as {bucket start: (average likes, posts)}. Cached
+        until the next sync changes the store.
+        """
+        with self.lock:
+            return self._summary(bucket)
+
+    def _summary(self, bucket):
+        key = (self.source, bucket)
+        cached = self.summaries.get(key)
+        cache_result('profile_summary', cached is not None)
+        if cached is not None:
+            return cached
+        if not len(self):
+            return None
+        ts = self.columns['ts']
+        weeks = max((int(ts.max()) - int(ts.min())) / (7 * 86400), 1)
+        top = int(np.argmax(self.columns['likes']))
+        summary = {
+            'totalPosts': len(self),
+            'averageLikes': round(float(self.columns['likes'].mean()), 2),
+            'averageComments': round(float(self.columns['comments'].mean()), 2),
+            'bestTime': self.best_time(),
+            'bestDay': self.best_day(),
+            'postsPerWeek': round(len(self) / weeks, 2),
+            'firstPost': str(self.columns['timestamp'][int(np.argmin(ts))]),
+            'lastPost': self.watermark(),
+            'topPost': {'id': str(self.columns['post_id'][top]), 'likes': int(self.columns['likes'][top])},
+            'trend': {point['timestamp']: (point['likes_count'], point['posts'])
+                      for point in self.engagement_trend(bucket)},
+        }
+        self.summaries = {key: summary}
+        return summary
+
+    def training_frame(self):
+        """The hour/day and caption feature frame retrain_model.prepare_data expects."""
+        frame = pd.DataFrame({
+            'hour': self.columns['hour'].astype(np.int64),
+            'day_of_week': np.array(DAYS)[self.columns['weekday']],
+            'is_peak_hour': self.columns['is_peak_hour'].astype(np.int64),
+            'is_weekday': self.columns['is_weekday'].astype(np.int64),
+            **{name: self.columns[name] for name in CAPTION_COLUMNS},
+            'likes_count': self.columns['likes'],
+        })
+        tags = pd.DataFrame(self.columns['hashtag_bag'], columns=HASHTAG_COLUMNS)
+        return pd.concat([frame, tags], axis=1)
+
+    def watermark(self):
+        """Timestamp string of the newest post in the store."""
+        if not len(self):
+            return None
+        return str(self.columns['timestamp'][int(np.argmax(self.columns['ts']))])
+
+
+_stores = OrderedDict()  # (profile_dir, username) -> FeatureStore, least recently used first
+_stores_lock = threading.Lock()
+
+
+def get_store(username, profile_dir=LOCAL_PROFILE_DIR):
+    """
+    Synced feature store for a profile. The FEATURE_STORE_CACHE_SIZE most
+    recently used stores stay in memory between requests; a store whose
+    posts.json is gone is dropped.
+    """
+    key = (str(profile_dir), username)
+    with _stores_lock:
+        store = _stores.pop(key, None)
+        if store is None:
+            store = FeatureStore(profile_layout.profile_dir(username, profile_dir))
+        _stores[key] = store
+        while len(_stores) > FEATURE_STORE_CACHE_SIZE:
+            _stores.popitem(last=False)
+    store.sync()
+    if not (store.profile_path / 'posts.json').exists():
+        with _stores_lock:
+            _stores.pop(key, None)
+    return store
+
+
+def compare_profiles(usernames, bucket='week', profile_dir=LOCAL_PROFILE_DIR, workers=COMPARE_WORKERS):
+    """
+    Summaries of several profiles, computed concurrently and aligned on one
+    timeline. Returns (timeline, profiles, missing): `profiles` follows the
+    order of `usernames`, and each trend lists one value per timeline bucket
+    (None where the profile did not post).
+    """
+    def summarize(username):
+        if not profile_layout.profile_path(username, 'posts.json', profile_dir).exists():
+            return None
+        return get_store(username, profile_dir).summary(bucket)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(usernames)))) as executor:
+        summaries = list(executor.map(summarize, usernames))
+
+    timeline = sorted(set().union(*(summary['trend'] for summary in summaries if summary)))
+    profiles, missing = [], []
+    for username, summary in zip(usernames, summaries):
+        if not summary:
+            missing.append(username)
+            continue
+        trend = summary['trend']
+        profiles.append({
+            'username': username,
+            **{key: value for key, value in summary.items() if key != 'trend'},
+            'engagementTrend': [trend[start][0] if start in trend else None for start in timeline],
+            'postsTrend': [trend[start][1] if start in trend else 0 for start in timeline],
+        })
+    return timeline, profiles, missing
+
+
+def store_for_posts_file(posts_path, profile_dir=LOCAL_PROFILE_DIR):
+    """The profile's store if posts_path is a profile's posts.json under profile_dir, else None."""
+    posts_path = profile_layout.resolve(posts_path, profile_dir)
+    username = posts_path.parent.name
+    if posts_path.name != 'posts.json' or \
+            posts_path.parent.resolve() != profile_layout.profile_dir(username, profile_dir).resolve():
+        return None
+    if not posts_path.exists():
+        return None
+    return get_store(username, profile_dir)
@@ -0,0 +1,104 @@
+"""
+Cross-process locks for read-modify-write cycles on shared files under
+LOCAL_DATA_DIR: the model pointer, the profile manifest, the fetch cache.
+
+    with file_lock(path.with_suffix('.lock')):
+        ...read, change and atomically replace the file...
+
+Locks are fcntl.flock locks on a separate lock file, so they serialize
+threads, gunicorn workers and standalone scripts alike. They are not
+reentrant: do not take the same lock again inside the block. Where fcntl
+is unavailable (Windows development) they only hold within one process.
+
+Files rewritten without a lock (last writer wins) go through atomic_write,
+whose temp file is unique per writer:
+
+    with atomic_write(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+"""
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+def _local_lock(path):
+    with _local_locks_guard:
+        return _local_locks.setdefault(str(Path(path).resolve()), threading.Lock())
+
+
+class _HeldLock:
+    """Stand-in for a locked file where fcntl is unavailable; close() releases it."""
+
+    def __init__(self, lock):
+        self.lock = lock
+
+    def close(self):
+        self.lock.release()
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on `path` (created if missing) for the duration of the block."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        with _local_lock(path):
+            yield
+        return
+    with open(path, 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def try_lock(path):
+    """
+    Take an exclusive lock on `path` without waiting. Returns the open lock
+    file, which holds the lock until it is closed or the process exits, or
+    None when another process (or another handle in this one) holds it.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        lock = _local_lock(path)
+        return _HeldLock(lock) if lock.acquire(blocking=False) else None
+    handle = open(path, 'a')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+@contextmanager
+def atomic_write(path, mode='wb', encoding=None):
+    """
+    Open a uniquely named temp file beside `path` and replace `path` with it
+    when the block succeeds (it is removed if the block raises). Concurrent
+    writers never share a temp file, and readers see the old or new file whole.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle = tempfile.NamedTemporaryFile(mode, encoding=encoding, dir=path.parent, prefix=f'{path.name}.',
+                                         suffix='.tmp', delete=False)
+    tmp_path = Path(handle.name)
+    try:
+        with handle:
+            yield handle
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, path)
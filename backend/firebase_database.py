@@ -3,24 +3,32 @@ import os
 import json
 import base64
 from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
 from datetime import datetime
 from dataclasses import dataclass
+from metrics import timed
+from backends import FIRESTORE_BACKEND, MemoryFirestore
 
 # Load environment variables
 load_dotenv()
 
-# Decode the base64-encoded service account key
-service_account_key_base64 = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY")
-service_account_key = json.loads(base64.b64decode(service_account_key_base64).decode("utf-8"))
-print("Decoded key")
+if FIRESTORE_BACKEND == 'memory':
+    # In-memory stand-in (see backends.py); no service account needed
+    db = MemoryFirestore()
+    print("Using in-memory Firestore.")
+else:
+    import firebase_admin
+    from firebase_admin import credentials, firestore
 
-# Initialize Firebase
-cred = credentials.Certificate(service_account_key)
-firebase_admin.initialize_app(cred)
-db = firestore.client()
-print("Firebase initialized.")
+    # Decode the base64-encoded service account key
+    service_account_key_base64 = os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY")
+    service_account_key = json.loads(base64.b64decode(service_account_key_base64).decode("utf-8"))
+    print("Decoded key")
+
+    # Initialize Firebase
+    cred = credentials.Certificate(service_account_key)
+    firebase_admin.initialize_app(cred)
+    db = firestore.client()
+    print("Firebase initialized.")
 
 @dataclass
 class UserData:
@@ -43,10 +51,12 @@ class UserData:
     avg_likes: float
     avg_comments: float
 
+@timed('firestore')
 def has_profile_been_scraped(username):
     doc = db.collection("profiles").document(username).get()
     return doc.exists
 
+@timed('firestore')
 def get_scraped_post_ids(username):
     doc = db.collection("scrap_cache").document(username).get()
     if doc.exists:
@@ -65,6 +75,7 @@ def avg_comments(posts):
         total_comments += post["node"]["edge_media_to_comment"]["count"]
     return total_comments / len(posts) if posts else 0
 
+@timed('firestore')
 def update_scraped_post_ids(username, new_ids):
     doc_ref = db.collection("scrap_cache").document(username)
     doc = doc_ref.get()
@@ -81,6 +92,7 @@ def update_scraped_post_ids(username, new_ids):
         "last_updated": datetime.utcnow().isoformat()
     })
 
+@timed('firestore')
 def create_user(user_data):
     """
     Creates a user document in the Firestore database.
@@ -112,6 +124,7 @@ def create_user(user_data):
     print(f"User {user_data.username} created in Firestore.")
     return True
 
+@timed('firestore')
 def upload_posts_to_firestore(username, posts_file_path):
     """
     Uploads posts from a JSON file to the Firestore 'posts' collection.
@@ -0,0 +1,165 @@
+import json
+import threading
+import time
+
+from config import LOCAL_PROFILE_DIR, HASHTAG_INDEX_FILE, HASHTAG_INDEX_REFRESH_SECONDS, HASHTAG_INDEX_SAVE_SECONDS
+from file_lock import atomic_write
+from metrics import timed
+import profile_layout
+
+
+def normalize_tag(tag):
+    """'#Mango' and 'mango' index to the same key."""
+    return tag.strip().lstrip('#').lower()
+
+
+class HashtagIndex:
+    """
+    Inverted index from hashtag to (profile, post id, likes, comments, timestamp)
+    across every profile under LOCAL_PROFILE_DIR, with running per-tag totals so
+    lookups and top-N queries never rescan posts.json files.
+
+    Profiles are re-indexed only when their posts.json mtime or size changes.
+    The index file is rewritten at most once per HASHTAG_INDEX_SAVE_SECONDS;
+    changes not yet saved when the process exits are picked up again by the
+    next refresh, since the saved mtimes and sizes no longer match.
+    """
+
+    def __init__(self, index_file=HASHTAG_INDEX_FILE, profile_dir=LOCAL_PROFILE_DIR):
+        self.index_file = index_file
+        self.profile_dir = profile_dir
+        self.lock = threading.Lock()
+        self.profiles = {}  # username -> {'mtime', 'size', 'tags'}
+        self.tags = {}  # tag -> {'postings': [...], 'likes', 'comments', 'profiles'}
+        self.last_refresh = 0
+        self.last_save = 0
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            self.profiles = data.get('profiles', {})
+            self.tags = data.get('tags', {})
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.profiles, self.tags = {}, {}
+
+    def save(self):
+        # Every worker keeps its own index and saves it; the last save wins
+        with atomic_write(self.index_file, 'w', encoding='utf-8') as file:
+            json.dump({'profiles': self.profiles, 'tags': self.tags}, file)
+        self.last_save = time.time()
+        self.dirty = False
+
+    def _save_throttled(self, force=False):
+        """Save now if forced or the last save is old enough, otherwise leave it to a later call."""
+        self.dirty = True
+        if force or time.time() - self.last_save >= HASHTAG_INDEX_SAVE_SECONDS:
+            self.save()
+
+    def _remove_profile(self, username):
+        entry = self.profiles.pop(username, None)
+        if not entry:
+            return
+        for tag in entry['tags']:
+            bucket = self.tags.get(tag)
+            if not bucket:
+                continue
+            kept = [p for p in bucket['postings'] if p[0] != username]
+            if kept:
+                bucket['postings'] = kept
+                bucket['likes'] = sum(p[2] for p in kept)
+                bucket['comments'] = sum(p[3] for p in kept)
+                bucket['profiles'] -= 1
+            else:
+                del self.tags[tag]
+
+    def _add_profile(self, username, posts, stat):
+        tags = set()
+        for post in posts:
+            likes = post.get('likes_count') or 0
+            comments = post.get('comments_count') or 0
+            for tag in {normalize_tag(t) for t in post.get('hashtags') or []}:
+                if not tag:
+                    continue
+                bucket = self.tags.setdefault(tag, {'postings': [], 'likes': 0, 'comments': 0, 'profiles': 0})
+                if tag not in tags:
+                    bucket['profiles'] += 1
+                bucket['postings'].append([username, post['id'], likes, comments, post.get('timestamp')])
+                bucket['likes'] += likes
+                bucket['comments'] += comments
+                tags.add(tag)
+        self.profiles[username] = {'mtime': stat.st_mtime, 'size': stat.st_size, 'tags': sorted(tags)}
+
+    def update_profile(self, username, save=True):
+        """Re-index one profile if its posts.json changed. Returns True if the index changed."""
+        posts_path = profile_layout.profile_path(username, 'posts.json', self.profile_dir)
+        with self.lock:
+            if not posts_path.exists():
+                if username not in self.profiles:
+                    return False
+                self._remove_profile(username)
+            else:
+                stat = posts_path.stat()
+                entry = self.profiles.get(username)
+                if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+                    return False
+                try:
+                    with open(posts_path, 'r', encoding='utf-8') as file:
+                        posts = json.load(file)
+                except json.JSONDecodeError:
+                    print(f"Skipping {posts_path}: invalid JSON")
+                    return False
+                self._remove_profile(username)
+                self._add_profile(username, posts, stat)
+            if save:
+                self._save_throttled()
+            return True
+
+    @timed('hashtag_index_refresh')
+    def refresh(self, force=False):
+        """Pick up added, changed and deleted profiles (throttled unless forced)."""
+        if not force and time.time() - self.last_refresh < HASHTAG_INDEX_REFRESH_SECONDS:
+            return 0
+        self.last_refresh = time.time()
+        usernames = set(self.profiles) | set(profile_layout.list_usernames(self.profile_dir))
+        changed = sum(self.update_profile(username, save=False) for username in usernames)
+        with self.lock:
+            if changed or self.dirty:
+                self._save_throttled(force)
+        if changed:
+            print(f"Hashtag index updated for {changed} profiles.")
+        return changed
+
+    @staticmethod
+    def _summary(tag, bucket):
+        count = len(bucket['postings'])
+        return {
+            'tag': tag,
+            'usage_count': count,
+            'profiles': bucket['profiles'],
+            'avg_likes': round(bucket['likes'] / count, 2),
+            'avg_comments': round(bucket['comments'] / count, 2),
+        }
+
+    def lookup(self, tag, limit=10):
+        """Usage and average engagement for one hashtag, plus its top posts by likes."""
+        with self.lock:
+            bucket = self.tags.get(normalize_tag(tag))
+            if not bucket:
+                return None
+            summary = self._summary(normalize_tag(tag), bucket)
+            top = sorted(bucket['postings'], key=lambda p: p[2], reverse=True)[:limit]
+        summary['top_posts'] = [
+            {'username': p[0], 'id': p[1], 'likes': p[2], 'comments': p[3], 'timestamp': p[4]} for p in top
+        ]
+        return summary
+
+    def top(self, limit=20, sort='usage_count', min_count=1):
+        """Hashtags ranked by usage_count, avg_likes or avg_comments."""
+        with self.lock:
+            summaries = [self._summary(tag, bucket) for tag, bucket in self.tags.items()
+                         if len(bucket['postings']) >= min_count]
+        summaries.sort(key=lambda s: s[sort], reverse=True)
+        return summaries[:limit]
@@ -0,0 +1,228 @@
+"""
+Load test for the API with realistic request mixes.
+
+In-process mode (default) runs the Flask app in a scratch directory with the
+in-memory S3, Firestore and synthetic Apify stand-ins from backends.py, seeded
+with synthetic profiles. With --url it drives an already running deployment.
+
+    python load_test.py --mix browse --workers 8 --duration 30
+    python load_test.py --url http://staging:5000 --mix predict --requests 2000 --output load.json
+    python load_test.py --mix browse --baseline load.json
+
+Reports throughput and p50/p95/p99 latency per endpoint.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+# Endpoint weights per mix; 'scrape_new' hits accounts that have not been scraped yet
+MIXES = {
+    'browse': {'stats': 35, 'posts': 35, 'predict': 20, 'scrape_existing': 8, 'scrape_new': 2},
+    'predict': {'stats': 10, 'posts': 10, 'predict': 80},
+    'scrape': {'stats': 20, 'posts': 20, 'scrape_existing': 30, 'scrape_new': 30},
+}
+
+
+def build_request(kind, rng, usernames, new_usernames):
+    """(label, method, path, json body) for one request of the given kind."""
+    if kind == 'stats':
+        return '/api/stats', 'POST', '/api/stats', {'username': rng.choice(usernames)}
+    if kind == 'posts':
+        return '/api/posts/<username>', 'GET', f'/api/posts/{rng.choice(usernames)}', None
+    if kind == 'predict':
+        body = {'hour': rng.randrange(24), 'day': rng.choice(DAYS)}
+        if rng.random() < 0.5:
+            body['caption'] = 'Weekend cravings sorted #food #weekend @friend'
+        return '/api/predict/likes', 'POST', '/api/predict/likes', body
+    if kind == 'scrape_existing':
+        return '/api/scrape/<username>', 'POST', f'/api/scrape/{rng.choice(usernames)}', None
+    username = next(new_usernames)
+    return '/api/scrape/<username> (new)', 'POST', f'/api/scrape/{username}', None
+
+
+def prepare_workdir(workdir, profiles, posts_per_profile, seed):
+    """Seed a scratch data directory with synthetic profiles and the sample posts file."""
+    from synthetic_posts import generate_posts
+
+    source_dir = Path(__file__).resolve().parent
+    shutil.copy(source_dir / 'swiggyindia_posts.json', workdir / 'swiggyindia_posts.json')
+    usernames = []
+    for i in range(profiles):
+        username = f'loadtest_{i:04d}'
+        folder = workdir / 'data' / 'profiles' / username
+        folder.mkdir(parents=True)
+        with open(folder / 'posts.json', 'w', encoding='utf-8') as file:
+            json.dump(generate_posts(posts_per_profile, seed + i), file)
+        with open(folder / 'profile.json', 'w', encoding='utf-8') as file:
+            json.dump({'username': username, 'followersCount': 1000 * (i + 1), 'postsCount': posts_per_profile}, file)
+        usernames.append(username)
+    return usernames
+
+
+def in_process_sender():
+    """A send(method, path, body) -> status function backed by the Flask test client."""
+    os.environ.setdefault('STORAGE_BACKEND', 'memory')
+    os.environ.setdefault('FIRESTORE_BACKEND', 'memory')
+    os.environ.setdefault('APIFY_BACKEND', 'synthetic')
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    import app
+
+    client_local = threading.local()
+
+    def send(method, path, body):
+        client = getattr(client_local, 'client', None)
+        if client is None:
+            client = client_local.client = app.app.test_client()
+        return client.open(path, method=method, json=body).status_code
+
+    return send
+
+
+def http_sender(base_url):
+    import requests
+
+    session_local = threading.local()
+
+    def send(method, path, body):
+        session = getattr(session_local, 'session', None)
+        if session is None:
+            session = session_local.session = requests.Session()
+        return session.request(method, base_url.rstrip('/') + path, json=body, timeout=60).status_code
+
+    return send
+
+
+def run(send, mix, usernames, workers, duration, total_requests, seed):
+    kinds, weights = zip(*MIXES[mix].items())
+    counter = iter(range(10 ** 9))
+    new_usernames = (f'loadtest_new_{seed}_{i}' for i in counter)
+    lock = threading.Lock()
+    samples = []  # (label, seconds, status)
+    issued = [0]
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        while True:
+            with lock:
+                if total_requests and issued[0] >= total_requests:
+                    return
+                if deadline and time.perf_counter() >= deadline:
+                    return
+                issued[0] += 1
+                label, method, path, body = build_request(rng.choices(kinds, weights)[0], rng, usernames,
+                                                          new_usernames)
+            started = time.perf_counter()
+            try:
+                status = send(method, path, body)
+            except Exception:
+                status = 0
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples.append((label, elapsed, status))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(worker, range(workers)))
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, wall_seconds):
+    rows = []
+    groups = {}
+    for label, seconds, status in samples:
+        groups.setdefault(label, []).append((seconds, status))
+    groups['all'] = [(seconds, status) for _, seconds, status in samples]
+    for label, values in groups.items():
+        latencies = np.array([seconds for seconds, _ in values]) * 1000
+        errors = sum(1 for _, status in values if not 200 <= status < 400)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        rows.append({
+            'endpoint': label,
+            'requests': len(values),
+            'errors': errors,
+            'rps': round(len(values) / wall_seconds, 1),
+            'p50_ms': round(float(p50), 2),
+            'p95_ms': round(float(p95), 2),
+            'p99_ms': round(float(p99), 2),
+            'max_ms': round(float(latencies.max()), 2),
+        })
+    return rows
+
+
+def compare(results, baseline_path, tolerance):
+    """Print p95 slowdowns beyond `tolerance` against a baseline file."""
+    with open(baseline_path, 'r', encoding='utf-8') as file:
+        baseline = {r['endpoint']: r for r in json.load(file)['results']}
+    regressions = 0
+    for result in results:
+        base = baseline.get(result['endpoint'])
+        if not base or not base['p95_ms']:
+            continue
+        change = result['p95_ms'] / base['p95_ms'] - 1
+        flag = 'REGRESSION' if change > tolerance else 'ok'
+        regressions += flag == 'REGRESSION'
+        print(f"{result['endpoint']:<32} p95 {change:+.1%}  {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mix', choices=sorted(MIXES), default='browse')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20, help='seconds to run (ignored with --requests)')
+    parser.add_argument('--requests', type=int, help='stop after this many requests')
+    parser.add_argument('--url', help='target a running server instead of the in-process app')
+    parser.add_argument('--usernames', nargs='+', help='existing profiles to query (with --url)')
+    parser.add_argument('--profiles', type=int, default=20, help='synthetic profiles to seed (in-process)')
+    parser.add_argument('--posts-per-profile', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--baseline', help='compare against a previous --output file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p95 slowdown vs baseline')
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    with tempfile.TemporaryDirectory(prefix='viralyze_load_') as workdir:
+        if args.url:
+            if not args.usernames:
+                parser.error('--usernames is required with --url')
+            send, usernames = http_sender(args.url), args.usernames
+        else:
+            os.chdir(workdir)
+            usernames = prepare_workdir(Path(workdir), args.profiles, args.posts_per_profile, args.seed)
+            send = in_process_sender()
+        samples, wall_seconds = run(send, args.mix, usernames, args.workers,
+                                    None if args.requests else args.duration, args.requests, args.seed)
+
+    results = summarize(samples, wall_seconds)
+    print(f"\n{args.mix} mix, {args.workers} workers, {len(samples)} requests in {wall_seconds:.1f}s")
+    print(f"{'endpoint':<32}{'requests':>9}{'errors':>8}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for r in results:
+        print(f"{r['endpoint']:<32}{r['requests']:>9}{r['errors']:>8}{r['rps']:>8}"
+              f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'mix': args.mix, 'workers': args.workers,
+                       'target': args.url or 'in-process', 'results': results}, file, indent=2)
+        print(f"Results written to {output}")
+    if baseline:
+        if compare(results, baseline, args.tolerance):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
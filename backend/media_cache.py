@@ -0,0 +1,274 @@
+"""
+Disk cache for post and profile images, served by /api/media/<username>/<post_id>.
+
+Each image is fetched from its Instagram CDN URL once and stored under
+MEDIA_CACHE_DIR with its resized thumbnails. Least recently used files are
+evicted once the cache grows past MEDIA_CACHE_MAX_BYTES. With
+MEDIA_S3_MIRROR=1, cached files are also mirrored to S3 under media/, and a
+cold worker fills its cache from there before going to the CDN, whose links
+expire. Thumbnails are resized with Pillow.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import requests
+from PIL import Image
+
+from config import (LOCAL_PROFILE_DIR, MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES, MEDIA_THUMBNAIL_WIDTHS,
+                    MEDIA_FETCH_TIMEOUT, MEDIA_MAX_IMAGE_BYTES, MEDIA_CACHE_TMP_MAX_AGE_SECONDS)
+from file_lock import atomic_write
+from metrics import cache_result, timer
+import profile_layout
+
+MEDIA_S3_MIRROR = os.getenv('MEDIA_S3_MIRROR') == '1'
+EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp', 'image/gif': 'gif'}
+CONTENT_TYPES = {ext: content_type for content_type, ext in EXTENSIONS.items()}
+# Pseudo post ids for the profile picture
+PROFILE_PICTURES = {'profile': ('profilePicUrl', 'profile_pic_url'),
+                    'profile_hd': ('profilePicUrlHD', 'profile_pic_url_hd')}
+
+
+class MediaError(Exception):
+    """The image is unknown or its origin could not be fetched."""
+
+    def __init__(self, message, status=404):
+        super().__init__(message)
+        self.status = status
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class MediaCache:
+    """
+    Size-bounded LRU cache of image files. Files are named
+    <sha1(username/post_id)>-<variant>-<etag>.<ext>, so the in-memory index can
+    be rebuilt from the directory listing. Recency is the file mtime, which is
+    touched on every hit.
+    """
+
+    def __init__(self, cache_dir=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MAX_BYTES, profile_dir=LOCAL_PROFILE_DIR,
+                 s3_mirror=MEDIA_S3_MIRROR):
+        self.cache_dir = Path(cache_dir).resolve()
+        self.max_bytes = max_bytes
+        self.profile_dir = Path(profile_dir)
+        self.s3_mirror = s3_mirror
+        self.lock = threading.Lock()
+        self.fetching = {}  # key -> Lock, so concurrent misses fetch the origin once
+        self.entries = {}  # (key hash, variant) -> {'path', 'etag', 'size', 'content_type'}
+        self.total_bytes = 0
+        self.urls = {}  # username -> (posts.json mtime, profile.json mtime, {post_id: url})
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for path in self.cache_dir.glob('*/*'):
+            self._add_entry(path)
+
+    def _add_entry(self, path):
+        if path.name.endswith('.tmp'):
+            # Another worker may still be writing it; only leftovers from crashes are removed
+            try:
+                if path.stat().st_mtime < time.time() - MEDIA_CACHE_TMP_MAX_AGE_SECONDS:
+                    path.unlink()
+            except FileNotFoundError:
+                pass
+            return
+        try:
+            key_hash, variant, rest = path.name.split('-', 2)
+            etag, ext = rest.rsplit('.', 1)
+        except ValueError:
+            return
+        size = path.stat().st_size
+        self.entries[(key_hash, variant)] = {'path': path, 'etag': etag, 'size': size,
+                                             'content_type': CONTENT_TYPES.get(ext, 'application/octet-stream')}
+        self.total_bytes += size
+
+    # Origin URLs
+
+    def resolve_url(self, username, post_id):
+        """CDN URL recorded by the scraper for a post, or for 'profile'/'profile_hd'."""
+        folder = profile_layout.profile_dir(username, self.profile_dir)
+        mtimes = []
+        for name in ('posts.json', 'profile.json'):
+            try:
+                mtimes.append((folder / name).stat().st_mtime)
+            except FileNotFoundError:
+                mtimes.append(None)
+        cached = self.urls.get(username)
+        if not cached or cached[:2] != tuple(mtimes):
+            urls = {}
+            for post in _read_json(folder / 'posts.json') or []:
+                if post.get('displayUrl'):
+                    urls[str(post['id'])] = post['displayUrl']
+            profile = _read_json(folder / 'profile.json') or {}
+            for pseudo_id, fields in PROFILE_PICTURES.items():
+                url = next((profile[field] for field in fields if profile.get(field)), None)
+                if url:
+                    urls[pseudo_id] = url
+            cached = self.urls[username] = (*mtimes, urls)
+        return cached[2].get(str(post_id))
+
+    # Cache entries
+
+    def get(self, username, post_id, width=None):
+        """(path, etag, content_type) for the image, fetching and resizing it on a miss."""
+        if width and width not in MEDIA_THUMBNAIL_WIDTHS:
+            raise MediaError(f'Unsupported width {width}; use one of {list(MEDIA_THUMBNAIL_WIDTHS)}', 400)
+        key = f'{username}/{post_id}'
+        if post_id in PROFILE_PICTURES:
+            # Profile pictures change; keying them by URL makes a new picture a new entry
+            key += '/' + (self.resolve_url(username, post_id) or '')
+        key_hash = hashlib.sha1(key.encode()).hexdigest()
+        variant = f'w{width}' if width else 'orig'
+        entry = self._lookup(key_hash, variant)
+        cache_result('media', entry is not None)
+        if entry:
+            return entry['path'], entry['etag'], entry['content_type']
+
+        with self.lock:
+            fetch_lock = self.fetching.setdefault(key_hash, threading.Lock())
+        with fetch_lock:
+            entry = self._lookup(key_hash, variant)
+            if not entry:
+                original = self._lookup(key_hash, 'orig') or self._fill_original(username, post_id, key_hash)
+                if variant != 'orig':
+                    entry = self._store(key_hash, variant, _thumbnail(original['path'].read_bytes(), width),
+                                        original['content_type'], username, post_id)
+                else:
+                    entry = original
+        with self.lock:
+            self.fetching.pop(key_hash, None)
+        return entry['path'], entry['etag'], entry['content_type']
+
+    def _lookup(self, key_hash, variant):
+        with self.lock:
+            entry = self.entries.get((key_hash, variant))
+        if entry:
+            try:
+                os.utime(entry['path'])
+            except FileNotFoundError:
+                with self.lock:
+                    if self.entries.pop((key_hash, variant), None):
+                        self.total_bytes -= entry['size']
+                return None
+        return entry
+
+    def _fill_original(self, username, post_id, key_hash):
+        if self.s3_mirror:
+            entry = self._from_mirror(username, post_id, key_hash)
+            if entry:
+                return entry
+        url = self.resolve_url(username, post_id)
+        if not url:
+            raise MediaError(f'No image recorded for {username}/{post_id}')
+        body, content_type = fetch_image(url)
+        return self._store(key_hash, 'orig', body, content_type, username, post_id)
+
+    def _store(self, key_hash, variant, body, content_type, username, post_id):
+        etag = hashlib.sha256(body).hexdigest()[:20]
+        ext = EXTENSIONS.get(content_type, 'bin')
+        path = self.cache_dir / key_hash[:2] / f'{key_hash}-{variant}-{etag}.{ext}'
+        with atomic_write(path) as file:
+            file.write(body)
+        entry = {'path': path, 'etag': etag, 'size': len(body), 'content_type': content_type}
+        with self.lock:
+            old = self.entries.get((key_hash, variant))
+            if old and old['path'] != path:
+                old['path'].unlink(missing_ok=True)
+            self.total_bytes += len(body) - (old['size'] if old else 0)
+            self.entries[(key_hash, variant)] = entry
+        if self.s3_mirror:
+            from aws_s3_storage import upload_file_to_s3
+            upload_file_to_s3(path, f'media/{username}/{post_id}/{path.name}')
+        self.evict()
+        return entry
+
+    def _from_mirror(self, username, post_id, key_hash):
+        from aws_s3_storage import fetch_from_s3, s3, bucket_name
+
+        prefix = f'media/{username}/{post_id}/'
+        try:
+            with timer('s3_list'):
+                listing = s3.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
+        except Exception as e:
+            print(f"Media mirror listing failed for {prefix}: {e}")
+            return None
+        names = [item['Key'][len(prefix):] for item in listing.get('Contents', [])]
+        name = next((n for n in names if n.startswith(f'{key_hash}-orig-')), None)
+        if not name:
+            return None
+        path = self.cache_dir / key_hash[:2] / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not fetch_from_s3(prefix + name, path):
+            return None
+        with self.lock:
+            self._add_entry(path)
+        self.evict()
+        return self.entries.get((key_hash, 'orig'))
+
+    def evict(self):
+        """Drop least recently used files until the cache fits in max_bytes. Returns the number removed."""
+        with self.lock:
+            if self.total_bytes <= self.max_bytes:
+                return 0
+            entries = sorted(self.entries.items(), key=lambda item: _mtime(item[1]['path']))
+            removed = 0
+            for key, entry in entries:
+                if self.total_bytes <= self.max_bytes:
+                    break
+                entry['path'].unlink(missing_ok=True)
+                del self.entries[key]
+                self.total_bytes -= entry['size']
+                removed += 1
+        return removed
+
+    def stats(self):
+        with self.lock:
+            return {'files': len(self.entries), 'bytes': self.total_bytes, 'max_bytes': self.max_bytes}
+
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0
+
+
+def fetch_image(url):
+    """Download an image from its origin. Returns (bytes, content_type)."""
+    try:
+        with timer('media_fetch'):
+            response = requests.get(url, timeout=MEDIA_FETCH_TIMEOUT, stream=True)
+            if response.status_code != 200:
+                raise MediaError(f'Origin returned {response.status_code} for {url}', 502)
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+            if content_type not in EXTENSIONS:
+                raise MediaError(f'Origin returned {content_type or "no content type"} for {url}', 502)
+            body = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                body.extend(chunk)
+                if len(body) > MEDIA_MAX_IMAGE_BYTES:
+                    raise MediaError(f'Image larger than {MEDIA_MAX_IMAGE_BYTES} bytes: {url}', 502)
+    except requests.RequestException as e:
+        raise MediaError(f'Could not fetch {url}: {e}', 502)
+    return bytes(body), content_type
+
+
+def _thumbnail(body, width):
+    """Resize to `width` pixels wide (never upscaling), keeping the format."""
+    with Image.open(io.BytesIO(body)) as image:
+        image_format = image.format
+        if image.width > width:
+            # thumbnail() would fit a box and can land a pixel short of `width`
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format=image_format)
+    return output.getvalue()
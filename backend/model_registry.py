@@ -0,0 +1,121 @@
+"""
+Versioned model publishing and hot reload across worker processes.
+
+Every model written to MODEL_PATH is published as an immutable copy,
+LOCAL_MODEL_DIR/versions/v<version>.joblib. A pointer file (MODEL_POINTER_FILE)
+is then atomically replaced to name it. Each worker's ModelWatcher stats the
+pointer at most once per MODEL_POLL_SECONDS. When the pointer changes, the
+new version loads on a background thread and is swapped in with a single
+assignment, so requests never see a half-loaded model. Publishing holds a
+file lock next to the pointer, so processes retraining at the same time
+never claim the same version.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import joblib
+
+from config import LOCAL_MODEL_DIR, MODEL_POINTER_FILE, MODEL_VERSIONS_DIR, MODEL_VERSIONS_KEEP, MODEL_POLL_SECONDS
+from file_lock import file_lock
+from metrics import inc, set_gauge, timer
+
+MODEL_PATH = LOCAL_MODEL_DIR / 'likes_predictor.joblib'
+
+
+def read_pointer(pointer_file=MODEL_POINTER_FILE):
+    try:
+        with open(pointer_file, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def publish_model(model_path=MODEL_PATH, pointer_file=MODEL_POINTER_FILE, versions_dir=MODEL_VERSIONS_DIR):
+    """Snapshot model_path as the next version and point every worker at it. Returns the version."""
+    # Held across read-version, copy and pointer replace, in every process that publishes
+    with file_lock(pointer_file.with_suffix('.lock')):
+        pointer = read_pointer(pointer_file) or {}
+        version = pointer.get('version', 0) + 1
+        versions_dir.mkdir(parents=True, exist_ok=True)
+        artifact = versions_dir / f'v{version:06d}.joblib'
+        tmp_path = artifact.with_suffix('.tmp')
+        shutil.copyfile(model_path, tmp_path)
+        os.replace(tmp_path, artifact)
+
+        tmp_pointer = pointer_file.with_suffix('.tmp')
+        with open(tmp_pointer, 'w', encoding='utf-8') as file:
+            json.dump({'version': version, 'artifact': artifact.name,
+                       'published_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, file)
+        os.replace(tmp_pointer, pointer_file)
+
+        # Older versions stay around for workers still loading them
+        for old in sorted(versions_dir.glob('v*.joblib'))[:-MODEL_VERSIONS_KEEP]:
+            old.unlink()
+    print(f"Published model version {version}.")
+    return version
+
+
+class ModelWatcher:
+    """Serves the current (model, feature_names, version) and follows the pointer file."""
+
+    def __init__(self, pointer_file=MODEL_POINTER_FILE, versions_dir=MODEL_VERSIONS_DIR,
+                 poll_seconds=MODEL_POLL_SECONDS):
+        self.pointer_file = pointer_file
+        self.versions_dir = versions_dir
+        self.poll_seconds = poll_seconds
+        self.state = (None, None, 0)  # swapped as a whole, never mutated
+        self.caption_defaults = {}  # caption features for requests without a caption (see caption_defaults)
+        self.pointer_mtime = None
+        self.next_check = 0
+        self.loading = threading.Lock()
+
+    def current(self):
+        """The active (model, feature_names, version); starts a background reload when the pointer moved."""
+        now = time.monotonic()
+        if now >= self.next_check:
+            self.next_check = now + self.poll_seconds
+            try:
+                mtime = os.stat(self.pointer_file).st_mtime
+            except FileNotFoundError:
+                mtime = None
+            if mtime != self.pointer_mtime and self.loading.acquire(blocking=False):
+                threading.Thread(target=self._reload_locked, daemon=True).start()
+        return self.state
+
+    def reload(self):
+        """Load the pointed-to version now (used at startup and after a retrain in this worker)."""
+        with self.loading:
+            self._reload()
+        return self.state
+
+    def _reload_locked(self):
+        try:
+            self._reload()
+        finally:
+            self.loading.release()
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.pointer_file).st_mtime
+        except FileNotFoundError:
+            return
+        pointer = read_pointer(self.pointer_file)
+        if not pointer:
+            return
+        if pointer['version'] != self.state[2]:
+            try:
+                with timer('model_load'):
+                    artifact = joblib.load(self.versions_dir / pointer['artifact'])
+            except (FileNotFoundError, EOFError) as e:
+                print(f"Could not load model version {pointer['version']}: {e}")
+                return
+            self.caption_defaults = artifact.get('caption_defaults', {})
+            self.state = (artifact['model'], artifact['feature_names'], pointer['version'])
+            inc('viralyze_model_reloads_total', help_text='Model versions loaded by this worker.')
+            set_gauge('viralyze_model_version', pointer['version'], 'Model version served by this worker.')
+            print(f"💫 Model version {pointer['version']} loaded.")
+        self.pointer_mtime = mtime
@@ -1,23 +1,30 @@
 import pandas as pd
-from datetime import datetime
 import numpy as np
+from feature_store import FeatureStore
+from metrics import timer, timed
 
 # Make a prediction for a new post (using only hour and day_of_week)
-def predict_likes(model, feature_names, hour, day_of_week):
+def predict_likes(model, feature_names, hour, day_of_week, extra_features=None):
     if model is None:
         return "Model not trained. Please check the data file."
     # Create a DataFrame with the input features
+    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    day_of_week = day_of_week.strip().capitalize()  # 'monday' and ' MONDAY' are accepted too
     input_data = pd.DataFrame({
         'hour': [hour],
         'is_peak_hour': [1 if 12 <= hour <= 18 else 0],
-        'is_weekday': [1 if datetime.strptime(day_of_week, '%A').weekday() < 5 else 0]
+        'is_weekday': [1 if days.index(day_of_week) < 5 else 0]
     })
 
-    # Add one-hot encoded day_of_week columns (excluding the first day as reference)
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    for day in days[1:]:
+    # One-hot encoded day_of_week columns; the reference day get_dummies dropped
+    # in training (Monday, the first of DAYS) is not in feature_names and is dropped below
+    for day in days:
         input_data[f'day_of_week_{day}'] = [1 if day == day_of_week else 0]
 
+    # Profile-level features used by the corpus model (followers, posts_count, ...)
+    for col, value in (extra_features or {}).items():
+        input_data[col] = [value]
+
     # Ensure all columns match the training set
     for col in feature_names:
         if col not in input_data.columns:
@@ -27,74 +34,44 @@ def predict_likes(model, feature_names, hour, day_of_week):
     input_data = input_data[feature_names]
 
     # Predict
-    prediction = model.predict(input_data)[0]
+    with timer('model_predict'):
+        prediction = model.predict(input_data)[0]
     return max(0, int(prediction))  # Ensure non-negative integer
 
 
-# Extract features from the dataset (for stats calculation)
-def extract_features(data):
-    print("extracting fetaures..................")
-    if not data:
-        return pd.DataFrame()
-    features = []
-    for i, post in enumerate(data):
-        dt = datetime.fromisoformat(post['timestamp'].replace('Z', '+00:00'))
-
-        # Basic features
-        hour = dt.hour
-        day_of_week = dt.strftime('%A')
-        is_peak_hour = 1 if 12 <= hour <= 18 else 0
-        is_weekday = 1 if dt.weekday() < 5 else 0
-
-        # Calculate days since the first post (for stats, not prediction)
-        first_post_dt = datetime.fromisoformat(data[0]['timestamp'].replace('Z', '+00:00'))
-        days_since_first_post = (first_post_dt - dt).days
-
-        # Calculate average likes of the last 5 posts (for stats, not prediction)
-        avg_likes_last_5 = 0
-        if i >= 5:
-            prev_likes = [data[j]['likes_count'] for j in range(i - 5, i)]
-            avg_likes_last_5 = np.mean(prev_likes)
-
-        # Store features and target
-        features.append({
-            'hour': hour,
-            'day_of_week': day_of_week,
-            'is_peak_hour': is_peak_hour,
-            'is_weekday': is_weekday,
-            'days_since_first_post': days_since_first_post,
-            'avg_likes_last_5': avg_likes_last_5,
-            'likes_count': post['likes_count'],
-            'post_id': post['id'],
-            'timestamp': post['timestamp']
-        })
-
-    # Create a DataFrame from the features
-    df = pd.DataFrame(features)
-    
-    # Calculate stats as an array of objects
-    stats = [
-        {'name': 'Total Posts', 'value': len(df)},
-        {'name': 'Average Likes', 'value': int(df['likes_count'].mean())},
-        {'name': 'Average Comments', 'value': int(sum([post['comments_count'] for post in data]) / len(data))}
-    ]
+def predict_likes_bulk(model, feature_names, hours, weekdays, extra_features=None):
+    """
+    Predicted likes for many (hour, weekday) slots in one model call. Builds
+    the same columns as predict_likes; weekdays are 0 (Monday) to 6.
+    """
+    hours = np.asarray(hours)
+    weekdays = np.asarray(weekdays)
+    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    input_data = pd.DataFrame({
+        'hour': hours,
+        'is_peak_hour': ((hours >= 12) & (hours <= 18)).astype(int),
+        'is_weekday': (weekdays < 5).astype(int),
+        **{f'day_of_week_{day}': (weekdays == i).astype(int) for i, day in enumerate(days)},
+        **{col: value for col, value in (extra_features or {}).items()},
+    }, index=range(len(hours)))
+    input_data = input_data.reindex(columns=feature_names, fill_value=0)
+    with timer('model_predict'):
+        predictions = model.predict(input_data)
+    return np.maximum(predictions, 0)
 
-    # Best time to post (hour with highest average likes)
-    best_time = df.groupby('hour')['likes_count'].mean().idxmax()
 
-    # Best day to post (day with highest average likes)
-    best_day = df.groupby('day_of_week')['likes_count'].mean().idxmax()
+def profile_features(followers, posts_count=0):
+    """Per-profile normalization features expected by the corpus model."""
+    return {'followers': followers, 'log_followers': np.log1p(followers), 'posts_count': posts_count}
 
-    # Top post (post with the most likes)
-    top_post_idx = df['likes_count'].idxmax()
-    top_post = {
-        'id': df.loc[top_post_idx, 'post_id'],
-        'likes': int(df.loc[top_post_idx, 'likes_count']),
-        'timestamp': df.loc[top_post_idx, 'timestamp']
-    }
 
-    # Engagement trend (likes over time)
-    engagement_trend = df.groupby('timestamp')['likes_count'].mean().reset_index().to_dict('records')
+# Extract features from the dataset (for stats calculation)
+@timed('extract_features')
+def extract_features(data, bucket=None, max_points=None):
+    print("extracting fetaures..................")
+    if not data:
+        return pd.DataFrame()
+    # Same columns and hour x day aggregates as the per-profile feature store
+    stats = FeatureStore.from_posts(data).stats(bucket, max_points)
     print("extracted features.")
-    return stats, best_time, best_day, top_post, engagement_trend
-
+    return stats
@@ -0,0 +1,207 @@
+import json
+import sqlite3
+import threading
+import time
+
+from config import LOCAL_PROFILE_DIR, PROFILE_INDEX_DB, PROFILE_INDEX_REFRESH_SECONDS
+from metrics import timed
+import profile_layout
+
+# Columns /api/profiles can sort and filter on; each has a (column, username) index
+SORT_COLUMNS = ['followers', 'following', 'posts_count', 'posts_scraped', 'avg_likes', 'avg_comments',
+                'engagement_rate', 'last_post_at']
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    username TEXT PRIMARY KEY,
+    username_lower TEXT NOT NULL,
+    full_name TEXT,
+    is_verified INTEGER NOT NULL DEFAULT 0,
+    followers INTEGER,
+    following INTEGER,
+    posts_count INTEGER,
+    posts_scraped INTEGER NOT NULL DEFAULT 0,
+    avg_likes REAL,
+    avg_comments REAL,
+    engagement_rate REAL,
+    last_post_at TEXT,
+    profile_mtime REAL,
+    posts_mtime REAL,
+    indexed_at REAL
+);
+CREATE INDEX IF NOT EXISTS profiles_username_lower ON profiles (username_lower);
+""" + ''.join(f"CREATE INDEX IF NOT EXISTS profiles_{column} ON profiles ({column}, username);\n"
+              for column in SORT_COLUMNS)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def profile_fields(profile):
+    """Name, verification and counts from the Apify, web_profile_info or README user_data layout."""
+    if not isinstance(profile, dict):
+        return {'full_name': None, 'is_verified': 0, 'followers': None, 'following': None, 'posts_count': None}
+    if 'followersCount' in profile:
+        return {'full_name': profile.get('fullName'), 'is_verified': int(bool(profile.get('verified'))),
+                'followers': profile.get('followersCount'), 'following': profile.get('followsCount'),
+                'posts_count': profile.get('postsCount')}
+    if 'edge_followed_by' in profile:
+        return {'full_name': profile.get('full_name'), 'is_verified': int(bool(profile.get('is_verified'))),
+                'followers': profile.get('edge_followed_by', {}).get('count'),
+                'following': profile.get('edge_follow', {}).get('count'),
+                'posts_count': profile.get('edge_owner_to_timeline_media', {}).get('count')}
+    return {'full_name': profile.get('full_name'),
+            'is_verified': int(str(profile.get('is_verified')).lower() == 'true'),
+            'followers': profile.get('followers'), 'following': profile.get('following'),
+            'posts_count': profile.get('posts_count')}
+
+
+def posts_fields(posts):
+    """Scraped post count, average likes/comments and newest timestamp."""
+    if not isinstance(posts, list) or not posts:
+        return {'posts_scraped': 0, 'avg_likes': None, 'avg_comments': None, 'last_post_at': None}
+    return {
+        'posts_scraped': len(posts),
+        'avg_likes': sum(post.get('likes_count') or 0 for post in posts) / len(posts),
+        'avg_comments': sum(post.get('comments_count') or 0 for post in posts) / len(posts),
+        'last_post_at': max((str(post['timestamp']) for post in posts if post.get('timestamp')), default=None),
+    }
+
+
+class ProfileIndex:
+    """
+    SQLite summary of every profile under LOCAL_PROFILE_DIR (followers, average
+    engagement, engagement rate, ...) so leaderboards and searches are index
+    lookups instead of a pass over every profile.json and posts.json.
+
+    The scraper and the S3 sync call update_profile() after writing a profile;
+    refresh() picks up anything else by comparing file mtimes with the ones
+    in the profile manifest (see profile_layout.profile_stats).
+    """
+
+    def __init__(self, db_path=PROFILE_INDEX_DB, profile_dir=LOCAL_PROFILE_DIR):
+        self.db_path = db_path
+        self.profile_dir = profile_dir
+        self.lock = threading.Lock()
+        self.last_refresh = 0
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _mtimes(stats):
+        """(profile.json mtime, posts.json mtime) from profile_layout file stats; None for a missing file."""
+        _, posts_mtime, _, profile_mtime = stats
+        return profile_mtime or None, posts_mtime or None
+
+    def update_profile(self, username, mtimes=None):
+        """Re-read one profile's files into the index (or drop it if both are gone)."""
+        profile_mtime, posts_mtime = mtimes or self._mtimes(profile_layout.file_stats(username, self.profile_dir))
+        with self.lock, self.conn:
+            if profile_mtime is None and posts_mtime is None:
+                self.conn.execute('DELETE FROM profiles WHERE username = ?', (username,))
+                return
+            folder = profile_layout.profile_dir(username, self.profile_dir)
+            row = {'username': username, 'username_lower': username.lower(),
+                   **profile_fields(_read_json(folder / 'profile.json')),
+                   **posts_fields(_read_json(folder / 'posts.json')),
+                   'profile_mtime': profile_mtime, 'posts_mtime': posts_mtime, 'indexed_at': time.time()}
+            engagement = (row['avg_likes'] or 0) + (row['avg_comments'] or 0)
+            row['engagement_rate'] = engagement / row['followers'] if row['followers'] else None
+            columns = ', '.join(row)
+            self.conn.execute(f"INSERT OR REPLACE INTO profiles ({columns}) VALUES ({', '.join('?' * len(row))})",
+                              list(row.values()))
+
+    @timed('profile_index_refresh')
+    def refresh(self, force=False):
+        """Index added, changed and deleted profiles (throttled unless forced). Returns the number updated."""
+        if not force and time.time() - self.last_refresh < PROFILE_INDEX_REFRESH_SECONDS:
+            return 0
+        self.last_refresh = time.time()
+        with self.lock:
+            indexed = {row['username']: (row['profile_mtime'], row['posts_mtime'])
+                       for row in self.conn.execute('SELECT username, profile_mtime, posts_mtime FROM profiles')}
+        # File stats come from the profile manifest, so unchanged profiles cost no stat() calls
+        stats = profile_layout.profile_stats(self.profile_dir)
+        changed = 0
+        for username in set(indexed) | set(stats):
+            mtimes = self._mtimes(stats[username]) if username in stats else (None, None)
+            if indexed.get(username, (None, None)) != mtimes:
+                self.update_profile(username, mtimes)
+                changed += 1
+        if changed:
+            print(f"Profile index updated for {changed} profiles.")
+        return changed
+
+    def search(self, sort='followers', order='desc', prefix=None, min_followers=None, max_followers=None,
+               min_engagement=None, verified=None, limit=20, offset=0):
+        """
+        One page of profiles plus the total match count. Profiles without a
+        value for the sort column are left out, so rankings only list accounts
+        that have the metric.
+        """
+        if sort not in SORT_COLUMNS + ['username']:
+            raise ValueError(f"Unsupported sort: {sort}")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"Unsupported order: {order}")
+        sort_column = 'username_lower' if sort == 'username' else sort
+        where, params = [f'{sort_column} IS NOT NULL'], []
+        if prefix:
+            # Range scan on the username_lower index
+            where.append('username_lower >= ? AND username_lower < ?')
+            params += [prefix.lower(), prefix.lower() + '\uffff']
+        for clause, value in (('followers >= ?', min_followers), ('followers <= ?', max_followers),
+                              ('engagement_rate >= ?', min_engagement), ('is_verified = ?', verified)):
+            if value is not None:
+                where.append(clause)
+                params.append(value)
+        where_sql = ' AND '.join(where)
+        with self.lock:
+            total = self.conn.execute(f'SELECT COUNT(*) FROM profiles WHERE {where_sql}', params).fetchone()[0]
+            rows = self.conn.execute(
+                f'SELECT * FROM profiles WHERE {where_sql} ORDER BY {sort_column} {order}, username {order} '
+                f'LIMIT ? OFFSET ?', params + [limit, offset]).fetchall()
+        return total, [self._public(row) for row in rows]
+
+    def get(self, username):
+        with self.lock:
+            row = self.conn.execute('SELECT * FROM profiles WHERE username = ?', (username,)).fetchone()
+        return self._public(row) if row else None
+
+    @staticmethod
+    def _public(row):
+        summary = {key: row[key] for key in row.keys()
+                   if key not in ('username_lower', 'profile_mtime', 'posts_mtime')}
+        summary['is_verified'] = bool(summary['is_verified'])
+        return summary
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_index():
+    """The process-wide index over LOCAL_PROFILE_DIR."""
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            _default_index = ProfileIndex()
+    return _default_index
+
+
+def profile_written(username):
+    """Hook for writers of profile.json/posts.json; manifest and indexing failures never break the write."""
+    try:
+        profile_layout.record_write(username)
+    except OSError as e:
+        print(f"Failed to update profile manifest for {username}: {e}")
+    try:
+        get_index().update_profile(username)
+    except sqlite3.Error as e:
+        print(f"Failed to update profile index for {username}: {e}")
@@ -0,0 +1,330 @@
+"""
+Where profile folders live under LOCAL_PROFILE_DIR, and the manifest that lists them.
+
+Two layouts are supported:
+
+    flat      data/profiles/<username>/posts.json
+    sharded   data/profiles/shard-<xx>/<username>/posts.json   (xx = sha1(username) prefix)
+
+Shard folders contain '-', which Instagram usernames cannot, so they never
+collide with a profile folder. The layout in use is recorded in
+data/profiles/manifest.json, which also lists every profile with its
+posts.json/profile.json sizes and mtimes. Enumeration therefore reads one
+file instead of walking the tree. New installs can start sharded with
+PROFILE_LAYOUT=sharded.
+
+profile_index.profile_written() records every write by appending one line
+to manifest.journal under a file lock, so a scrape costs O(1) and
+concurrent processes never lose each other's entries. Readers apply the
+journal on top of manifest.json, and the journal is folded into it once it
+passes MANIFEST_JOURNAL_MAX_BYTES. Each manifest or journal write also
+records a signature of the folders holding profile folders (their mtimes
+and link counts). A profile folder added or removed behind the manifest's
+back changes the signature. The manifest is then stale, and the next
+listing rebuilds it from a directory scan.
+
+    python profile_layout.py migrate sharded     # or: migrate flat (stop the app first)
+    python profile_layout.py manifest            # rebuild the manifest from disk
+"""
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from config import LOCAL_PROFILE_DIR, PROFILE_SHARD_CHARS, MANIFEST_JOURNAL_MAX_BYTES
+from file_lock import file_lock
+
+PROFILE_LAYOUT = os.getenv('PROFILE_LAYOUT', 'flat')  # layout for installs without a manifest yet
+
+MANIFEST_FILE = 'manifest.json'
+JOURNAL_FILE = 'manifest.journal'
+LOCK_FILE = 'manifest.lock'
+SHARD_PREFIX = 'shard-'
+PROFILE_FILES = ('posts.json', 'profile.json')
+
+_manifests = {}  # base dir -> (manifest file identity, journal bytes applied, manifest)
+
+
+def _manifest_path(base):
+    return Path(base) / MANIFEST_FILE
+
+
+def _journal_path(base):
+    return Path(base) / JOURNAL_FILE
+
+
+def _lock_path(base):
+    return Path(base) / LOCK_FILE
+
+
+def _apply_journal(manifest, base, offset):
+    """Apply complete journal lines from byte `offset`; returns the offset after the last one applied."""
+    try:
+        with open(_journal_path(base), 'rb') as file:
+            file.seek(offset)
+            data = file.read()
+    except FileNotFoundError:
+        return offset
+    complete = data[:data.rfind(b'\n') + 1]  # a writer may be mid-line
+    for line in complete.splitlines():
+        username, stats, folders = json.loads(line)
+        if stats:
+            manifest['profiles'][username] = stats
+        elif username:
+            manifest['profiles'].pop(username, None)
+        manifest['folders'] = folders
+    return offset + len(complete)
+
+
+def _journal_line(username, stats, base):
+    """A journal entry; the folder signature is taken last, after the caller's own changes to the tree."""
+    return json.dumps([username, stats, _folder_signature(base)], separators=(',', ':')) + '\n'
+
+
+def read_manifest(base=LOCAL_PROFILE_DIR):
+    """
+    The manifest for `base` with the journal applied, or None. Cached until
+    manifest.json is replaced; journal lines appended since the last call
+    are applied to a copy, so a cached manifest is never changed in place.
+    """
+    path = _manifest_path(base)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    try:
+        journal_size = _journal_path(base).stat().st_size
+    except FileNotFoundError:
+        journal_size = 0
+    identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _manifests.get(str(base))
+    if cached and cached[0] == identity and cached[1] <= journal_size:
+        _, offset, manifest = cached
+        if offset == journal_size:
+            return manifest
+        manifest = {**manifest, 'profiles': dict(manifest['profiles'])}
+    else:
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        offset = 0
+    try:
+        offset = _apply_journal(manifest, base, offset)
+    except (ValueError, TypeError) as e:
+        print(f"Ignoring unreadable manifest journal in {base}: {e}")
+        offset = journal_size
+    _manifests[str(base)] = (identity, offset, manifest)
+    return manifest
+
+
+def _write_manifest(manifest, base):
+    """Replace manifest.json and empty the journal; the caller holds the manifest lock."""
+    path = _manifest_path(base)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    # Lines already in the journal are folded into the snapshot (replaying them would be harmless).
+    # The new journal starts with the folder signature as it is after the replace above.
+    with open(_journal_path(base), 'w', encoding='utf-8') as file:
+        file.write(_journal_line(None, None, base))
+    _manifests.pop(str(base), None)
+
+
+def layout(base=LOCAL_PROFILE_DIR):
+    manifest = read_manifest(base)
+    return manifest['layout'] if manifest else PROFILE_LAYOUT
+
+
+def shard_name(username, chars=PROFILE_SHARD_CHARS):
+    return SHARD_PREFIX + hashlib.sha1(username.encode('utf-8')).hexdigest()[:chars]
+
+
+def profile_dir(username, base=LOCAL_PROFILE_DIR):
+    """Folder holding a profile's posts.json and profile.json in the active layout."""
+    base = Path(base)
+    if layout(base) == 'sharded':
+        manifest = read_manifest(base)
+        chars = manifest.get('shard_chars', PROFILE_SHARD_CHARS) if manifest else PROFILE_SHARD_CHARS
+        return base / shard_name(username, chars) / username
+    return base / username
+
+
+def profile_path(username, file_name, base=LOCAL_PROFILE_DIR):
+    return profile_dir(username, base) / file_name
+
+
+def resolve(path, base=LOCAL_PROFILE_DIR):
+    """
+    Map a flat-style <base>/<username>/<file> path onto the active layout, so
+    callers that build paths by hand keep working after a migration. Other
+    paths are returned unchanged.
+    """
+    path = Path(path)
+    try:
+        relative = path.resolve().relative_to(Path(base).resolve())
+    except ValueError:
+        return path
+    if len(relative.parts) != 2 or relative.parts[0].startswith(SHARD_PREFIX):
+        return path
+    return profile_path(relative.parts[0], relative.parts[1], base)
+
+
+def _scan(base):
+    """Usernames found by walking the tree (used only when there is no manifest)."""
+    base = Path(base)
+    if not base.exists():
+        return []
+    usernames = []
+    for entry in os.scandir(base):
+        if not entry.is_dir():
+            continue
+        if entry.name.startswith(SHARD_PREFIX):
+            usernames.extend(sub.name for sub in os.scandir(entry.path) if sub.is_dir())
+        else:
+            usernames.append(entry.name)
+    return sorted(usernames)
+
+
+def _folder_signature(base):
+    """
+    Digest of the mtime and link count of every folder that holds profile
+    folders. Adding or removing a profile folder changes it, even within one
+    tick of the filesystem clock (the link count covers that case).
+    """
+    base = Path(base)
+    stat = base.stat()
+    parts = [stat.st_mtime_ns, stat.st_nlink]
+    if layout(base) == 'sharded':
+        for entry in sorted(os.scandir(base), key=lambda entry: entry.name):
+            if entry.is_dir() and entry.name.startswith(SHARD_PREFIX):
+                stat = entry.stat()
+                parts += [stat.st_mtime_ns, stat.st_nlink]
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()[:16]
+
+
+def is_stale(base=LOCAL_PROFILE_DIR):
+    """True when profile folders were added or removed since the manifest was last written."""
+    manifest = read_manifest(base)
+    return manifest is not None and _folder_signature(base) != manifest.get('folders')
+
+
+def list_usernames(base=LOCAL_PROFILE_DIR):
+    """Every profile, from the manifest when there is one (rebuilt first if it is stale)."""
+    return sorted(profile_stats(base))
+
+
+def profile_stats(base=LOCAL_PROFILE_DIR):
+    """{username: file_stats()} for every profile, from the manifest when there is one."""
+    if read_manifest(base) is not None:
+        try:
+            if is_stale(base):
+                print(f"Profile manifest in {base} is stale, rebuilding it.")
+                build_manifest(base)
+        except FileNotFoundError:
+            pass
+        manifest = read_manifest(base)
+        if manifest is not None:
+            return dict(manifest['profiles'])
+    return {username: file_stats(username, base) for username in _scan(base)}
+
+
+def file_stats(username, base=LOCAL_PROFILE_DIR):
+    """[posts size, posts mtime, profile size, profile mtime]; 0s for a missing file."""
+    folder = profile_dir(username, base)
+    stats = []
+    for name in PROFILE_FILES:
+        try:
+            stat = (folder / name).stat()
+            stats += [stat.st_size, round(stat.st_mtime, 3)]
+        except FileNotFoundError:
+            stats += [0, 0]
+    return stats
+
+
+def record_write(username, base=LOCAL_PROFILE_DIR):
+    """Journal one profile's current file stats after its files were written or removed."""
+    if read_manifest(base) is None:
+        # First write on an install without a manifest: list what is already there
+        build_manifest(base)
+    stats = file_stats(username, base)
+    with file_lock(_lock_path(base)):
+        with open(_journal_path(base), 'a', encoding='utf-8') as file:
+            file.write(_journal_line(username, stats if any(stats) else None, base))
+            size = file.tell()
+        if size > MANIFEST_JOURNAL_MAX_BYTES:
+            manifest = read_manifest(base)
+            _write_manifest(manifest, base)
+
+
+def build_manifest(base=LOCAL_PROFILE_DIR, target_layout=None):
+    """
+    Rebuild the manifest by walking the tree once, under the manifest lock.
+    It is assembled in memory and written with one atomic replace, so
+    readers never see a partial manifest. Returns the number of profiles.
+    """
+    with file_lock(_lock_path(base)):
+        current = read_manifest(base) or {}
+        manifest = {'version': 1, 'layout': target_layout or current.get('layout', PROFILE_LAYOUT),
+                    'shard_chars': current.get('shard_chars', PROFILE_SHARD_CHARS), 'profiles': {}}
+        for username in _scan(base):
+            stats = file_stats(username, base)
+            if any(stats):
+                manifest['profiles'][username] = stats
+        _write_manifest(manifest, base)
+    return len(manifest['profiles'])
+
+
+def migrate(target, base=LOCAL_PROFILE_DIR, chars=PROFILE_SHARD_CHARS):
+    """
+    Move every profile folder into the `target` layout ('flat' or 'sharded')
+    and write the manifest. Folders are renamed, not copied. An interrupted
+    run can be repeated: each folder is located wherever it currently is.
+    """
+    if target not in ('flat', 'sharded'):
+        raise ValueError(f"Unsupported layout: {target}")
+    base = Path(base)
+    moved = 0
+    for username in _scan(base):
+        flat = base / username
+        sharded = base / shard_name(username, chars) / username
+        source, destination = (flat, sharded) if target == 'sharded' else (sharded, flat)
+        if not source.exists():
+            continue
+        if destination.exists():
+            print(f"Skipping {username}: {destination} already exists")
+            continue
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(source, destination)
+        moved += 1
+    if target == 'flat':
+        for entry in base.iterdir():
+            if entry.is_dir() and entry.name.startswith(SHARD_PREFIX) and not any(entry.iterdir()):
+                entry.rmdir()
+    with file_lock(_lock_path(base)):
+        _write_manifest({'version': 1, 'layout': target, 'shard_chars': chars, 'profiles': {}}, base)
+    count = build_manifest(base, target)
+    print(f"Moved {moved} profiles; {count} profiles in the {target} layout.")
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help='move profile folders to another layout')
+    migrate_parser.add_argument('layout', choices=['flat', 'sharded'])
+    subparsers.add_parser('manifest', help='rebuild the manifest from disk')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        migrate(args.layout)
+    else:
+        print(f"Manifest lists {build_manifest()} profiles.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+import heapq
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import (LOCAL_PROFILE_DIR, REFRESH_STATE_FILE, REFRESH_LEADER_LOCK, REFRESH_BASE_INTERVAL_HOURS,
+                    REFRESH_MIN_INTERVAL_HOURS, REFRESH_MAX_CONCURRENCY,
+                    REFRESH_HOURLY_BUDGET, REFRESH_TICK_SECONDS)
+from file_lock import atomic_write, try_lock
+from scraper import load_cache, update_cache, scrape_using_apify
+import profile_layout
+
+RECENT_POSTS = 12  # posts used to measure recent engagement
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _followers(profile):
+    """Follower count from either the Apify or the web_profile_info profile layout."""
+    if not profile:
+        return 0
+    if 'followersCount' in profile:
+        return profile['followersCount'] or 0
+    return profile.get('edge_followed_by', {}).get('count', 0)
+
+
+def _recent_engagement(posts):
+    """Average likes + comments of the most recent posts."""
+    if not posts:
+        return 0
+    recent = sorted(posts, key=lambda post: post['timestamp'], reverse=True)[:RECENT_POSTS]
+    return sum(post.get('likes_count', 0) + post.get('comments_count', 0) for post in recent) / len(recent)
+
+
+def _last_scraped(username, cache, posts_mtime=0):
+    """Last refresh time as a unix timestamp, falling back to the posts.json mtime."""
+    last_scraped = cache.get(username, {}).get('last_scraped')
+    if last_scraped:
+        return datetime.strptime(last_scraped, '%Y-%m-%d %H:%M:%S').timestamp()
+    return posts_mtime
+
+
+def refresh_interval(followers, engagement):
+    """
+    Target seconds between refreshes. Large, active accounts get short intervals;
+    dormant ones are refreshed rarely so they do not eat the scrape budget.
+    """
+    weight = math.log10(10 + followers) * math.log10(10 + engagement)
+    hours = max(REFRESH_BASE_INTERVAL_HOURS / weight, REFRESH_MIN_INTERVAL_HOURS)
+    return hours * 3600
+
+
+class RefreshScheduler:
+    """
+    Keeps tracked profiles fresh. Profiles are ordered by how overdue they are
+    (staleness divided by their target interval) and dispatched under a global
+    concurrency limit and a per-hour scrape budget.
+
+    Every worker process may start a scheduler, but only the one holding the
+    leader lock file dispatches refreshes; the others retry each tick and take
+    over if the leader exits.
+    """
+
+    def __init__(self, refresh_fn=scrape_using_apify, state_file=REFRESH_STATE_FILE,
+                 max_concurrency=REFRESH_MAX_CONCURRENCY, hourly_budget=REFRESH_HOURLY_BUDGET,
+                 leader_lock=REFRESH_LEADER_LOCK):
+        self.refresh_fn = refresh_fn
+        self.state_file = state_file
+        self.leader_lock = leader_lock
+        self._leader = None  # open lock file while this scheduler is the leader
+        self.max_concurrency = max_concurrency
+        self.hourly_budget = hourly_budget
+        self.lock = threading.Lock()
+        self.queue = []  # heap of (-overdue_ratio, username, lag_seconds)
+        self.in_flight = set()
+        self.history = []  # dispatch timestamps within the last hour
+        self.last_runs = {}
+        self.signals = {}  # username -> (manifest file stats, followers, recent engagement)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._stop = threading.Event()
+        self._thread = None
+        self.load_state()
+
+    def load_state(self):
+        state = _read_json(self.state_file) or {}
+        self.history = state.get('history', [])
+        self.last_runs = state.get('last_runs', {})
+        return state
+
+    def save_state(self):
+        """Persist the budget history, last runs and a queue snapshot; called with self.lock held."""
+        with atomic_write(self.state_file, 'w', encoding='utf-8') as file:
+            json.dump({'history': self.history, 'last_runs': self.last_runs,
+                       'in_flight': sorted(self.in_flight), 'queue': self._queue_summary()}, file, indent=2)
+
+    def _queue_summary(self):
+        lags = [lag for _, _, lag in self.queue]
+        return {
+            'queue_depth': len(self.queue),
+            'max_lag_seconds': round(max(lags), 1) if lags else 0,
+            'avg_lag_seconds': round(sum(lags) / len(lags), 1) if lags else 0,
+            'next': [username for _, username, _ in heapq.nsmallest(5, self.queue)],
+        }
+
+    def rebuild_queue(self, now=None):
+        """
+        Re-rank every profile under LOCAL_PROFILE_DIR by staleness. Followers
+        and engagement are re-read only for profiles whose files changed since
+        the last rebuild, going by the sizes and mtimes in the profile manifest.
+        """
+        now = now or time.time()
+        cache = load_cache()
+        signals = {}
+        for username, stats in profile_layout.profile_stats().items():
+            known = self.signals.get(username)
+            if known and known[0] == stats:
+                signals[username] = known
+                continue
+            profile_dir = profile_layout.profile_dir(username)
+            signals[username] = (stats, _followers(_read_json(profile_dir / 'profile.json')),
+                                 _recent_engagement(_read_json(profile_dir / 'posts.json')))
+        self.signals = signals
+
+        queue = []
+        for username, (stats, followers, engagement) in signals.items():
+            interval = refresh_interval(followers, engagement)
+            staleness = now - _last_scraped(username, cache, stats[1])
+            if staleness >= interval:
+                queue.append((-staleness / interval, username, staleness - interval))
+        heapq.heapify(queue)
+        with self.lock:
+            self.queue = queue
+
+    def budget_remaining(self, now=None):
+        now = now or time.time()
+        self.history = [ts for ts in self.history if now - ts < 3600]
+        return max(self.hourly_budget - len(self.history), 0)
+
+    def dispatch(self):
+        """Start as many refreshes as concurrency and budget allow."""
+        dispatched = []
+        with self.lock:
+            while self.queue and len(self.in_flight) < self.max_concurrency and self.budget_remaining() > 0:
+                _, username, _ = heapq.heappop(self.queue)
+                if username in self.in_flight:
+                    continue
+                self.in_flight.add(username)
+                self.history.append(time.time())
+                dispatched.append(username)
+            self.save_state()
+        for username in dispatched:
+            self.executor.submit(self._refresh, username)
+        return dispatched
+
+    def _refresh(self, username):
+        print(f"Refreshing {username}...")
+        started = time.time()
+        try:
+            result = self.refresh_fn(username)
+            ok = bool(result[0] if isinstance(result, tuple) else result)
+        except Exception as e:
+            print(f"Refresh of {username} failed: {e}")
+            ok = False
+        if ok:
+            update_cache(username, last_scraped=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        with self.lock:
+            self.in_flight.discard(username)
+            self.last_runs[username] = {
+                'ok': ok,
+                'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'duration': round(time.time() - started, 2)
+            }
+            self.save_state()
+
+    def status(self):
+        """
+        Queue depth, lag and budget, for the status endpoint. Workers that are
+        not the leader report the state the leader last saved, since their own
+        queue and in-flight set are never dispatched.
+        """
+        leader = self._leader is not None
+        with self.lock:
+            persisted = {} if leader else self.load_state()
+            return {
+                'leader': leader,
+                **(persisted.get('queue') or self._queue_summary()),
+                'in_flight': sorted(self.in_flight) if leader else persisted.get('in_flight', []),
+                'budget_remaining': self.budget_remaining(),
+                'hourly_budget': self.hourly_budget,
+                'max_concurrency': self.max_concurrency,
+            }
+
+    def is_leader(self):
+        """Take the leader lock if it is free; True while this scheduler holds it."""
+        if self._leader is None:
+            self._leader = try_lock(self.leader_lock)
+            if self._leader is not None:
+                print(f"Refresh scheduler is the leader (pid {os.getpid()}).")
+        return self._leader is not None
+
+    def tick(self):
+        self.rebuild_queue()
+        return self.dispatch()
+
+    def _run(self, interval):
+        while not self._stop.is_set():
+            try:
+                if self.is_leader():
+                    self.tick()
+            except Exception as e:
+                print(f"Refresh scheduler error: {e}")
+            self._stop.wait(interval)
+
+    def start(self, interval=REFRESH_TICK_SECONDS):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self._thread.start()
+        print("Refresh scheduler started.")
+
+    def stop(self):
+        self._stop.set()
+        self.executor.shutdown(wait=False)
+        if self._leader is not None:
+            self._leader.close()
+            self._leader = None
@@ -0,0 +1,271 @@
+"""
+Offline stand-ins for the Instagram web_profile_info endpoint and the Apify
+client, replaying recorded (or synthesized) fixtures with configurable latency
+and error rates so scraper.py can run without touching the network.
+
+    with replay(profile_info=fixture, apify=apify_fixture, latency=0.05, error_rate=0.1):
+        scraper.scrape_using_apify('swiggyindia')
+"""
+import json
+import random
+import time
+import types
+from contextlib import contextmanager
+from datetime import datetime
+
+
+def _sleep(seconds):
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+class ReplayResponse:
+    """The subset of requests.Response used by the scraper."""
+
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+
+class ReplayProfileInfo:
+    """
+    Serves web_profile_info pages from a fixture. Pages are chained through
+    end_cursor, so `after=<cursor>` returns the following page.
+    """
+
+    def __init__(self, fixture, latency=0.0, jitter=0.0, error_rate=0.0, error_status=(401,), seed=42):
+        self.pages = fixture['pages']
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.cursors = {}
+        for i, page in enumerate(self.pages[:-1]):
+            cursor = page['data']['user']['edge_owner_to_timeline_media']['page_info']['end_cursor']
+            self.cursors[cursor] = i + 1
+        self.requests = 0
+        self.errors = 0
+        self.posts_served = 0
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        self.requests += 1
+        _sleep(self.latency + self.rng.uniform(0, self.jitter))
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            status = self.rng.choice(self.error_status)
+            return ReplayResponse(status, {'message': 'replayed error', 'status': 'fail'})
+        index = self.cursors.get((params or {}).get('after'), 0)
+        page = self.pages[index]
+        self.posts_served += len(page['data']['user']['edge_owner_to_timeline_media']['edges'])
+        return ReplayResponse(200, page)
+
+
+class _ReplayActor:
+    def __init__(self, client):
+        self.client = client
+
+    def call(self, run_input=None, **kwargs):
+        client = self.client
+        client.runs += 1
+        _sleep(client.latency + client.rng.uniform(0, client.jitter))
+        if client.rng.random() < client.error_rate:
+            client.errors += 1
+            raise RuntimeError("Replayed Apify actor failure")
+        return {'id': f"run_{client.runs}", 'defaultDatasetId': f"dataset_{client.runs}"}
+
+
+class _ReplayDataset:
+    def __init__(self, client):
+        self.client = client
+
+    def iterate_items(self):
+        for item in self.client.items:
+            self.client.posts_served += len(item.get('latestPosts', []))
+            yield item
+
+
+class ReplayApifyClient:
+    """Stand-in for apify_client.ApifyClient backed by recorded dataset items."""
+
+    def __init__(self, fixture, latency=0.0, jitter=0.0, error_rate=0.0, seed=42):
+        self.items = fixture['items']
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.runs = 0
+        self.errors = 0
+        self.posts_served = 0
+
+    def __call__(self, token=None, **kwargs):
+        # Mimics the ApifyClient(token) constructor.
+        return self
+
+    def actor(self, actor_id):
+        return _ReplayActor(self)
+
+    def dataset(self, dataset_id):
+        return _ReplayDataset(self)
+
+
+class _ScaledTime:
+    """Proxy for the time module whose sleep() is scaled (0 disables the scraper's politeness delays)."""
+
+    def __init__(self, scale):
+        self.scale = scale
+
+    def sleep(self, seconds):
+        _sleep(seconds * self.scale)
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+@contextmanager
+def replay(profile_info=None, apify=None, latency=0.0, jitter=0.0, error_rate=0.0,
+           sleep_scale=0.0, upload=False, seed=42):
+    """
+    Patch scraper.py so its network calls are served from fixtures.
+    Yields (profile_info_stub, apify_stub) so callers can read request counters.
+    """
+    import scraper
+
+    profile_stub = ReplayProfileInfo(profile_info, latency, jitter, error_rate, seed=seed) if profile_info else None
+    apify_stub = ReplayApifyClient(apify, latency, jitter, error_rate, seed=seed) if apify else None
+
+    saved = {name: getattr(scraper, name) for name in ('requests', 'time', 'upload_to_s3', 'apify_client_class')}
+    try:
+        if profile_stub:
+            scraper.requests = types.SimpleNamespace(get=profile_stub.get)
+        if apify_stub:
+            # scraper picks its client through backends.apify_client_class, whatever APIFY_BACKEND says
+            scraper.apify_client_class = lambda backend=None: apify_stub
+        scraper.time = _ScaledTime(sleep_scale)
+        if not upload:
+            scraper.upload_to_s3 = lambda username, file_type='profile': None
+        yield profile_stub, apify_stub
+    finally:
+        for name, value in saved.items():
+            setattr(scraper, name, value)
+
+
+# Fixture recording and synthesis
+
+def record_profile_info(username, path, max_pages=5):
+    """Record live web_profile_info pages for `username` into a fixture file."""
+    import requests
+    from scraper import USER_AGENTS
+
+    pages = []
+    params = {'username': username}
+    for _ in range(max_pages):
+        response = requests.get("https://i.instagram.com/api/v1/users/web_profile_info/",
+                                headers={'User-Agent': USER_AGENTS[0]}, params=params)
+        if response.status_code != 200:
+            print(f"Recording stopped: status {response.status_code}")
+            break
+        page = response.json()
+        pages.append(page)
+        page_info = page['data']['user']['edge_owner_to_timeline_media']['page_info']
+        if not page_info['has_next_page']:
+            break
+        params['after'] = page_info['end_cursor']
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({'username': username, 'pages': pages}, file)
+    print(f"Recorded {len(pages)} pages to {path}")
+
+
+def record_apify(username, path, max_posts=200):
+    """Record the Apify dataset items for `username` into a fixture file."""
+    import os
+    from apify_client import ApifyClient
+    from scraper import APIFY_ACTOR_ID, apify_run_input
+
+    client = ApifyClient(os.getenv("APIFY_API_KEY"))
+    run = client.actor(APIFY_ACTOR_ID).call(run_input=apify_run_input(username, max_posts))
+    items = list(client.dataset(run["defaultDatasetId"]).iterate_items())
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({'username': username, 'items': items}, file)
+    print(f"Recorded {len(items)} dataset items to {path}")
+
+
+def _epoch(timestamp):
+    return int(datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp())
+
+
+def synthesize_profile_info(username, posts, page_size=12):
+    """Build a web_profile_info fixture from posts in the posts.json schema."""
+    pages = []
+    chunks = [posts[i:i + page_size] for i in range(0, len(posts), page_size)] or [[]]
+    for i, chunk in enumerate(chunks):
+        has_next = i < len(chunks) - 1
+        edges = [{'node': {
+            'id': post['id'],
+            'shortcode': post['shortcode'],
+            'taken_at_timestamp': _epoch(post['timestamp']),
+            'edge_media_to_caption': {'edges': [{'node': {'text': post.get('caption', '')}}]},
+            'edge_media_to_comment': {'count': post['comments_count']},
+            'edge_liked_by': {'count': post['likes_count']},
+        }} for post in chunk]
+        pages.append({'data': {'user': {
+            'id': '1',
+            'username': username,
+            'full_name': username,
+            'edge_followed_by': {'count': 100000},
+            'edge_follow': {'count': 100},
+            'edge_owner_to_timeline_media': {
+                'count': len(posts),
+                'edges': edges,
+                'page_info': {'has_next_page': has_next, 'end_cursor': f"cursor_{i + 1}" if has_next else None}
+            }
+        }}})
+    return {'username': username, 'pages': pages}
+
+
+def synthesize_apify(username, posts, media_base="https://cdn.example"):
+    """Build an Apify dataset fixture from posts in the posts.json schema; image URLs point at media_base."""
+    item = {
+        'inputUrl': f"https://www.instagram.com/{username}/",
+        'id': '1',
+        'username': username,
+        'url': f"https://www.instagram.com/{username}",
+        'fullName': username,
+        'biography': '',
+        'externalUrls': [],
+        'followersCount': 100000,
+        'followsCount': 100,
+        'hasChannel': False,
+        'highlightReelCount': 0,
+        'isBusinessAccount': True,
+        'joinedRecently': False,
+        'businessCategoryName': None,
+        'private': False,
+        'verified': True,
+        'profilePicUrl': f"{media_base}/{username}.jpg",
+        'profilePicUrlHD': f"{media_base}/{username}_hd.jpg",
+        'igtvVideoCount': 0,
+        'relatedProfiles': [],
+        'latestIgtvVideos': [],
+        'postsCount': len(posts),
+        'latestPosts': [{
+            'id': post['id'],
+            'shortCode': post['shortcode'],
+            'likesCount': post['likes_count'],
+            'commentsCount': post['comments_count'],
+            'timestamp': post['timestamp'],
+            'caption': post.get('caption', ''),
+            'hashtags': [tag.lstrip('#') for tag in post.get('hashtags', [])],
+            'displayUrl': f"{media_base}/{post['shortcode']}.jpg",
+        } for post in posts]
+    }
+    return {'username': username, 'items': [item]}
+
+
+def load_fixture(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
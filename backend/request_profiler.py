@@ -0,0 +1,148 @@
+"""
+Opt-in request profiling.
+
+Set PROFILING_ENABLED=1 to profile requests that carry an `X-Profile: 1`
+header, plus a random PROFILE_SAMPLE_RATE fraction of all requests. The
+header is only honoured from admins (X-Admin-Key matching ADMIN_KEY) or
+from addresses listed in PROFILE_TRUSTED_IPS (comma-separated); anyone
+else sending it is treated like any other request.
+PROFILER picks the profiler: 'cprofile' (deterministic, default) or
+'sample' (a stack sampler thread, cheaper on long requests). Reports are
+written to REQUEST_PROFILE_DIR, which keeps only the newest
+REQUEST_PROFILE_MAX_REPORTS. When disabled no hooks are registered, so
+requests pay nothing.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request
+
+from config import REQUEST_PROFILE_DIR, REQUEST_PROFILE_MAX_REPORTS
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED') == '1'
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILER = os.getenv('PROFILER', 'cprofile')
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILE_HEADER = 'X-Profile'
+PROFILE_TRUSTED_IPS = {ip.strip() for ip in os.getenv('PROFILE_TRUSTED_IPS', '').split(',') if ip.strip()}
+
+
+class StackSampler:
+    """Samples one thread's stack at a fixed interval; output is in collapsed (flamegraph) format."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self):
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + '\n'
+
+
+def _may_request_profile():
+    """Same admin check as app.is_admin, or a trusted address."""
+    admin_key = os.getenv('ADMIN_KEY')
+    if admin_key and request.headers.get('X-Admin-Key') == admin_key:
+        return True
+    return request.remote_addr in PROFILE_TRUSTED_IPS
+
+
+def _should_profile():
+    if request.headers.get(PROFILE_HEADER) == '1' and _may_request_profile():
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def start_profile():
+    if not _should_profile():
+        return
+    if PROFILER == 'sample':
+        profiler = StackSampler(threading.get_ident())
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active in this process
+            return
+    g.profiler = profiler
+    g.profile_started = time.perf_counter()
+
+
+def finish_profile(exc):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    elapsed_ms = (time.perf_counter() - g.profile_started) * 1000
+    route = request.url_rule.rule if request.url_rule else request.path
+    name = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_')}_{elapsed_ms:.0f}ms"
+    REQUEST_PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    if isinstance(profiler, StackSampler):
+        profiler.stop()
+        (REQUEST_PROFILE_DIR / f"{name}.folded").write_text(profiler.report(), encoding='utf-8')
+    else:
+        profiler.disable()
+        profiler.dump_stats(str(REQUEST_PROFILE_DIR / f"{name}.prof"))
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(40)
+        (REQUEST_PROFILE_DIR / f"{name}.txt").write_text(f"{request.method} {request.full_path} {elapsed_ms:.1f} ms\n\n"
+                                                 + summary.getvalue(), encoding='utf-8')
+    rotate_reports()
+
+
+def list_reports():
+    """Reports newest first, grouped by run."""
+    if not REQUEST_PROFILE_DIR.exists():
+        return []
+    reports = {}
+    for path in REQUEST_PROFILE_DIR.iterdir():
+        stat = path.stat()
+        entry = reports.setdefault(path.stem, {'name': path.stem, 'files': [], 'mtime': stat.st_mtime, 'bytes': 0})
+        entry['files'].append(path.name)
+        entry['bytes'] += stat.st_size
+    return sorted(reports.values(), key=lambda r: r['mtime'], reverse=True)
+
+
+def rotate_reports(keep=REQUEST_PROFILE_MAX_REPORTS):
+    for report in list_reports()[keep:]:
+        for file_name in report['files']:
+            (REQUEST_PROFILE_DIR / file_name).unlink(missing_ok=True)
+
+
+def init_app(app):
+    """Register the profiling hooks when PROFILING_ENABLED is set."""
+    if not PROFILING_ENABLED:
+        return
+    app.before_request(start_profile)
+    app.teardown_request(finish_profile)
+    print(f"Request profiling enabled ({PROFILER}, sample rate {PROFILE_SAMPLE_RATE}).")
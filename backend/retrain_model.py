@@ -1,15 +1,31 @@
+import hashlib
 import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 import xgboost as xgb
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error
 import joblib
 from pathlib import Path
-from config import LOCAL_MODEL_DIR
+from feature_store import FeatureStore, store_for_posts_file, DAYS
+from caption_features import CAPTION_COLUMNS, HASHTAG_COLUMNS, caption_defaults
+from metrics import timed, cache_result
+from model_registry import MODEL_PATH, publish_model
+import profile_layout
+from config import (LOCAL_MODEL_DIR, LOCAL_PROFILE_DIR, INCREMENTAL_TREES,
+                    INCREMENTAL_MAX_TREES, INCREMENTAL_DRIFT_TOLERANCE,
+                    MODEL_CACHE_DIR, MODEL_CACHE_KEEP, MODEL_CACHE_TMP_MAX_AGE_SECONDS)
 
 
 # Load the JSON dataset with error handling
+@timed('load_data')
 def load_data(filename='swiggyindia_all_posts.json'):
     try:
         with open(filename, 'r', encoding='utf-8') as file:
@@ -24,42 +40,15 @@ def load_data(filename='swiggyindia_all_posts.json'):
         return []
 
 # Extract features from the dataset (only hour and day_of_week)
+@timed('extract_features')
 def extract_features(data):
     if not data:
         return pd.DataFrame()
-    features = []
     print("extracting features...")
-    for post in data:
-        dt = datetime.fromisoformat(post['timestamp'].replace('Z', '+00:00'))
-
-        # Basic features
-        hour = dt.hour
-        day_of_week = dt.strftime('%A')
-        is_peak_hour = 1 if 12 <= hour <= 18 else 0
-        is_weekday = 1 if dt.weekday() < 5 else 0
-
-        # Store features and target (excluding days_since_first_post and avg_likes_last_5)
-        features.append({
-            'hour': hour,
-            'day_of_week': day_of_week,
-            'is_peak_hour': is_peak_hour,
-            'is_weekday': is_weekday,
-            'likes_count': post['likes_count']
-        })
-    print("features extracted!")
-    # Convert to DataFrame
-    
-    print("converting to dataframe...")
-    features = pd.DataFrame(features)
-    print("features converted!")
-    # Drop rows with NaN values
-    features.dropna(inplace=True)
-    # Ensure likes_count is numeric
-    features['likes_count'] = pd.to_numeric(features['likes_count'], errors='coerce')
-    features.dropna(subset=['likes_count'], inplace=True)  # Drop rows where likes_count is NaN
-    print(pd.DataFrame(features))
+    # Same typed columns the per-profile feature store keeps on disk
+    features = FeatureStore.from_posts(data).training_frame()
     print("features ready!")
-    return pd.DataFrame(features)
+    return features
 
 # Prepare data
 def prepare_data(df):
@@ -68,7 +57,9 @@ def prepare_data(df):
         print("Error: No data available to prepare.")
         return pd.DataFrame(), pd.Series(dtype='float64')  # Return an empty Series with a specified dtype
     print("preparing dataframe...")
-    # Encode day_of_week using one-hot encoding
+    # Encode day_of_week using one-hot encoding over all seven days, so every
+    # batch drops the same reference day (Monday) whichever days it contains
+    df = df.assign(day_of_week=pd.Categorical(df['day_of_week'], categories=DAYS))
     df = pd.get_dummies(df, columns=['day_of_week'], drop_first=True)
     print("dataframe prepared!")
     # Separate features and target
@@ -77,22 +68,38 @@ def prepare_data(df):
     print("data has been prepared!")
     return X, y
 
+# Hyperparameters used when no tuned set has been saved (see tune_model.py)
+DEFAULT_PARAMS = {
+    'n_estimators': 200,
+    'learning_rate': 0.05,
+    'max_depth': 6
+}
+TUNED_PARAMS_PATH = LOCAL_MODEL_DIR / 'likes_predictor.params.json'
+
+def load_tuned_params(path=TUNED_PARAMS_PATH):
+    """Tuned hyperparameters saved next to the model artifact, or None."""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)['params']
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+
+def holdout_split(X, y):
+    """The train/test split every trainer uses; save_model scores the same test rows."""
+    return train_test_split(X, y, test_size=0.2, random_state=42)
+
 # Train the model with tuned hyperparameters
-def train_model(X, y):
+def train_model(X, y, params=None):
     print("training data.....")
     if X.empty or y.empty:
         print("Error: No data available to train the model.")
         return None, None
     # Split into training and testing sets
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train, X_test, y_train, y_test = holdout_split(X, y)
 
     # Initialize and train the XGBoost Regressor with tuned parameters
-    model = xgb.XGBRegressor(
-        n_estimators=200,
-        learning_rate=0.05,
-        max_depth=6,
-        random_state=42
-    )
+    params = params or load_tuned_params() or DEFAULT_PARAMS
+    model = xgb.XGBRegressor(**params, random_state=42)
     model.fit(X_train, y_train)
 
     # Evaluate the model
@@ -125,8 +132,9 @@ def retrain_model(data):
         new_model, feature_names = train_model(X, y)
 
         # Save the new model and feature names
-        model_path = LOCAL_MODEL_DIR / 'likes_predictor.joblib'
-        joblib.dump({'model': new_model, 'feature_names': feature_names}, model_path)
+        joblib.dump({'model': new_model, 'feature_names': feature_names,
+                     'caption_defaults': caption_defaults(X)}, MODEL_PATH)
+        publish_model()
 
         print("Model retrained and saved successfully.")
         return True
@@ -134,12 +142,320 @@ def retrain_model(data):
         print(f"Error during retraining: {e}")
         return False
 
+# Corpus training: one global model over every profile under LOCAL_PROFILE_DIR
+CORPUS_FEATURES = (['hour', 'is_peak_hour', 'is_weekday']
+                   + [f'day_of_week_{day}' for day in DAYS[1:]]
+                   + CAPTION_COLUMNS + HASHTAG_COLUMNS
+                   + ['followers', 'log_followers', 'posts_count'])
+CORPUS_PARAMS = {
+    'n_estimators': 400,
+    'learning_rate': 0.05,
+    'max_depth': 8,
+    'tree_method': 'hist'
+}
+
+def _profile_followers(profile):
+    """Follower and post counts from either the Apify or the web_profile_info layout."""
+    if 'followersCount' in profile:
+        return profile.get('followersCount') or 0, profile.get('postsCount') or 0
+    return (profile.get('edge_followed_by', {}).get('count', 0),
+            profile.get('edge_owner_to_timeline_media', {}).get('count', 0))
+
+def extract_profile_matrix(profile_dir):
+    """
+    Build the float32 feature matrix and target vector for one profile directory
+    from its feature store. Runs in a worker process, so it only takes and
+    returns picklable values.
+    """
+    profile_dir = Path(profile_dir)
+    store = FeatureStore(profile_dir)
+    try:
+        store.sync()
+    except json.JSONDecodeError:
+        return None
+    if not len(store):
+        return None
+    try:
+        with open(profile_dir / 'profile.json', 'r', encoding='utf-8') as file:
+            followers, posts_count = _profile_followers(json.load(file))
+    except (FileNotFoundError, json.JSONDecodeError):
+        followers, posts_count = 0, len(store)
+
+    columns = store.columns
+    X = np.zeros((len(store), len(CORPUS_FEATURES)), dtype=np.float32)
+    X[:, 0] = columns['hour']
+    X[:, 1] = columns['is_peak_hour']
+    X[:, 2] = columns['is_weekday']
+    for day in range(1, 7):
+        X[:, 2 + day] = columns['weekday'] == day
+    caption_start = CORPUS_FEATURES.index(CAPTION_COLUMNS[0])
+    for i, name in enumerate(CAPTION_COLUMNS):
+        X[:, caption_start + i] = columns[name]
+    tags_start = CORPUS_FEATURES.index(HASHTAG_COLUMNS[0])
+    X[:, tags_start:tags_start + len(HASHTAG_COLUMNS)] = columns['hashtag_bag']
+    X[:, -3] = followers
+    X[:, -2] = np.log1p(followers)
+    X[:, -1] = posts_count
+    return X, columns['likes'].astype(np.float32)
+
+def load_corpus(profile_dir=LOCAL_PROFILE_DIR, workers=None):
+    """Extract every profile in a process pool and stack the results into one matrix."""
+    profile_dirs = [str(profile_layout.profile_dir(username, profile_dir))
+                    for username in profile_layout.list_usernames(profile_dir)]
+    print(f"Extracting features for {len(profile_dirs)} profiles...")
+    if not profile_dirs:
+        return pd.DataFrame(columns=CORPUS_FEATURES), pd.Series(dtype='float32')
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(profile_dirs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = [r for r in executor.map(extract_profile_matrix, profile_dirs, chunksize=chunksize) if r]
+    if not results:
+        return pd.DataFrame(columns=CORPUS_FEATURES), pd.Series(dtype='float32')
+    X = np.concatenate([r[0] for r in results])
+    y = np.concatenate([r[1] for r in results])
+    print(f"Corpus ready: {X.shape[0]} posts from {len(results)} profiles.")
+    return pd.DataFrame(X, columns=CORPUS_FEATURES), pd.Series(y, name='likes_count')
+
+def train_corpus_model(X, y):
+    """Train the global model with the histogram method on all cores."""
+    if X.empty or y.empty:
+        print("Error: No data available to train the model.")
+        return None, None
+    X_train, X_test, y_train, y_test = holdout_split(X, y)
+    model = xgb.XGBRegressor(**CORPUS_PARAMS, n_jobs=-1, random_state=42)
+    model.fit(X_train, y_train)
+    mae = mean_absolute_error(y_test, model.predict(X_test))
+    print(f"Mean Absolute Error on Test Set: {mae:.2f}")
+    return model, X_train.columns.tolist()
+
+def main_corpus(profile_dir=LOCAL_PROFILE_DIR, workers=None):
+    """Train one model on the whole local corpus and save it as the active model."""
+    try:
+        X, y = load_corpus(profile_dir, workers)
+        if X.empty:
+            print("Error: No data available for training.")
+            return None, None
+        cache_key = artifact_key(X, y, CORPUS_PARAMS, 'corpus')
+        cached = load_cached_model(cache_key)
+        if cached:
+            return cached
+        started = time.perf_counter()
+        model, feature_names = train_corpus_model(X, y)
+        if model:
+            save_model(model, feature_names, X, y, None, time.perf_counter() - started,
+                       corpus=True, cache_key=cache_key)
+            return model, feature_names
+    except KeyboardInterrupt:
+        print("\nProcess interrupted by user. Exiting...")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+    return None, None
+
+# Incremental updates: continue boosting from the saved booster on posts newer than its watermark
+def _parse_timestamp(timestamp):
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+
+def latest_timestamp(data):
+    """Newest post timestamp in the training data (the model's data watermark)."""
+    timestamps = [post['timestamp'] for post in data or [] if post.get('timestamp')]
+    return max(timestamps, key=_parse_timestamp) if timestamps else None
+
+def _source(post_data_file):
+    """How an artifact records the posts file it was trained on."""
+    return os.path.abspath(post_data_file)
+
+def save_model(model, feature_names, X, y, watermark, train_seconds, corpus=False, cache_key=None,
+               model_path=MODEL_PATH, source=None):
+    """
+    Save the model with the metadata incremental updates rely on: the posts
+    file it was trained on (`source`), its watermark, and a drift baseline.
+    The baseline is the MAE on the held-out test rows, since update_model
+    compares it with the error on posts the model has not seen.
+    """
+    LOCAL_MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    _, X_test, _, y_test = holdout_split(X, y)
+    joblib.dump({
+        'cache_key': cache_key,
+        'corpus': corpus,
+        'source': _source(source) if source else None,
+        'model': model,
+        'feature_names': feature_names,
+        'caption_defaults': caption_defaults(X),
+        'watermark': watermark,
+        'baseline_mae': float(mean_absolute_error(y_test, model.predict(X_test))),
+        'full_train_seconds': train_seconds,
+        'n_trees': model.get_booster().num_boosted_rounds(),
+        'updates': [],
+    }, model_path)
+    print(f"Model saved to {model_path}")
+    publish_model(model_path)
+    if cache_key:
+        store_cached_model(cache_key, model_path)
+
+# Content-addressed model cache: identical data, schema and parameters reuse the stored artifact
+def artifact_key(X, y, params, kind='profile', watermark=None):
+    """
+    Hash of the training rows (order-independent), the feature schema, the
+    hyperparameters and the XGBoost version.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        'kind': kind,
+        'schema': [[col, str(dtype)] for col, dtype in X.dtypes.items()],
+        'params': params,
+        'watermark': watermark,
+        'xgboost': xgb.__version__,
+    }, sort_keys=True, default=str).encode())
+    rows = pd.util.hash_pandas_object(X.assign(__target__=y.to_numpy()), index=False).to_numpy()
+    digest.update(np.sort(rows).tobytes())
+    return digest.hexdigest()[:32]
+
+def load_cached_model(cache_key, model_path=MODEL_PATH):
+    """Activate a cached artifact if one exists for cache_key. Returns (model, feature_names) or None."""
+    cached_path = MODEL_CACHE_DIR / f'{cache_key}.joblib'
+    cache_result('model', cached_path.exists())
+    if not cached_path.exists():
+        return None
+    LOCAL_MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    _copy_atomic(cached_path, model_path)
+    publish_model(model_path)
+    os.utime(cached_path)  # mark as recently used for garbage collection
+    artifact = joblib.load(model_path)
+    print(f"Loaded cached model {cache_key}, skipping training.")
+    return artifact['model'], artifact['feature_names']
+
+def store_cached_model(cache_key, model_path=MODEL_PATH):
+    MODEL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _copy_atomic(model_path, MODEL_CACHE_DIR / f'{cache_key}.joblib')
+    gc_model_cache()
+
+def _copy_atomic(source, target):
+    """Copy through a uniquely named temp file beside `target`, so concurrent copies never share one."""
+    with tempfile.NamedTemporaryFile(dir=target.parent, prefix=f'{target.stem}.', suffix='.tmp',
+                                     delete=False) as tmp:
+        tmp_path = Path(tmp.name)
+        try:
+            with open(source, 'rb') as file:
+                shutil.copyfileobj(file, tmp)
+        except BaseException:
+            tmp.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+    os.replace(tmp_path, target)
+
+def gc_model_cache(keep=MODEL_CACHE_KEEP):
+    """
+    Delete cached artifacts that no active model under LOCAL_MODEL_DIR references,
+    keeping the `keep` most recently used ones. Returns the number removed.
+    """
+    if not MODEL_CACHE_DIR.exists():
+        return 0
+    referenced = set()
+    for path in LOCAL_MODEL_DIR.glob('*.joblib'):
+        try:
+            referenced.add(joblib.load(path).get('cache_key'))
+        except Exception as e:
+            print(f"Could not read {path}: {e}")
+    entries = sorted(MODEL_CACHE_DIR.glob('*.joblib'), key=lambda p: p.stat().st_mtime, reverse=True)
+    removed = 0
+    for path in entries[keep:]:
+        if path.stem not in referenced:
+            path.unlink()
+            removed += 1
+    # Temp files of copies still in progress (in this or another process) are left alone
+    cutoff = time.time() - MODEL_CACHE_TMP_MAX_AGE_SECONDS
+    for path in MODEL_CACHE_DIR.glob('*.tmp'):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+    if removed:
+        print(f"Removed {removed} unreferenced cached models.")
+    return removed
+
+def update_model(post_data_file='swiggyindia_posts.json', model_path=MODEL_PATH):
+    """
+    Add INCREMENTAL_TREES boosting rounds trained only on posts newer than the
+    model's watermark. Falls back to a full retrain when there is no usable
+    artifact, when it was trained on another posts file, when the error on
+    new posts drifts past INCREMENTAL_DRIFT_TOLERANCE times the baseline, or
+    when the tree count would exceed INCREMENTAL_MAX_TREES.
+    """
+    started = time.perf_counter()
+    try:
+        artifact = joblib.load(model_path)
+    except FileNotFoundError:
+        artifact = {}
+    if artifact.get('corpus'):
+        print("Corpus model found, running a full corpus retrain.")
+        return main_corpus()
+    if not artifact.get('watermark'):
+        print("No watermarked model found, running a full retrain.")
+        return main(post_data_file)
+    if artifact.get('source') != _source(post_data_file):
+        # The watermark only says which posts of the *same* profile are new
+        print(f"Model was trained on {artifact.get('source')}, running a full retrain on {post_data_file}.")
+        return main(post_data_file)
+
+    data = load_data(post_data_file)
+    watermark = _parse_timestamp(artifact['watermark'])
+    new_posts = [post for post in data if _parse_timestamp(post['timestamp']) > watermark]
+    if not new_posts:
+        print(f"No posts newer than {artifact['watermark']}, model unchanged.")
+        return artifact['model'], artifact['feature_names']
+
+    X_new, y_new = prepare_data(extract_features(new_posts))
+    if X_new.empty:
+        return artifact['model'], artifact['feature_names']
+    feature_names = artifact['feature_names']
+    X_new = X_new.reindex(columns=feature_names, fill_value=0)
+
+    model = artifact['model']
+    new_mae = mean_absolute_error(y_new, model.predict(X_new))
+    drift_limit = artifact['baseline_mae'] * (1 + INCREMENTAL_DRIFT_TOLERANCE)
+    if new_mae > drift_limit:
+        print(f"Drift detected (MAE {new_mae:.2f} > {drift_limit:.2f}), running a full retrain.")
+        return main(post_data_file)
+    if artifact['n_trees'] + INCREMENTAL_TREES > INCREMENTAL_MAX_TREES:
+        print(f"Tree limit of {INCREMENTAL_MAX_TREES} reached, running a full retrain.")
+        return main(post_data_file)
+
+    params = model.get_params()
+    params['n_estimators'] = INCREMENTAL_TREES
+    updated = xgb.XGBRegressor(**params)
+    updated.fit(X_new, y_new, xgb_model=model.get_booster())
+
+    seconds = time.perf_counter() - started
+    saved = max(artifact.get('full_train_seconds', 0) - seconds, 0)
+    updates = artifact.get('updates', []) + [{
+        'at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'posts': len(new_posts),
+        'seconds': round(seconds, 3),
+        'seconds_saved': round(saved, 3),
+    }]
+    LOCAL_MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    joblib.dump({
+        **artifact,
+        'model': updated,
+        'watermark': latest_timestamp(new_posts),
+        'n_trees': updated.get_booster().num_boosted_rounds(),
+        'updates': updates[-50:],
+    }, model_path)
+    publish_model(model_path)
+    print(f"Model updated with {len(new_posts)} new posts in {seconds:.2f}s ({saved:.2f}s saved vs full retrain).")
+    return updated, feature_names
+
 # Main execution
-def main(post_data_file='swiggyindia_posts.json'):
+def main(post_data_file='swiggyindia_posts.json', tune=False, tune_options=None):
     try:
-        # Load and prepare data
-        data = load_data(post_data_file)
-        df = extract_features(data)
+        # Load and prepare data, from the profile's feature store when there is one
+        store = store_for_posts_file(post_data_file)
+        if store:
+            df, watermark = store.training_frame(), store.watermark()
+        else:
+            data = load_data(post_data_file)
+            df, watermark = extract_features(data), latest_timestamp(data)
         X, y = prepare_data(df)
 
         # Check if data is empty before proceeding
@@ -147,15 +463,27 @@ def main(post_data_file='swiggyindia_posts.json'):
             print("Error: No data available for training.")
             return
 
+        # Search hyperparameters first when asked; the result is saved for later retrains
+        params = None
+        if tune:
+            from tune_model import tune as tune_params
+            params = tune_params(X, y, **(tune_options or {}))['best_params']
+        params = params or load_tuned_params() or DEFAULT_PARAMS
+
+        # Reuse an identical model instead of training again
+        cache_key = artifact_key(X, y, params, 'profile', watermark)
+        cached = load_cached_model(cache_key)
+        if cached:
+            return cached
+
         # Train the model
-        model, feature_names = train_model(X, y)
+        started = time.perf_counter()
+        model, feature_names = train_model(X, y, params)
 
         if model:
-            LOCAL_MODEL_DIR.mkdir(parents=True, exist_ok=True)
-            # Save the model and feature names
-            model_path = LOCAL_MODEL_DIR / 'likes_predictor.joblib'
-            joblib.dump({'model': model, 'feature_names': feature_names}, model_path)
-            print(f"Model saved to {model_path}")
+            # Save the model and feature names, plus the data watermark for incremental updates
+            save_model(model, feature_names, X, y, watermark, time.perf_counter() - started, cache_key=cache_key,
+                       source=post_data_file)
             return  model, feature_names
     except KeyboardInterrupt:
         print("\nProcess interrupted by user. Exiting...")
@@ -163,4 +491,13 @@ def main(post_data_file='swiggyindia_posts.json'):
         print(f"An error occurred: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if '--corpus' in sys.argv:
+        main_corpus()
+    elif '--incremental' in sys.argv:
+        update_model()
+    elif '--tune' in sys.argv:
+        main(tune=True)
+    elif '--gc' in sys.argv:
+        gc_model_cache()
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+Posting schedule optimizer behind /api/schedule/optimize.
+
+Every whole hour in the requested range is a candidate slot, unless its
+hour of day is blocked. The like model only sees hour of day and weekday
+(plus per-request context), so all slots are scored with one predict call
+over the 168 distinct (weekday, hour) pairs. The best `posts` slots that
+are at least `min_gap_hours` apart are then chosen exactly by dynamic
+programming, one vectorized pass per post.
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from predict_like import predict_likes_bulk
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def candidate_slots(start, end, blocked_hours=()):
+    """Whole-hour UTC slots in [start, end) as unix seconds, minus blocked hours of day."""
+    first = int(np.ceil(start.timestamp() / 3600)) * 3600
+    times = np.arange(first, int(end.timestamp()), 3600, dtype=np.int64)
+    hours = (times // 3600) % 24
+    if len(blocked_hours):
+        times = times[~np.isin(hours, list(blocked_hours))]
+    return times
+
+
+def slot_scores(model, feature_names, times, extra_features=None):
+    """Predicted likes for every slot, from one model call over the distinct (weekday, hour) pairs."""
+    hours = (times // 3600) % 24
+    weekdays = (times // 86400 + 3) % 7  # 1970-01-01 was a Thursday
+    weekday_grid, hour_grid = np.divmod(np.arange(7 * 24), 24)
+    table = predict_likes_bulk(model, feature_names, hour_grid, weekday_grid, extra_features)
+    return table[weekdays * 24 + hours]
+
+
+def select_slots(times, scores, count, min_gap):
+    """
+    Indices of the `count` slots (or as many as fit) with the highest total
+    score such that any two are at least `min_gap` seconds apart. `times`
+    must be sorted. best[j][i] is the best total of j slots among the first
+    i; each layer is a running maximum over the previous one, so it costs
+    one vectorized pass.
+    """
+    n = len(times)
+    if not n or count <= 0:
+        return np.array([], dtype=np.int64)
+    # Slots before `earlier[i]` (exclusive) are far enough from slot i, and never include slot i itself
+    earlier = np.minimum(np.searchsorted(times, times - min_gap, side='right'), np.arange(n))
+    previous = np.zeros(n + 1)  # best[j - 1], indexed by prefix length 0..n
+    choices = []  # per layer: for each prefix length, the slot picked last
+    for _ in range(count):
+        candidate = previous[earlier] + scores
+        running = np.maximum.accumulate(candidate)
+        picked = np.maximum.accumulate(np.where(candidate >= running, np.arange(n), 0))
+        current = np.concatenate([[-np.inf], running])
+        if not np.isfinite(current[-1]):
+            break
+        choices.append(picked)
+        previous = current
+
+    chosen, prefix = [], n
+    for picked in reversed(choices):
+        slot = picked[prefix - 1]
+        chosen.append(slot)
+        prefix = earlier[slot]
+    return np.array(sorted(chosen), dtype=np.int64)
+
+
+def optimize(model, feature_names, start, end, posts, min_gap_hours=24, blocked_hours=(), extra_features=None):
+    """The chosen slots (in time order) and how many candidates were considered."""
+    times = candidate_slots(start, end, blocked_hours)
+    if not len(times):
+        return [], 0
+    scores = slot_scores(model, feature_names, times, extra_features)
+    chosen = select_slots(times, scores, posts, min_gap_hours * 3600)
+    schedule = []
+    for i in chosen:
+        at = datetime.fromtimestamp(int(times[i]), tz=timezone.utc)
+        schedule.append({'datetime': at.strftime('%Y-%m-%dT%H:%M:%SZ'), 'day': DAYS[at.weekday()],
+                         'hour': at.hour, 'predictedLikes': int(scores[i])})
+    return schedule, len(times)
+
+
+def _parse_datetime(value):
+    """ISO date or datetime; naive values are UTC."""
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_range(start=None, end=None, default_days=7):
+    """(start, end) from ISO strings; start defaults to now, end to `default_days` after start."""
+    start = _parse_datetime(start) if start else datetime.now(timezone.utc)
+    end = _parse_datetime(end) if end else start + timedelta(days=default_days)
+    return start, end
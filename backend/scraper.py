@@ -7,6 +7,11 @@ from random import choice, uniform
 from dotenv import load_dotenv
 from pathlib import Path
 from aws_s3_storage import upload_model_to_s3, upload_to_s3, download_file_from_s3
+from metrics import timed
+from file_lock import file_lock
+from profile_index import profile_written
+from profile_layout import profile_dir, profile_path
+from backends import apify_client_class
 # Load environment variables from .env file
 load_dotenv()
 
@@ -39,17 +44,28 @@ def load_cache():
     return {}
 
 def save_cache(cache):
-    """Save the cache to the cache file."""
-    with open(CACHE_FILE, "w") as file:
+    """Save the cache to the cache file (replaced atomically, so readers never see a partial file)."""
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    tmp_path = CACHE_FILE + ".tmp"
+    with open(tmp_path, "w") as file:
         json.dump(cache, file, indent=4)
+    os.replace(tmp_path, CACHE_FILE)
 
+def update_cache(username, **fields):
+    """Merge fields into one username's cache entry; serialized across threads and processes."""
+    with file_lock(CACHE_FILE + ".lock"):
+        cache = load_cache()
+        cache.setdefault(username, {}).update(fields)
+        save_cache(cache)
+
+@timed('instagram_scrape')
 def scrape_user_data(username, max_posts=12):
     """Fetch all posts for a given username using Instagram's API with pagination, delays, retries, and caching."""
     base_url = "https://i.instagram.com/api/v1/users/web_profile_info/"
     all_posts = []
     batch_count = 0
     batch_size = 1  # Number of posts to save in each batch
-    folder_path = os.path.join('data','profiles',username)
+    folder_path = str(profile_dir(username))
 
     # Create folder for the username if it doesn't exist
     os.makedirs(folder_path, exist_ok=True)
@@ -87,15 +103,16 @@ def scrape_user_data(username, max_posts=12):
                 if len(all_posts) >= batch_size:
                     batch_count += 1
                     save_to_file(user_data, os.path.join(folder_path, "profile.json"))
+                    profile_written(username)
                     all_posts = all_posts[batch_size:]
 
                 # Update cache
-                cache[username] = {
-                    "end_cursor": end_cursor,
-                    "has_next_page": has_next_page,
-                    "last_scraped": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-                save_cache(cache)
+                update_cache(
+                    username,
+                    end_cursor=end_cursor,
+                    has_next_page=has_next_page,
+                    last_scraped=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                )
 
                 # Check if max_posts limit is reached
                 if max_posts and len(all_posts) >= max_posts:
@@ -161,7 +178,8 @@ def store_posts_into_json(posts, username):
         formatted_posts.append(formatted_post)
     
     # Save the entire list of formatted posts
-    save_to_file(formatted_posts, os.path.join('data', 'profiles', username, 'posts.json'))
+    save_to_file(formatted_posts, str(profile_path(username, 'posts.json')))
+    profile_written(username)
 
     return True if formatted_posts else False
 
@@ -193,7 +211,8 @@ def store_posts_into_json(item, username):
         formatted_posts.append(formatted_post)
     
     # Save the entire list of formatted posts
-    save_to_file(formatted_posts, os.path.join('data', 'profiles', username, 'posts.json'))
+    save_to_file(formatted_posts, str(profile_path(username, 'posts.json')))
+    profile_written(username)
 
     return True if formatted_posts else False
 
@@ -212,15 +231,11 @@ def save_to_file(data, filename):
     print(f"{Colors.OKCYAN}💾 Data saved to {filename}{Colors.ENDC}")
 
 
-def scrape_using_apify(username, max_posts=200):
-    """Scrape Instagram posts using Apify Actor."""
-    from apify_client import ApifyClient
-
-    # Initialize the ApifyClient with your API token
-    client = ApifyClient(os.getenv("APIFY_API_KEY"))
+APIFY_ACTOR_ID = "shu8hvrXbJbY3Eb9W"
 
-    # Prepare the Actor input
-    run_input = {
+def apify_run_input(username, max_posts=200):
+    """Actor input for scraping a profile's details and latest posts."""
+    return {
         "addParentData": False,
         "directUrls": [f"https://www.instagram.com/{username}/"],
         "resultsType": "details",
@@ -232,8 +247,19 @@ def scrape_using_apify(username, max_posts=200):
         "searchType": "hashtag"
     }
 
+@timed('apify_scrape')
+def scrape_using_apify(username, max_posts=200):
+    """Scrape Instagram posts using Apify Actor."""
+    ApifyClient = apify_client_class()
+
+    # Initialize the ApifyClient with your API token
+    client = ApifyClient(os.getenv("APIFY_API_KEY"))
+
+    # Prepare the Actor input
+    run_input = apify_run_input(username, max_posts)
+
     # Run the Actor and wait for it to finish
-    run = client.actor("shu8hvrXbJbY3Eb9W").call(run_input=run_input)
+    run = client.actor(APIFY_ACTOR_ID).call(run_input=run_input)
 
     # Fetch and process Actor results
     for item in client.dataset(run["defaultDatasetId"]).iterate_items():
@@ -278,11 +304,12 @@ def scrape_using_apify(username, max_posts=200):
             })
 
         # Save profile and posts data
-        folder_path = os.path.join('data', 'profiles', username)
+        folder_path = str(profile_dir(username))
         os.makedirs(folder_path, exist_ok=True)
 
         save_to_file(profile_data, os.path.join(folder_path, 'profile.json'))
         save_to_file(posts_data, os.path.join(folder_path, 'posts.json'))
+        profile_written(username)
 
         # upload the files to aws s3
         upload_to_s3(username, "profile")
@@ -0,0 +1,214 @@
+"""
+Single-object snapshots of the data directory, for bootstrapping a node
+without one S3 request per file.
+
+    python snapshot.py export                  # pack and upload a new snapshot
+    python snapshot.py restore [--name NAME]   # restore the latest (or a named) snapshot
+    python snapshot.py info                    # show the latest snapshot's manifest
+
+An export packs every profile's posts.json/profile.json, everything under
+LOCAL_MODEL_DIR and the fetch cache into one deflate-compressed zip. It is
+uploaded as snapshots/<name>.zip, followed by a snapshots/<name>.json
+manifest (sha256, sizes, file count). snapshots/latest.json is replaced
+last, so a restore never sees a half-uploaded snapshot.
+
+A restore downloads the archive in one request (boto3 splits large objects
+into parallel ranged GETs) and checks the sha256. Members are then
+extracted by SNAPSHOT_WORKERS threads, each with its own handle on the
+archive; zip CRCs are verified as each member is read. Profiles are stored
+as profiles/<username>/<file> and land in the active profile layout, after
+which the profile manifest and index are rebuilt.
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from config import LOCAL_DATA_DIR, LOCAL_MODEL_DIR, SNAPSHOT_DIR, SNAPSHOT_WORKERS, SNAPSHOT_COMPRESS_LEVEL
+from metrics import timed
+import profile_layout
+
+FETCH_CACHE_FILE = LOCAL_DATA_DIR / 'fetch_cache.json'
+S3_PREFIX = 'snapshots/'
+LATEST_KEY = S3_PREFIX + 'latest.json'
+
+
+class SnapshotError(Exception):
+    """The snapshot is missing, incomplete or fails its checksum."""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_members():
+    """(archive name, local path) for every file that goes into a snapshot."""
+    members = []
+    for username in profile_layout.list_usernames():
+        for name in profile_layout.PROFILE_FILES:
+            path = profile_layout.profile_path(username, name)
+            if path.exists():
+                members.append((f'profiles/{username}/{name}', path))
+    if LOCAL_MODEL_DIR.exists():
+        for path in sorted(LOCAL_MODEL_DIR.rglob('*')):
+            if path.is_file() and path.suffix != '.tmp':
+                members.append(('models/' + path.relative_to(LOCAL_MODEL_DIR).as_posix(), path))
+    if FETCH_CACHE_FILE.exists():
+        members.append(('fetch_cache.json', FETCH_CACHE_FILE))
+    return members
+
+
+def local_path(arcname):
+    """Where an archive member is restored to; None for names a snapshot never contains."""
+    parts = arcname.split('/')
+    if '..' in parts or '' in parts:
+        return None
+    if parts[0] == 'profiles' and len(parts) == 3 and parts[2] in profile_layout.PROFILE_FILES:
+        return profile_layout.profile_path(parts[1], parts[2])
+    if parts[0] == 'models' and len(parts) > 1:
+        return LOCAL_MODEL_DIR.joinpath(*parts[1:])
+    if arcname == 'fetch_cache.json':
+        return FETCH_CACHE_FILE
+    return None
+
+
+@timed('snapshot_export')
+def export_snapshot(name=None):
+    """Pack the data directory into one archive and upload it with its manifest. Returns the manifest."""
+    from aws_s3_storage import upload_file_to_s3
+
+    name = name or datetime.now().strftime('%Y%m%dT%H%M%S')
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    archive = SNAPSHOT_DIR / f'{name}.zip'
+    members = snapshot_members()
+    raw_bytes = 0
+    with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED, compresslevel=SNAPSHOT_COMPRESS_LEVEL) as zf:
+        for arcname, path in members:
+            zf.write(path, arcname)
+            raw_bytes += path.stat().st_size
+    manifest = {
+        'name': name,
+        'key': f'{S3_PREFIX}{name}.zip',
+        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'files': len(members),
+        'raw_bytes': raw_bytes,
+        'archive_bytes': archive.stat().st_size,
+        'sha256': _sha256(archive),
+    }
+    manifest_path = SNAPSHOT_DIR / f'{name}.json'
+    with open(manifest_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+
+    if not upload_file_to_s3(archive, manifest['key']):
+        raise SnapshotError(f"Could not upload {manifest['key']}")
+    if not upload_file_to_s3(manifest_path, f'{S3_PREFIX}{name}.json') or \
+            not upload_file_to_s3(manifest_path, LATEST_KEY):
+        raise SnapshotError(f"Could not upload the manifest for {name}")
+    archive.unlink()
+    print(f"Snapshot {name}: {manifest['files']} files, {raw_bytes} bytes packed into {manifest['archive_bytes']}.")
+    return manifest
+
+
+def read_manifest(name=None):
+    """The manifest of the named snapshot, or of the latest one."""
+    from aws_s3_storage import fetch_from_s3
+
+    key = f'{S3_PREFIX}{name}.json' if name else LATEST_KEY
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'manifest.json'
+        if not fetch_from_s3(key, path):
+            raise SnapshotError(f"No snapshot manifest at {key}")
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+
+def _extract(archive, names):
+    """Extract some members of the archive; runs in a worker thread with its own handle."""
+    written = 0
+    with zipfile.ZipFile(archive) as zf:
+        for arcname in names:
+            destination = local_path(arcname)
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = destination.with_name(destination.name + '.tmp')
+            with zf.open(arcname) as source, open(tmp_path, 'wb') as target:
+                while True:
+                    block = source.read(1024 * 1024)
+                    if not block:
+                        break
+                    target.write(block)
+                    written += len(block)
+            os.replace(tmp_path, destination)
+    return written
+
+
+@timed('snapshot_restore')
+def restore_snapshot(name=None, workers=SNAPSHOT_WORKERS):
+    """Download, verify and extract a snapshot into the data directory. Returns a summary."""
+    from aws_s3_storage import fetch_from_s3
+    from profile_index import get_index
+
+    started = time.perf_counter()
+    manifest = read_manifest(name)
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    archive = SNAPSHOT_DIR / f"{manifest['name']}.zip"
+    try:
+        if not fetch_from_s3(manifest['key'], archive):
+            raise SnapshotError(f"Could not download {manifest['key']}")
+        if _sha256(archive) != manifest['sha256']:
+            raise SnapshotError(f"Checksum mismatch for {manifest['key']}")
+        with zipfile.ZipFile(archive) as zf:
+            entries = sorted(zf.infolist(), key=lambda info: info.file_size, reverse=True)
+        unknown = [info.filename for info in entries if local_path(info.filename) is None]
+        if unknown:
+            raise SnapshotError(f"Unexpected entries in {manifest['key']}: {unknown[:5]}")
+
+        # Largest members first, dealt round-robin so the threads finish together
+        workers = max(1, min(workers, len(entries)))
+        groups = [[info.filename for info in entries[i::workers]] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            written = sum(executor.map(lambda names: _extract(archive, names), groups))
+    except zipfile.BadZipFile as e:
+        raise SnapshotError(f"Corrupt snapshot {manifest['key']}: {e}")
+    finally:
+        archive.unlink(missing_ok=True)
+
+    profiles = profile_layout.build_manifest()
+    get_index().refresh(force=True)
+    seconds = time.perf_counter() - started
+    print(f"Restored snapshot {manifest['name']}: {len(entries)} files, {profiles} profiles in {seconds:.2f}s.")
+    return {'name': manifest['name'], 'files': len(entries), 'bytes': written, 'profiles': profiles,
+            'seconds': round(seconds, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='pack the data directory and upload it')
+    export_parser.add_argument('--name', help='snapshot name (default: current timestamp)')
+    restore_parser = subparsers.add_parser('restore', help='download and extract a snapshot')
+    restore_parser.add_argument('--name', help='snapshot to restore (default: latest)')
+    restore_parser.add_argument('--workers', type=int, default=SNAPSHOT_WORKERS)
+    info_parser = subparsers.add_parser('info', help="print a snapshot's manifest")
+    info_parser.add_argument('--name', help='snapshot to describe (default: latest)')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_snapshot(args.name)
+    elif args.command == 'restore':
+        restore_snapshot(args.name, args.workers)
+    else:
+        print(json.dumps(read_manifest(args.name), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Seeded generator of synthetic posts in the posts.json schema written by the
+scraper (id, shortcode, likes_count, comments_count, timestamp, caption, hashtags).
+
+    python synthetic_posts.py 100000 data/profiles/synthetic/posts.json --seed 7
+"""
+import argparse
+import json
+import string
+
+import numpy as np
+
+HASHTAGS = ['#food', '#foodie', '#memes', '#indianmemes', '#summer', '#mango', '#reels', '#fyp',
+            '#explore', '#trending', '#delivery', '#weekend', '#offer', '#cricket', '#monsoon']
+WORDS = ['order', 'now', 'hungry', 'late', 'night', 'cravings', 'biryani', 'pizza', 'chai', 'deal',
+         'today', 'weekend', 'vibes', 'when', 'you', 'the', 'best', 'finally', 'that', 'time']
+# Engagement multipliers so the hour/day features carry signal
+HOUR_EFFECT = 1 + 0.6 * np.exp(-((np.arange(24) - 18) ** 2) / 18)
+DAY_EFFECT = np.array([0.9, 0.95, 1.0, 1.0, 1.1, 1.3, 1.25])
+ALPHABET = string.ascii_letters + string.digits + '_-'
+START = np.datetime64('2020-01-01T00:00:00')
+START_WEEKDAY = 2  # 2020-01-01 was a Wednesday
+
+
+def generate_posts(count, seed=42, base_likes=3000):
+    """Return `count` posts from 2020 onwards, oldest first, reproducible for a given seed."""
+    rng = np.random.default_rng(seed)
+    offsets = np.sort(rng.integers(0, 5 * 365 * 24 * 3600, size=count))
+    timestamps = np.datetime_as_string(START + offsets.astype('timedelta64[s]'), unit='s')
+    hours = (offsets // 3600) % 24
+    days = (offsets // 86400 + START_WEEKDAY) % 7
+    likes = (base_likes * HOUR_EFFECT[hours] * DAY_EFFECT[days] * rng.lognormal(0, 0.5, size=count)).astype(int)
+    comments = (likes * rng.uniform(0.02, 0.08, size=count)).astype(int)
+    n_words = rng.integers(3, 15, size=count)
+    words = rng.integers(0, len(WORDS), size=(count, 15))
+    n_tags = rng.integers(0, 8, size=count)
+    tags = rng.random((count, len(HASHTAGS))).argsort(axis=1)[:, :8]
+    shortcodes = rng.integers(0, len(ALPHABET), size=(count, 11))
+
+    posts = []
+    for i in range(count):
+        post_tags = [HASHTAGS[t] for t in tags[i, :n_tags[i]]]
+        caption = ' '.join(WORDS[w] for w in words[i, :n_words[i]])
+        posts.append({
+            'id': str(3_000_000_000_000_000_000 + seed * 10_000_000 + i),
+            'shortcode': ''.join(ALPHABET[c] for c in shortcodes[i]),
+            'likes_count': int(likes[i]),
+            'comments_count': int(comments[i]),
+            'timestamp': f"{timestamps[i]}Z",
+            'caption': caption + ('\n\n' + ' '.join(post_tags) if post_tags else ''),
+            'hashtags': post_tags,
+        })
+    return posts
+
+
+def write_posts(count, path, seed=42):
+    posts = generate_posts(count, seed)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(posts, file)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('count', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    write_posts(args.count, args.path, args.seed)
+    print(f"Wrote {args.count} synthetic posts to {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,7 @@ from pathlib import Path
 from aws_s3_storage import upload_model_to_s3, upload_to_s3, download_file_from_s3
 from firebase_database import create_user, calc_avg_likes,avg_comments, UserData
 from scraper import scrape_using_apify
+from profile_layout import list_usernames, profile_path
 
 # user = data["data"]["user"]
 def upload_bulk_profiles(data):
@@ -31,9 +32,9 @@ def upload_bulk_profiles(data):
     create_user(user_data)
     
 def bulk_upload_profiles_posts_to_s3():
-    for profile in os.listdir("data/profiles/"):
+    for profile in list_usernames():
         # profile = "swiggyindia"
-        file_path = f"data/profiles/{profile}/posts.json"
+        file_path = profile_path(profile, "posts.json")
 
         # with open(file_path, "r") as file:
         #     data = json.load(file)
@@ -53,9 +54,10 @@ def upload_cache_file_to_s3():
     else:
         print(f"Cache file {cache_file_path} does not exist.")
 
-# upload_cache_file_to_s3()
-# download_file_from_s3("fetch_cache.json", "fetch_cache.json")
-bulk_upload_profiles_posts_to_s3()
-# download_data_from_server()
+if __name__ == "__main__":
+    # upload_cache_file_to_s3()
+    # download_file_from_s3("fetch_cache.json", "fetch_cache.json")
+    bulk_upload_profiles_posts_to_s3()
+    # download_data_from_server()
 
-# scrape_using_apify("wth_ishu")
\ No newline at end of file
+    # scrape_using_apify("wth_ishu")
\ No newline at end of file
@@ -0,0 +1,34 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# External services are replaced by the stand-ins in backends.py
+for _var, _value in (('STORAGE_BACKEND', 'memory'), ('FIRESTORE_BACKEND', 'memory'), ('APIFY_BACKEND', 'synthetic')):
+    os.environ.setdefault(_var, _value)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory, so the relative data/ paths from config land under tmp_path."""
+    import profile_layout
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(profile_layout, '_manifests', {})
+    return tmp_path
+
+
+def write_profile(base, username, posts, profile=None):
+    """Write a flat-layout profile folder under `base`; returns the folder."""
+    folder = Path(base) / username
+    folder.mkdir(parents=True, exist_ok=True)
+    with open(folder / 'posts.json', 'w', encoding='utf-8') as file:
+        json.dump(posts, file)
+    if profile is not None:
+        with open(folder / 'profile.json', 'w', encoding='utf-8') as file:
+            json.dump(profile, file)
+    return folder
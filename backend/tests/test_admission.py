@@ -0,0 +1,131 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import admission
+from admission import AdmissionController, Rejected
+
+
+def _controller(**classes):
+    return AdmissionController(classes, {})
+
+
+def _start(controller, name, started, hold, label=None):
+    """Acquire in a thread; record the label (default: the class) once admitted, release when `hold` is set."""
+    def run():
+        admitted_at = controller.acquire(name)
+        started.append(name if label is None else label)
+        hold.wait(5)
+        controller.release(name, admitted_at)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_full_queue_is_rejected_immediately():
+    controller = _controller(scrape=(0, 1, 1, 5))
+    started, hold = [], threading.Event()
+    _start(controller, 'scrape', started, hold)
+    _wait_for(lambda: started)
+    waiter = _start(controller, 'scrape', started, hold)
+    _wait_for(lambda: controller.status()['scrape']['waiting'] == 1)
+
+    began = time.monotonic()
+    with pytest.raises(Rejected) as rejected:
+        controller.acquire('scrape')
+    assert rejected.value.reason == 'queue_full'
+    assert rejected.value.retry_after >= 1
+    assert time.monotonic() - began < 0.5
+
+    hold.set()
+    waiter.join(5)
+    assert started == ['scrape', 'scrape']
+    assert controller.status()['scrape']['active'] == 0
+
+
+def test_wait_runs_out():
+    controller = _controller(retrain=(0, 1, 2, 0.2))
+    admitted_at = controller.acquire('retrain')
+    began = time.monotonic()
+    with pytest.raises(Rejected) as rejected:
+        controller.acquire('retrain')
+    assert rejected.value.reason == 'timeout'
+    assert 0.15 < time.monotonic() - began < 2
+    assert controller.status()['retrain']['waiting'] == 0
+    controller.release('retrain', admitted_at)
+    controller.release('retrain', controller.acquire('retrain'))
+
+
+def test_waiting_requests_start_in_order():
+    controller = _controller(batch=(0, 1, 8, 5))
+    started, hold = [], threading.Event()
+    first = controller.acquire('batch')
+    for i in range(3):
+        _start(controller, 'batch', started, hold, label=i)
+        _wait_for(lambda: controller.status()['batch']['waiting'] == i + 1)
+    controller.release('batch', first)
+    hold.set()
+    _wait_for(lambda: len(started) == 3)
+    assert started == [0, 1, 2]
+    assert controller.status()['batch']['waiting'] == 0
+
+
+def test_higher_priority_queue_goes_first():
+    controller = _controller(read=(0, 1, 8, 5), scrape=(1, 1, 8, 5))
+    order, hold = [], threading.Event()
+    reading = controller.acquire('read')
+    _start(controller, 'read', order, hold)
+    _wait_for(lambda: controller.status()['read']['waiting'] == 1)
+
+    # scrape has a free slot, but a read is waiting
+    _start(controller, 'scrape', order, hold)
+    _wait_for(lambda: controller.status()['scrape']['waiting'] == 1)
+    time.sleep(0.1)
+    assert order == []
+
+    controller.release('read', reading)
+    _wait_for(lambda: len(order) == 2)
+    assert order == ['read', 'scrape']
+    hold.set()
+
+
+def test_request_with_a_free_slot_never_queues():
+    controller = _controller(read=(0, 2, 0, 1))
+    first = controller.acquire('read')
+    second = controller.acquire('read')
+    with pytest.raises(Rejected) as rejected:
+        controller.acquire('read')
+    assert rejected.value.reason == 'queue_full'
+    controller.release('read', first)
+    controller.release('read', second)
+
+
+def test_rejection_is_a_429_with_retry_after(monkeypatch):
+    controller = AdmissionController({'read': (0, 1, 0, 1)}, {})
+    monkeypatch.setattr(admission, 'controller', controller)
+    app = Flask(__name__)
+    app.before_request(admission.admit)
+    app.teardown_request(admission.release)
+
+    @app.route('/ping')
+    def ping():
+        return 'pong'
+
+    client = app.test_client()
+    assert client.get('/ping').status_code == 200
+    held = controller.acquire('read')
+    response = client.get('/ping')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['retryAfter'] == int(response.headers['Retry-After'])
+    controller.release('read', held)
+    assert client.get('/ping').status_code == 200
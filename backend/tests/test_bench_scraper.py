@@ -0,0 +1,23 @@
+from argparse import Namespace
+
+import bench_scraper
+
+
+def test_every_run_scrapes_all_posts(workdir):
+    args = Namespace(posts=[40], latency=0.0, jitter=0.0, error_rate=0.0, repeat=2)
+    results = {r['benchmark']: r for r in bench_scraper.run(args)}
+    assert results['scrape_user_data']['posts_served'] == 40
+    assert results['scrape_user_data']['posts_per_sec'] > 0
+    assert results['scrape_using_apify']['posts_served'] == 40
+    assert results['scrape_using_apify']['posts_per_sec'] > 0
+    assert not (workdir / 'data').exists()
+
+
+
+def test_failed_runs_are_counted_not_timed(workdir):
+    # With these seeds the replayed actor fails on 4 of the 6 repeats
+    args = Namespace(posts=[40], latency=0.0, jitter=0.0, error_rate=0.5, repeat=6)
+    result = {r['benchmark']: r for r in bench_scraper.run(args)}['scrape_using_apify']
+    assert result['errors'] == 4
+    assert result['posts_served'] == 40
+    assert result['posts_per_sec'] > 0
@@ -0,0 +1,39 @@
+import gzip
+
+import brotli
+import numpy as np
+from flask import Flask, jsonify, request
+
+import fast_json
+
+
+def _app():
+    app = Flask(__name__)
+    app.json = fast_json.FastJSONProvider(app)
+
+    @app.route('/posts')
+    def posts():
+        return jsonify({'likes': np.arange(500, dtype=np.int64), 'mean': np.float32(1.5)})
+
+    @app.after_request
+    def compress(response):
+        return fast_json.compress_response(response, request.accept_encodings)
+
+    return app
+
+
+def test_orjson_is_the_default_backend():
+    assert fast_json.JSON_BACKEND == 'orjson'
+    assert fast_json.dumps_bytes({'a': np.int64(1)}) == fast_json.dumps_bytes({'a': 1}, backend='json')
+
+
+def test_brotli_is_preferred_over_gzip():
+    client = _app().test_client()
+    response = client.get('/posts', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    payload = fast_json.orjson.loads(brotli.decompress(response.get_data()))
+    assert payload['likes'][-1] == 499 and payload['mean'] == 1.5
+
+    response = client.get('/posts', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert fast_json.orjson.loads(gzip.decompress(response.get_data()))['likes'][0] == 0
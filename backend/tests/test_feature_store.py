@@ -0,0 +1,90 @@
+import multiprocessing
+
+import feature_store
+from feature_store import FeatureStore, get_store
+from synthetic_posts import generate_posts
+
+from conftest import write_profile
+
+
+def test_sync_appends_new_posts(workdir):
+    posts = generate_posts(20, seed=1)
+    folder = write_profile(workdir, 'alice', posts[:15])
+    store = FeatureStore(folder)
+    assert store.sync() == 15
+    write_profile(workdir, 'alice', posts)
+    assert store.sync() == 5
+    assert len(store) == 20
+    assert store.slot_count.sum() == 20
+    assert store.slot_sum.sum() == sum(post['likes_count'] for post in posts)
+
+
+def test_sync_rebuilds_when_posts_are_deleted(workdir):
+    posts = generate_posts(20, seed=2)
+    folder = write_profile(workdir, 'alice', posts)
+    store = FeatureStore(folder)
+    store.sync()
+    remaining = posts[:5] + posts[10:]
+    write_profile(workdir, 'alice', remaining)
+    store.sync()
+    assert len(store) == 15
+    assert set(store.columns['post_id']) == {post['id'] for post in remaining}
+    assert store.slot_count.sum() == 15
+    assert store.slot_sum.sum() == sum(post['likes_count'] for post in remaining)
+    assert store.slot_max.max() == max(post['likes_count'] for post in remaining)
+
+    # The rebuilt store is what gets persisted
+    reloaded = FeatureStore(folder)
+    assert len(reloaded) == 15
+
+
+def test_sync_patches_changed_likes(workdir):
+    posts = generate_posts(10, seed=3)
+    folder = write_profile(workdir, 'alice', posts)
+    store = FeatureStore(folder)
+    store.sync()
+    posts[0]['likes_count'] += 1000
+    write_profile(workdir, 'alice', posts)
+    assert store.sync() == 0
+    assert store.slot_sum.sum() == sum(post['likes_count'] for post in posts)
+
+
+def test_get_store_keeps_most_recently_used(workdir, monkeypatch):
+    monkeypatch.setattr(feature_store, 'FEATURE_STORE_CACHE_SIZE', 2)
+    monkeypatch.setattr(feature_store, '_stores', feature_store.OrderedDict())
+    for username in ('a', 'b', 'c'):
+        write_profile(workdir, username, generate_posts(3, seed=4))
+    get_store('a', workdir)
+    get_store('b', workdir)
+    get_store('a', workdir)
+    get_store('c', workdir)
+    assert [username for _, username in feature_store._stores] == ['a', 'c']
+
+
+def test_get_store_drops_profiles_without_posts(workdir, monkeypatch):
+    monkeypatch.setattr(feature_store, '_stores', feature_store.OrderedDict())
+    folder = write_profile(workdir, 'alice', generate_posts(3, seed=5))
+    assert len(get_store('alice', workdir)) == 3
+    (folder / 'posts.json').unlink()
+    assert len(get_store('alice', workdir)) == 0
+    assert not feature_store._stores
+
+
+def _save_repeatedly(folder, count):
+    store = FeatureStore(folder)
+    store.sync()
+    for _ in range(count):
+        store.save()
+
+
+def test_concurrent_saves_of_one_profile(workdir):
+    folder = write_profile(workdir / 'profiles', 'alice', generate_posts(50, seed=1))
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_save_repeatedly, args=(folder, 30)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert [process.exitcode for process in processes] == [0, 0, 0, 0]
+    assert len(FeatureStore(folder)) == 50
+    assert sorted(path.name for path in folder.iterdir()) == ['features.npz', 'posts.json']
@@ -0,0 +1,78 @@
+import multiprocessing
+
+import hashtag_index
+from hashtag_index import HashtagIndex
+from profile_layout import record_write
+
+from conftest import write_profile
+
+
+def _posts(tag, likes):
+    return [{'id': f'{tag}_{i}', 'likes_count': likes, 'comments_count': 1, 'hashtags': [f'#{tag}']}
+            for i in range(3)]
+
+
+def test_profile_updates_save_on_a_throttle(workdir, monkeypatch):
+    base = workdir / 'profiles'
+    index = HashtagIndex(workdir / 'hashtag_index.json', base)
+    saves = []
+    save = index.save
+    monkeypatch.setattr(index, 'save', lambda: saves.append(1) or save())
+
+    for i in range(5):
+        write_profile(base, f'user{i}', _posts('mango', 10))
+        assert index.update_profile(f'user{i}')
+    assert len(saves) == 1
+    assert index.dirty
+    assert index.lookup('mango')['profiles'] == 5
+
+    # The next refresh writes out the pending updates
+    index.refresh(force=True)
+    assert len(saves) == 2
+    assert not index.dirty
+    assert HashtagIndex(workdir / 'hashtag_index.json', base).lookup('mango')['profiles'] == 5
+
+
+def test_unsaved_updates_are_recovered_by_refresh(workdir, monkeypatch):
+    base = workdir / 'profiles'
+    write_profile(base, 'alice', _posts('mango', 10))
+    record_write('alice', base)
+    index = HashtagIndex(workdir / 'hashtag_index.json', base)
+    index.refresh(force=True)
+
+    monkeypatch.setattr(hashtag_index, 'HASHTAG_INDEX_SAVE_SECONDS', 3600)
+    write_profile(base, 'alice', _posts('papaya', 20))
+    record_write('alice', base)
+    assert index.update_profile('alice')
+    assert index.dirty
+
+    # A new process loads the stale file and re-indexes alice
+    reloaded = HashtagIndex(workdir / 'hashtag_index.json', base)
+    assert reloaded.lookup('papaya') is None
+    assert reloaded.refresh(force=True) == 1
+    assert reloaded.lookup('papaya')['avg_likes'] == 20
+    assert reloaded.lookup('mango') is None
+
+
+def _save_repeatedly(index_file, base, count):
+    index = HashtagIndex(index_file, base)
+    for _ in range(count):
+        index.save()
+
+
+def test_workers_saving_at_once_do_not_collide(workdir):
+    base = workdir / 'profiles'
+    write_profile(base, 'alice', _posts('mango', 10))
+    index = HashtagIndex(workdir / 'hashtag_index.json', base)
+    index.update_profile('alice')
+    index.save()
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_save_repeatedly, args=(workdir / 'hashtag_index.json', base, 50))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert [process.exitcode for process in processes] == [0, 0, 0, 0]
+    assert HashtagIndex(workdir / 'hashtag_index.json', base).lookup('mango')['profiles'] == 1
+    assert not list(workdir.glob('*.tmp'))
@@ -0,0 +1,93 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+import media_cache
+from media_cache import MediaCache, MediaError
+
+from conftest import write_profile
+
+
+def _png(width, height):
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 80, 40)).save(output, format='PNG')
+    return output.getvalue()
+
+
+@pytest.fixture
+def cache(workdir, monkeypatch):
+    write_profile(workdir / 'profiles', 'alice', [{'id': '1', 'displayUrl': 'https://cdn.example/1.png'}])
+    fetches = []
+    monkeypatch.setattr(media_cache, 'fetch_image', lambda url: fetches.append(url) or (_png(1080, 720), 'image/png'))
+    cache = MediaCache(workdir / 'media', profile_dir=workdir / 'profiles', s3_mirror=False)
+    cache.fetches = fetches
+    return cache
+
+
+def test_requested_width_is_resized(cache):
+    path, etag, content_type = cache.get('alice', '1', 320)
+    assert content_type == 'image/png'
+    assert '-w320-' in path.name
+    with Image.open(path) as image:
+        assert image.size == (320, 213)
+
+    original, original_etag, _ = cache.get('alice', '1')
+    assert '-orig-' in original.name and original_etag != etag
+    with Image.open(original) as image:
+        assert image.size == (1080, 720)
+    # The thumbnail was cut from the cached original: one origin fetch for both
+    assert cache.fetches == ['https://cdn.example/1.png']
+
+
+def test_thumbnails_never_upscale(cache, monkeypatch):
+    monkeypatch.setattr(media_cache, 'fetch_image', lambda url: (_png(100, 50), 'image/png'))
+    path, _, _ = cache.get('alice', '1', 640)
+    with Image.open(path) as image:
+        assert image.size == (100, 50)
+
+
+def test_unsupported_width_is_rejected(cache):
+    with pytest.raises(MediaError) as error:
+        cache.get('alice', '1', 333)
+    assert error.value.status == 400
+
+
+def test_startup_leaves_in_flight_temp_files(workdir):
+    shard = workdir / 'media' / 'ab'
+    shard.mkdir(parents=True)
+    in_flight = shard / 'abcd-orig-1234.png.x1y2.tmp'
+    leftover = shard / 'abcd-orig-5678.png.z3w4.tmp'
+    in_flight.write_bytes(b'being written')
+    leftover.write_bytes(b'crashed')
+    old = time.time() - media_cache.MEDIA_CACHE_TMP_MAX_AGE_SECONDS - 60
+    os.utime(leftover, (old, old))
+
+    MediaCache(workdir / 'media', profile_dir=workdir / 'profiles', s3_mirror=False)
+    assert in_flight.exists()
+    assert not leftover.exists()
+
+
+def test_concurrent_stores_of_one_image(cache):
+    body = _png(200, 100)
+    errors = []
+
+    def store():
+        try:
+            for _ in range(20):
+                cache._store('ab' * 20, 'orig', body, 'image/png', 'alice', '1')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=store) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    path = cache.entries[('ab' * 20, 'orig')]['path']
+    assert path.read_bytes() == body
+    assert not list(path.parent.glob('*.tmp'))
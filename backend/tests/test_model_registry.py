@@ -0,0 +1,56 @@
+import multiprocessing
+import time
+
+import joblib
+
+import model_registry
+from model_registry import ModelWatcher, publish_model, read_pointer
+
+
+def _paths(base):
+    return base / 'pointer.json', base / 'versions'
+
+
+def _write_model(path, name):
+    joblib.dump({'model': name, 'feature_names': ['hour']}, path)
+
+
+def _publisher(base, worker, count, results):
+    pointer_file, versions_dir = _paths(base)
+    model_path = base / f'model_{worker}.joblib'
+    for i in range(count):
+        _write_model(model_path, f'{worker}-{i}')
+        version = publish_model(model_path, pointer_file, versions_dir)
+        results.put((version, f'{worker}-{i}', joblib.load(versions_dir / f'v{version:06d}.joblib')['model']))
+
+
+def test_concurrent_publishers_get_distinct_versions(workdir, monkeypatch):
+    monkeypatch.setattr(model_registry, 'MODEL_VERSIONS_KEEP', 100)
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [context.Process(target=_publisher, args=(workdir, worker, 5, results)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    published = [results.get(timeout=5) for _ in range(20)]
+    assert sorted(version for version, _, _ in published) == list(range(1, 21))
+    # Each version holds the model its publisher copied, not another process's
+    assert all(name == stored for _, name, stored in published)
+    assert read_pointer(_paths(workdir)[0])['version'] == 20
+
+
+def test_watcher_hot_reloads_new_versions(workdir):
+    pointer_file, versions_dir = _paths(workdir)
+    model_path = workdir / 'model.joblib'
+    _write_model(model_path, 'first')
+    publish_model(model_path, pointer_file, versions_dir)
+    watcher = ModelWatcher(pointer_file, versions_dir, poll_seconds=0)
+    assert watcher.reload()[0] == 'first'
+
+    _write_model(model_path, 'second')
+    publish_model(model_path, pointer_file, versions_dir)
+    deadline = time.monotonic() + 5
+    while watcher.current()[2] != 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert watcher.current()[:1] == ('second',)
@@ -0,0 +1,67 @@
+import joblib
+import pytest
+
+import retrain_model
+from caption_features import CAPTION_COLUMNS, draft_caption_features
+from predict_like import predict_likes
+from retrain_model import prepare_data, extract_features, train_model, save_model
+from synthetic_posts import generate_posts
+
+
+@pytest.fixture
+def client(workdir):
+    X, y = prepare_data(extract_features(generate_posts(300, seed=7)))
+    model, feature_names = train_model(X, y, {'n_estimators': 50, 'max_depth': 6})
+    save_model(model, feature_names, X, y, None, 0.0)
+    import app
+    app.model_watcher.reload()
+    client = app.app.test_client()
+    client.X = X
+    client.model = model
+    client.feature_names = feature_names
+    return client
+
+
+def test_caption_defaults_are_training_means(client):
+    defaults = joblib.load(retrain_model.MODEL_PATH)['caption_defaults']
+    for name in CAPTION_COLUMNS:
+        assert defaults[name] == pytest.approx(client.X[name].mean())
+    assert defaults['caption_length'] > 0
+
+
+def test_predict_without_caption_assumes_a_typical_caption(client):
+    import app
+    response = client.post('/api/predict/likes', json={'hour': 12, 'day': 'Monday'})
+    assert response.status_code == 200
+    expected = predict_likes(client.model, client.feature_names, 12, 'Monday', app.model_watcher.caption_defaults)
+    assert response.get_json()['predictedLikes'] == expected
+
+
+def test_predict_with_caption_opts_in(client):
+    for caption in ('', 'sunny days #mango #summer @friend'):
+        response = client.post('/api/predict/likes', json={'hour': 12, 'day': 'Monday', 'caption': caption})
+        expected = predict_likes(client.model, client.feature_names, 12, 'Monday', draft_caption_features(caption))
+        assert response.get_json()['predictedLikes'] == expected
+
+
+def test_predict_day_is_case_insensitive(client):
+    expected = client.post('/api/predict/likes', json={'hour': 12, 'day': 'Monday'}).get_json()['predictedLikes']
+    for day in ('monday', ' MONDAY '):
+        response = client.post('/api/predict/likes', json={'hour': 12, 'day': day})
+        assert response.status_code == 200
+        assert response.get_json()['predictedLikes'] == expected
+    assert client.post('/api/predict/likes', json={'hour': 12, 'day': 'Someday'}).status_code == 400
+
+
+@pytest.mark.parametrize('payload', [{'followers': 'many'}, {'followers': 1000, 'posts_count': 'x'},
+                                     {'followers': -5}, {'followers': None}])
+def test_schedule_rejects_bad_profile_context(client, payload):
+    response = client.post('/api/schedule/optimize', json={'start': '2026-10-19', 'end': '2026-10-21', **payload})
+    assert response.status_code == 400
+
+
+def test_schedule_with_profile_context(client):
+    response = client.post('/api/schedule/optimize', json={'start': '2026-10-19', 'end': '2026-10-21', 'posts': 2,
+                                                           'followers': 5000, 'posts_count': 120})
+    assert response.status_code == 200
+    assert len(response.get_json()['schedule']) == 2
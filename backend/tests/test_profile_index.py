@@ -0,0 +1,57 @@
+import pytest
+
+import profile_layout
+from profile_index import ProfileIndex
+from synthetic_posts import generate_posts
+
+from conftest import write_profile
+
+
+@pytest.fixture
+def index(workdir):
+    base = workdir / 'profiles'
+    for username, followers in (('alice', 1000), ('bob', 5000)):
+        write_profile(base, username, generate_posts(10, seed=1), {'followersCount': followers})
+    profile_layout.build_manifest(base)
+    return ProfileIndex(workdir / 'index.sqlite3', base)
+
+
+def test_refresh_reads_file_stats_from_the_manifest(index, monkeypatch):
+    def no_stat(*args, **kwargs):
+        raise AssertionError('refresh should not stat profile files')
+
+    monkeypatch.setattr(profile_layout, 'file_stats', no_stat)
+    assert index.refresh(force=True) == 2
+    assert [p['username'] for p in index.search()[1]] == ['bob', 'alice']
+    assert index.refresh(force=True) == 0
+
+
+def test_refresh_picks_up_journaled_changes(index):
+    index.refresh(force=True)
+    write_profile(index.profile_dir, 'alice', generate_posts(12, seed=2), {'followersCount': 9000})
+    profile_layout.record_write('alice', index.profile_dir)
+    (profile_layout.profile_dir('bob', index.profile_dir) / 'posts.json').unlink()
+    (profile_layout.profile_dir('bob', index.profile_dir) / 'profile.json').unlink()
+    profile_layout.record_write('bob', index.profile_dir)
+
+    assert index.refresh(force=True) == 2
+    assert index.get('alice')['followers'] == 9000
+    assert index.get('bob') is None
+
+
+def test_written_profiles_are_not_reindexed(index):
+    index.refresh(force=True)
+    write_profile(index.profile_dir, 'alice', generate_posts(12, seed=2), {'followersCount': 9000})
+    profile_layout.record_write('alice', index.profile_dir)
+    index.update_profile('alice')
+    assert index.refresh(force=True) == 0
+
+
+@pytest.mark.parametrize('query, status, limit', [('limit=-1', 200, 1), ('limit=0', 200, 1), ('limit=500', 200, 100),
+                                                  ('limit=abc', 400, None), ('offset=x', 400, None)])
+def test_list_profiles_limit(workdir, query, status, limit):
+    import app
+    response = app.app.test_client().get(f'/api/profiles?{query}')
+    assert response.status_code == status
+    if limit is not None:
+        assert response.get_json()['limit'] == limit
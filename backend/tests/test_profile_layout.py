@@ -0,0 +1,104 @@
+import multiprocessing
+import threading
+
+import profile_layout
+from profile_layout import build_manifest, list_usernames, record_write, read_manifest, migrate
+
+from conftest import write_profile
+
+
+def _add(base, username):
+    write_profile(base, username, [{'id': '1'}], {'username': username})
+    record_write(username, base)
+
+
+def test_record_write_appends_without_rewriting_the_manifest(workdir):
+    base = workdir / 'profiles'
+    _add(base, 'alice')
+    manifest_stat = (base / 'manifest.json').stat()
+    _add(base, 'bob')
+    assert (base / 'manifest.json').stat().st_ino == manifest_stat.st_ino
+    assert list_usernames(base) == ['alice', 'bob']
+    assert read_manifest(base)['profiles']['bob'][0] > 0
+
+
+def test_removed_profile_leaves_the_manifest(workdir):
+    base = workdir / 'profiles'
+    _add(base, 'alice')
+    _add(base, 'bob')
+    for name in profile_layout.PROFILE_FILES:
+        (base / 'bob' / name).unlink()
+    record_write('bob', base)
+    assert list_usernames(base) == ['alice']
+
+
+def _writer(base, worker, count):
+    profile_layout._manifests.clear()
+    for i in range(count):
+        _add(base, f'user_{worker}_{i}')
+
+
+def test_concurrent_processes_keep_every_entry(workdir):
+    base = workdir / 'profiles'
+    _add(base, 'seed')
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_writer, args=(base, worker, 25)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    profile_layout._manifests.clear()
+    assert len(read_manifest(base)['profiles']) == 101
+
+
+def test_journal_is_compacted(workdir, monkeypatch):
+    monkeypatch.setattr(profile_layout, 'MANIFEST_JOURNAL_MAX_BYTES', 200)
+    base = workdir / 'profiles'
+    for i in range(20):
+        _add(base, f'user_{i:02d}')
+    assert (base / 'manifest.journal').stat().st_size <= 200
+    profile_layout._manifests.clear()
+    assert list_usernames(base) == [f'user_{i:02d}' for i in range(20)]
+
+
+def test_folders_added_behind_the_manifest_are_found(workdir):
+    base = workdir / 'profiles'
+    _add(base, 'alice')
+    write_profile(base, 'copied_in', [{'id': '1'}])
+    assert list_usernames(base) == ['alice', 'copied_in']
+
+
+def test_rebuild_never_shows_a_partial_manifest(workdir):
+    base = workdir / 'profiles'
+    for i in range(200):
+        write_profile(base, f'user_{i:03d}', [{'id': '1'}])
+    build_manifest(base)
+    seen = []
+    done = threading.Event()
+
+    def reader():
+        while not done.is_set():
+            manifest = read_manifest(base)
+            seen.append(len(manifest['profiles']) if manifest else None)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for _ in range(20):
+        build_manifest(base)
+    done.set()
+    thread.join()
+    assert seen and set(seen) == {200}
+
+
+def test_sharded_layout(workdir):
+    base = workdir / 'profiles'
+    _add(base, 'alice')
+    _add(base, 'bob')
+    migrate('sharded', base)
+    assert list_usernames(base) == ['alice', 'bob']
+    folder = profile_layout.profile_dir('alice', base)
+    assert folder.parent.name == profile_layout.shard_name('alice')
+    assert (folder / 'posts.json').exists()
+    # Copied straight into its shard, bypassing record_write
+    write_profile(profile_layout.profile_dir('carol', base).parent, 'carol', [{'id': '1'}])
+    assert list_usernames(base) == ['alice', 'bob', 'carol']
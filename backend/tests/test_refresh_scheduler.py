@@ -0,0 +1,116 @@
+import multiprocessing
+import time
+
+import refresh_scheduler
+from refresh_scheduler import RefreshScheduler
+from profile_layout import record_write, LOCAL_PROFILE_DIR
+from scraper import load_cache, update_cache
+from synthetic_posts import generate_posts
+
+from conftest import write_profile
+
+
+def _updater(worker, count):
+    for i in range(count):
+        update_cache(f'user_{worker}', n=i)
+
+
+def test_cache_updates_from_processes_are_not_lost(workdir):
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_updater, args=(worker, 20)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert load_cache() == {f'user_{worker}': {'n': 19} for worker in range(4)}
+
+
+def test_refresh_keeps_concurrent_cache_entries(workdir):
+    update_cache('other', end_cursor='abc')
+
+    def refresh(username):
+        # A request handler scraping another profile while this refresh runs
+        update_cache('other', has_next_page=False)
+        return True
+
+    scheduler = RefreshScheduler(refresh_fn=refresh, leader_lock=workdir / 'leader.lock')
+    scheduler._refresh('alice')
+    cache = load_cache()
+    assert cache['other'] == {'end_cursor': 'abc', 'has_next_page': False}
+    assert 'last_scraped' in cache['alice']
+
+
+def test_only_one_scheduler_leads(workdir):
+    first = RefreshScheduler(leader_lock=workdir / 'leader.lock')
+    second = RefreshScheduler(leader_lock=workdir / 'leader.lock')
+    assert first.is_leader()
+    assert not second.is_leader()
+    assert not second.status()['leader']
+    first.stop()
+    assert second.is_leader()
+    second.stop()
+
+
+def test_rebuild_queue_rereads_only_changed_profiles(workdir, monkeypatch):
+    for username in ('alice', 'bob'):
+        write_profile(LOCAL_PROFILE_DIR, username, generate_posts(15, seed=1), {'followersCount': 1000})
+        record_write(username)
+    scheduler = RefreshScheduler(leader_lock=workdir / 'leader.lock')
+    reads = []
+    read_json = refresh_scheduler._read_json
+    monkeypatch.setattr(refresh_scheduler, '_read_json', lambda path: reads.append(path.name) or read_json(path))
+
+    later = time.time() + 365 * 24 * 3600
+    scheduler.rebuild_queue(later)
+    assert len(reads) == 4
+    assert {username for _, username, _ in scheduler.queue} == {'alice', 'bob'}
+
+    reads.clear()
+    scheduler.rebuild_queue(later)
+    assert reads == []
+
+    write_profile(LOCAL_PROFILE_DIR, 'bob', generate_posts(20, seed=2), {'followersCount': 5000})
+    record_write('bob')
+    scheduler.rebuild_queue(later)
+    assert sorted(reads) == ['posts.json', 'profile.json']
+    assert scheduler.signals['bob'][1] == 5000
+
+
+def test_non_leader_status_reports_the_leaders_state(workdir):
+    for username in ('alice', 'bob', 'carol'):
+        write_profile(LOCAL_PROFILE_DIR, username, generate_posts(15, seed=1), {'followersCount': 1000})
+        record_write(username)
+    state_file = workdir / 'state.json'
+    leader = RefreshScheduler(refresh_fn=lambda username: time.sleep(0.5) or True, state_file=state_file,
+                              leader_lock=workdir / 'leader.lock', max_concurrency=1)
+    follower = RefreshScheduler(state_file=state_file, leader_lock=workdir / 'leader.lock')
+    assert leader.is_leader()
+    leader.rebuild_queue(time.time() + 365 * 24 * 3600)
+    dispatched = leader.dispatch()
+
+    status = follower.status()
+    assert not status['leader']
+    assert status['in_flight'] == dispatched
+    assert status['queue_depth'] == 2
+    assert status['budget_remaining'] == leader.hourly_budget - 1
+    leader.stop()
+
+
+def _saver(state_file, count):
+    scheduler = RefreshScheduler(state_file=state_file, leader_lock=state_file.with_name('leader.lock'))
+    for i in range(count):
+        scheduler.last_runs['alice'] = {'ok': True, 'n': i}
+        scheduler.save_state()
+
+
+def test_concurrent_state_saves_stay_valid(workdir):
+    state_file = workdir / 'state.json'
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_saver, args=(state_file, 50)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert all(process.exitcode == 0 for process in processes)
+    assert RefreshScheduler(state_file=state_file).last_runs['alice'] == {'ok': True, 'n': 49}
+    assert list(workdir.glob('*.tmp')) == []
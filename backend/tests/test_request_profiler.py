@@ -0,0 +1,44 @@
+from flask import Flask
+
+import request_profiler
+
+
+def _app():
+    app = Flask(__name__)
+    app.before_request(request_profiler.start_profile)
+    app.teardown_request(request_profiler.finish_profile)
+
+    @app.route('/ping')
+    def ping():
+        return 'pong'
+
+    return app
+
+
+def _reports(workdir):
+    directory = workdir / request_profiler.REQUEST_PROFILE_DIR
+    return sorted(path.suffix for path in directory.iterdir()) if directory.exists() else []
+
+
+def test_profile_header_needs_admin_key(workdir, monkeypatch):
+    monkeypatch.setenv('ADMIN_KEY', 'secret')
+    client = _app().test_client()
+
+    client.get('/ping', headers={'X-Profile': '1'})
+    client.get('/ping', headers={'X-Profile': '1', 'X-Admin-Key': 'wrong'})
+    assert _reports(workdir) == []
+
+    client.get('/ping', headers={'X-Profile': '1', 'X-Admin-Key': 'secret'})
+    assert _reports(workdir) == ['.prof', '.txt']
+
+
+def test_profile_header_from_trusted_ip(workdir, monkeypatch):
+    monkeypatch.delenv('ADMIN_KEY', raising=False)
+    monkeypatch.setattr(request_profiler, 'PROFILE_TRUSTED_IPS', {'10.0.0.5'})
+    client = _app().test_client()
+
+    client.get('/ping', headers={'X-Profile': '1'}, environ_base={'REMOTE_ADDR': '10.0.0.9'})
+    assert _reports(workdir) == []
+
+    client.get('/ping', headers={'X-Profile': '1'}, environ_base={'REMOTE_ADDR': '10.0.0.5'})
+    assert _reports(workdir) == ['.prof', '.txt']
@@ -0,0 +1,125 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import joblib
+import pandas as pd
+import pytest
+from sklearn.metrics import mean_absolute_error
+
+import retrain_model
+from retrain_model import prepare_data, extract_features, train_model, save_model, holdout_split
+from synthetic_posts import generate_posts
+
+DAY_COLUMNS = [f'day_of_week_{day}' for day in retrain_model.DAYS[1:]]
+
+
+def _frame(days):
+    return pd.DataFrame({'hour': [12] * len(days), 'day_of_week': days, 'likes_count': [100] * len(days)})
+
+
+def test_prepare_data_encodes_all_days():
+    X, _ = prepare_data(_frame(['Saturday', 'Sunday']))
+    assert [c for c in X.columns if c.startswith('day_of_week_')] == DAY_COLUMNS
+    assert X['day_of_week_Saturday'].tolist() == [1, 0]
+    assert X['day_of_week_Sunday'].tolist() == [0, 1]
+    assert not X[DAY_COLUMNS[:4]].to_numpy().any()
+
+
+def test_prepare_data_partial_batch_matches_training_columns():
+    X_full, _ = prepare_data(_frame(retrain_model.DAYS))
+    X_batch, _ = prepare_data(_frame(['Monday', 'Wednesday']))
+    assert list(X_batch.columns) == list(X_full.columns)
+    # Monday is the dropped reference day in both
+    assert not X_batch.iloc[0][DAY_COLUMNS].any()
+    assert X_batch.iloc[1]['day_of_week_Wednesday'] == 1
+
+
+def test_save_model_stores_holdout_mae(workdir):
+    X, y = prepare_data(extract_features(generate_posts(300, seed=7)))
+    model, feature_names = train_model(X, y, {'n_estimators': 50, 'max_depth': 6})
+    save_model(model, feature_names, X, y, None, 0.0)
+    artifact = joblib.load(retrain_model.MODEL_PATH)
+    _, X_test, _, y_test = holdout_split(X, y)
+    assert artifact['baseline_mae'] == pytest.approx(mean_absolute_error(y_test, model.predict(X_test)))
+    assert artifact['baseline_mae'] > mean_absolute_error(y, model.predict(X))
+
+
+def test_main_then_incremental_update(workdir, monkeypatch):
+    monkeypatch.setattr(retrain_model, 'DEFAULT_PARAMS', {'n_estimators': 30, 'max_depth': 4})
+    posts = generate_posts(400, seed=8)
+    path = workdir / 'posts.json'
+    path.write_text(json.dumps(posts[:300]))
+    model, _ = retrain_model.main(str(path))
+    trees = model.get_booster().num_boosted_rounds()
+
+    path.write_text(json.dumps(posts))
+    monkeypatch.setattr(retrain_model, 'INCREMENTAL_DRIFT_TOLERANCE', 100.0)
+    updated, feature_names = retrain_model.update_model(str(path))
+    assert updated.get_booster().num_boosted_rounds() == trees + retrain_model.INCREMENTAL_TREES
+    artifact = joblib.load(retrain_model.MODEL_PATH)
+    assert artifact['watermark'] == posts[-1]['timestamp']
+    assert feature_names == artifact['feature_names']
+
+
+
+def test_incremental_update_of_another_profile_retrains(workdir, monkeypatch):
+    monkeypatch.setattr(retrain_model, 'DEFAULT_PARAMS', {'n_estimators': 30, 'max_depth': 4})
+    monkeypatch.setattr(retrain_model, 'INCREMENTAL_DRIFT_TOLERANCE', 100.0)
+    alice, bob = workdir / 'alice.json', workdir / 'bob.json'
+    alice.write_text(json.dumps(generate_posts(300, seed=8)))
+    bob.write_text(json.dumps(generate_posts(300, seed=9)))
+    retrain_model.main(str(alice))
+    assert joblib.load(retrain_model.MODEL_PATH)['source'] == str(alice)
+
+    updated, _ = retrain_model.update_model(str(bob))
+    artifact = joblib.load(retrain_model.MODEL_PATH)
+    assert artifact['source'] == str(bob)
+    assert artifact['updates'] == []
+    assert updated.get_booster().num_boosted_rounds() == 30
+
+def test_model_cache_round_trip_leaves_no_temp_files(workdir):
+    X, y = prepare_data(extract_features(generate_posts(200, seed=3)))
+    model, feature_names = train_model(X, y, {'n_estimators': 20, 'max_depth': 4})
+    save_model(model, feature_names, X, y, None, 0.0, cache_key='abc')
+    assert (retrain_model.MODEL_CACHE_DIR / 'abc.joblib').exists()
+
+    retrain_model.MODEL_PATH.unlink()
+    loaded, loaded_names = retrain_model.load_cached_model('abc')
+    assert loaded_names == feature_names
+    assert retrain_model.MODEL_PATH.exists()
+    assert not list(retrain_model.MODEL_CACHE_DIR.glob('*.tmp'))
+    assert not list(retrain_model.LOCAL_MODEL_DIR.glob('*.tmp'))
+
+
+def test_concurrent_cache_stores_use_separate_temp_files(workdir, monkeypatch):
+    retrain_model.LOCAL_MODEL_DIR.mkdir(parents=True)
+    retrain_model.MODEL_PATH.write_bytes(b'model')
+    seen = []
+    replace = os.replace
+
+    def checking_replace(source, target):
+        seen.append(Path(source).name)
+        if len(seen) == 1:
+            # Another worker stores the same key while this copy is still in flight
+            retrain_model.store_cached_model('abc')
+        replace(source, target)
+
+    monkeypatch.setattr(retrain_model.os, 'replace', checking_replace)
+    retrain_model.store_cached_model('abc')
+    assert len(seen) == 2 and seen[0] != seen[1]
+    assert (retrain_model.MODEL_CACHE_DIR / 'abc.joblib').read_bytes() == b'model'
+
+
+def test_gc_keeps_recent_temp_files(workdir):
+    retrain_model.MODEL_CACHE_DIR.mkdir(parents=True)
+    fresh = retrain_model.MODEL_CACHE_DIR / 'fresh.joblib.tmp'
+    stale = retrain_model.MODEL_CACHE_DIR / 'stale.joblib.tmp'
+    fresh.write_bytes(b'copy in progress')
+    stale.write_bytes(b'left over')
+    old = time.time() - retrain_model.MODEL_CACHE_TMP_MAX_AGE_SECONDS - 60
+    os.utime(stale, (old, old))
+    retrain_model.gc_model_cache()
+    assert fresh.exists()
+    assert not stale.exists()
@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+import schedule_optimizer
+from schedule_optimizer import candidate_slots, select_slots, slot_scores
+
+DAY_COLUMNS = [f'day_of_week_{day}' for day in schedule_optimizer.DAYS]
+
+
+def _brute_force(times, scores, count, min_gap):
+    """Size and best total of the largest feasible sets with at most `count` slots."""
+    for size in range(min(count, len(times)), 0, -1):
+        totals = [scores[list(subset)].sum() for subset in combinations(range(len(times)), size)
+                  if (np.diff(times[list(subset)]) >= min_gap).all()]
+        if totals:
+            return size, max(totals)
+    return 0, 0
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_select_slots_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 11))
+    times = np.sort(rng.choice(48, n, replace=False)) * 3600
+    scores = rng.integers(0, 100, n).astype(np.float64)
+    count = int(rng.integers(1, 5))
+    min_gap = int(rng.integers(0, 12)) * 3600
+
+    chosen = select_slots(times, scores, count, min_gap)
+    size, total = _brute_force(times, scores, count, min_gap)
+    assert len(chosen) == size
+    assert scores[chosen].sum() == total
+    assert (np.diff(times[chosen]) >= min_gap).all()
+
+
+def test_select_slots_returns_as_many_as_fit():
+    times = np.arange(10) * 3600
+    chosen = select_slots(times, np.ones(10), 5, 4 * 3600)
+    assert len(chosen) == 3
+    assert (np.diff(times[chosen]) >= 4 * 3600).all()
+
+
+def test_select_slots_empty():
+    assert select_slots(np.array([], dtype=np.int64), np.array([]), 3, 3600).tolist() == []
+    assert select_slots(np.arange(3) * 3600, np.ones(3), 0, 3600).tolist() == []
+
+
+def test_candidate_slots_skip_blocked_hours():
+    start = datetime(2026, 10, 19, 10, 30, tzinfo=timezone.utc)
+    end = datetime(2026, 10, 19, 16, tzinfo=timezone.utc)
+    times = candidate_slots(start, end, blocked_hours=[13])
+    hours = [datetime.fromtimestamp(int(t), tz=timezone.utc).hour for t in times]
+    assert hours == [11, 12, 14, 15]
+
+
+class _WeekdayHourModel:
+    """Predicts 100 * weekday + hour, so the slot each score came from is visible."""
+
+    def predict(self, frame):
+        return 100 * (frame[DAY_COLUMNS].to_numpy().argmax(axis=1)) + frame['hour'].to_numpy()
+
+
+def test_slot_scores_use_the_slots_weekday_and_hour():
+    start = datetime(2026, 10, 18, tzinfo=timezone.utc)  # a Sunday
+    times = candidate_slots(start, datetime(2026, 10, 20, tzinfo=timezone.utc))
+    scores = slot_scores(_WeekdayHourModel(), ['hour'] + DAY_COLUMNS, times)
+    expected = [100 * datetime.fromtimestamp(int(t), tz=timezone.utc).weekday()
+                + datetime.fromtimestamp(int(t), tz=timezone.utc).hour for t in times]
+    assert scores.tolist() == expected
@@ -0,0 +1,57 @@
+import json
+import time
+
+import pytest
+
+import tune_model
+from config import TUNE_REQUEST_TIME_BUDGET_SECONDS, TUNE_REQUEST_WORKERS
+from profile_layout import LOCAL_PROFILE_DIR
+from retrain_model import prepare_data, extract_features
+from synthetic_posts import generate_posts
+
+from conftest import write_profile
+
+
+def _data(count):
+    return prepare_data(extract_features(generate_posts(count, seed=11)))
+
+
+def test_halving_promotes_the_best_third(workdir):
+    X, y = _data(300)
+    report = tune_model.tune(X, y, 'halving', max_trials=9, time_budget=120, workers=3, save=False)
+    assert [r['configs'] for r in report['timings']['rounds']] == [9, 3, 1]
+    assert [r['n_estimators'] for r in report['timings']['rounds']] == [111, 333, 1000]
+    assert len(report['trials']) == 13
+    assert report['best_params']['n_estimators'] >= 1
+
+
+def test_time_budget_bounds_a_round(workdir, monkeypatch):
+    # Slow configs: deep trees, tiny learning rate, so no trial finishes on its own within the budget
+    monkeypatch.setattr(tune_model, 'sample_params',
+                        lambda rng: {'learning_rate': 0.001, 'max_depth': 12, 'min_child_weight': 1})
+    monkeypatch.setattr(tune_model, 'TUNE_EARLY_STOPPING_ROUNDS', 10_000)
+    X, y = _data(20_000)
+    started = time.perf_counter()
+    tune_model.tune(X, y, 'random', max_trials=8, time_budget=2, workers=2, save=False)
+    assert time.perf_counter() - started < 6
+
+
+def test_request_tuning_gets_the_request_budget(workdir, monkeypatch):
+    write_profile(LOCAL_PROFILE_DIR, 'alice', generate_posts(60, seed=3))
+    calls = []
+    monkeypatch.setattr(tune_model, 'tune', lambda X, y, **options: calls.append(options) or {'best_params': None})
+    import app
+    response = app.app.test_client().post('/api/retrain', json={'username': 'alice', 'tune': True})
+    assert response.status_code == 200
+    assert calls == [{'time_budget': TUNE_REQUEST_TIME_BUDGET_SECONDS, 'workers': TUNE_REQUEST_WORKERS}]
+
+
+def test_failed_save_keeps_the_previous_params(workdir):
+    path = workdir / 'params.json'
+    report = {'best_params': {'max_depth': 4}, 'best_val_mae': 1.0, 'strategy': 'halving',
+              'timings': {}, 'tuned_at': '2024-01-01T00:00:00'}
+    tune_model.save_tuned_params(report, path)
+    with pytest.raises(TypeError):
+        tune_model.save_tuned_params({**report, 'best_params': {'max_depth': object()}}, path)
+    assert json.loads(path.read_text())['params'] == {'max_depth': 4}
+    assert list(workdir.glob('*.tmp')) == []
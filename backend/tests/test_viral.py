@@ -0,0 +1,102 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from viral import ViralIndex, trailing_baseline, score_posts
+
+from conftest import write_profile
+
+
+def _naive_baseline(values, window):
+    medians, spreads, history = [], [], []
+    for i in range(len(values)):
+        previous = np.asarray(values[max(0, i - window):i], dtype=np.float64)
+        history.append(len(previous))
+        if not len(previous):
+            medians.append(np.nan)
+            spreads.append(np.nan)
+            continue
+        median = np.median(previous)
+        medians.append(median)
+        spreads.append(1.4826 * np.median(np.abs(previous - median)))
+    return np.array(medians), np.array(spreads), np.array(history)
+
+
+@pytest.mark.parametrize('count, window', [(40, 7), (5, 7), (7, 7), (8, 7), (1, 3), (0, 3)])
+def test_trailing_baseline_matches_a_loop(count, window):
+    values = np.random.default_rng(count).integers(0, 1000, count)
+    median, spread, history = trailing_baseline(values, window)
+    expected_median, expected_spread, expected_history = _naive_baseline(values, window)
+    np.testing.assert_allclose(median, expected_median, equal_nan=True)
+    np.testing.assert_allclose(spread, expected_spread, equal_nan=True)
+    np.testing.assert_array_equal(history, expected_history)
+
+
+def test_trailing_baseline_excludes_the_current_post():
+    median, _, _ = trailing_baseline([10, 10, 10, 10, 1000], window=4)
+    assert median[-1] == 10
+
+
+def _columns(likes, comments=None):
+    count = len(likes)
+    timestamps = np.arange(count)[::-1]  # stored newest first
+    return {
+        'ts': timestamps,
+        'timestamp': np.array([str(ts) for ts in timestamps], dtype=object),
+        'post_id': np.array([f'p{ts}' for ts in timestamps], dtype=object),
+        'likes': np.asarray(likes[::-1]),
+        'comments': np.asarray((comments or [5] * count)[::-1]),
+    }
+
+
+def test_score_posts_flags_a_breakout_post():
+    likes = [100 + i % 5 for i in range(15)] + [1000] + [100] * 3
+    scores = score_posts(_columns(likes), window=10, min_history=10)
+    assert list(scores['id'][:3]) == ['p0', 'p1', 'p2']  # timestamp order
+    spike = 15
+    assert scores['baseline_likes'][spike] == 102
+    assert scores['likes_ratio'][spike] == pytest.approx(1000 / 102)
+    assert scores['likes_z'][spike] > 10
+    assert scores['score'][spike] == scores['likes_ratio'][spike]
+    # The spike barely moves the median for the posts after it
+    assert scores['likes_ratio'][spike + 1] < 1.1
+
+
+def test_score_posts_skips_posts_with_short_history():
+    scores = score_posts(_columns([100] * 12), window=10, min_history=10)
+    assert np.isnan(scores['likes_ratio'][:10]).all()
+    assert np.isnan(scores['score'][:10]).all()
+    assert scores['likes_ratio'][10:].tolist() == [1.0, 1.0]
+
+
+def test_score_posts_with_comment_breakout():
+    comments = [4] * 12 + [40]
+    scores = score_posts(_columns([100] * 13, comments), window=10, min_history=10)
+    assert scores['comments_ratio'][-1] == 10
+    assert scores['score'][-1] == 10
+
+
+def _save_repeatedly(index_file, base, count):
+    index = ViralIndex(index_file, base)
+    for _ in range(count):
+        index.save()
+
+
+def test_workers_saving_at_once_do_not_collide(workdir):
+    base = workdir / 'profiles'
+    likes = [100] * 15 + [1000]
+    write_profile(base, 'alice', [{'id': str(i), 'timestamp': f'2026-01-{i + 1:02d}T12:00:00Z',
+                                   'likes_count': count, 'comments_count': 5} for i, count in enumerate(likes)])
+    index = ViralIndex(workdir / 'viral_index.json', base)
+    assert index.update_profile('alice')
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_save_repeatedly, args=(workdir / 'viral_index.json', base, 50))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert [process.exitcode for process in processes] == [0, 0, 0, 0]
+    assert ViralIndex(workdir / 'viral_index.json', base).profiles['alice']['viral']
+    assert not list(workdir.glob('*.tmp'))
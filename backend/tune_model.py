@@ -0,0 +1,213 @@
+"""
+Budgeted hyperparameter search for the likes predictor.
+
+Trials run in a process pool, each XGBoost fit limited to its share of the
+cores, with early stopping on a held-out validation set. The best
+configuration is saved next to the model artifact (TUNED_PARAMS_PATH) and
+picked up by retrain_model.train_model on every later retrain.
+
+    python tune_model.py data/profiles/<username>/posts.json --strategy halving --time-budget 60
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import xgboost as xgb
+from sklearn.model_selection import train_test_split
+
+from config import TUNE_MAX_TRIALS, TUNE_TIME_BUDGET_SECONDS, TUNE_EARLY_STOPPING_ROUNDS
+from file_lock import atomic_write
+from retrain_model import load_data, extract_features, prepare_data, TUNED_PARAMS_PATH
+
+MAX_ESTIMATORS = 1000
+
+SEARCH_SPACE = {
+    'learning_rate': lambda rng: 10 ** rng.uniform(-2.3, -0.7),
+    'max_depth': lambda rng: rng.randint(3, 10),
+    'min_child_weight': lambda rng: 10 ** rng.uniform(0, 1.3),
+    'subsample': lambda rng: rng.uniform(0.6, 1.0),
+    'colsample_bytree': lambda rng: rng.uniform(0.6, 1.0),
+    'reg_lambda': lambda rng: 10 ** rng.uniform(-1, 1.5),
+}
+
+# Validation data, set once per worker process by the pool initializer
+_data = {}
+
+
+def _init_worker(X_train, y_train, X_val, y_val):
+    _data.update(X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val)
+
+
+class _Deadline(xgb.callback.TrainingCallback):
+    """Stop boosting once the search's wall-clock deadline has passed."""
+
+    def __init__(self, deadline):
+        super().__init__()
+        self.deadline = deadline
+
+    def after_iteration(self, model, epoch, evals_log):
+        return time.time() >= self.deadline
+
+
+def _run_trial(params, n_estimators, threads, deadline):
+    """Fit one configuration with early stopping; returns (val_mae, best_rounds, seconds)."""
+    started = time.perf_counter()
+    model = xgb.XGBRegressor(
+        **params,
+        n_estimators=n_estimators,
+        early_stopping_rounds=TUNE_EARLY_STOPPING_ROUNDS,
+        eval_metric='mae',
+        tree_method='hist',
+        n_jobs=threads,
+        random_state=42,
+        callbacks=[_Deadline(deadline)]
+    )
+    model.fit(_data['X_train'], _data['y_train'], eval_set=[(_data['X_val'], _data['y_val'])], verbose=False)
+    return float(model.best_score), int(model.best_iteration) + 1, time.perf_counter() - started
+
+
+def sample_params(rng):
+    params = {name: draw(rng) for name, draw in SEARCH_SPACE.items()}
+    return {name: round(value, 4) if isinstance(value, float) else value for name, value in params.items()}
+
+
+def _run_round(executor, configs, n_estimators, threads, workers, deadline, trials):
+    """
+    Run configs with at most `workers` in flight, submitting the next one as
+    each trial finishes, until done or out of time. At the deadline, trials
+    still running are abandoned (they stop boosting on their own, see
+    _Deadline). Returns [(mae, rounds, params)] for the completed trials.
+    """
+    pending = list(configs)
+    running = {}
+    results = []
+    while pending or running:
+        while pending and len(running) < workers and time.time() < deadline:
+            params = pending.pop(0)
+            running[executor.submit(_run_trial, params, n_estimators, threads, deadline)] = params
+        if not running:
+            break
+        done, _ = wait(running, timeout=max(0.0, deadline - time.time()), return_when=FIRST_COMPLETED)
+        if not done:
+            print(f"Time budget reached, abandoning {len(running)} running trials.")
+            break
+        for future in done:
+            params = running.pop(future)
+            try:
+                mae, rounds, seconds = future.result()
+            except Exception as e:
+                print(f"Trial failed for {params}: {e}")
+                continue
+            trials.append({'params': params, 'n_estimators': n_estimators, 'val_mae': round(mae, 3),
+                           'best_rounds': rounds, 'seconds': round(seconds, 3)})
+            results.append((mae, rounds, params))
+    return results
+
+
+def tune(X, y, strategy='halving', max_trials=TUNE_MAX_TRIALS, time_budget=TUNE_TIME_BUDGET_SECONDS,
+         workers=None, seed=42, save=True):
+    """
+    Search hyperparameters for (X, y). `strategy` is 'random' (every trial gets
+    the full round budget) or 'halving' (successive halving: many configs on a
+    small budget, the best third promoted to three times the budget).
+    Returns a report with the best configuration and a wall-clock breakdown.
+    """
+    started = time.perf_counter()
+    workers = workers or min(os.cpu_count(), max_trials)
+    threads = max(1, os.cpu_count() // workers)
+    rng = random.Random(seed)
+    deadline = time.time() + time_budget
+
+    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=seed)
+    configs = [sample_params(rng) for _ in range(max_trials)]
+    timings = {'split': round(time.perf_counter() - started, 3), 'rounds': []}
+    trials = []
+
+    # Not a with-block: leaving one waits for abandoned trials, which would overrun the budget
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(X_train, y_train, X_val, y_val))
+    try:
+        if strategy == 'random':
+            rounds = [(configs, MAX_ESTIMATORS)]
+        else:
+            eta = 3
+            n_rounds = max(1, int(math.log(max_trials, eta)))
+            rounds = [(None, MAX_ESTIMATORS // eta ** (n_rounds - i)) for i in range(n_rounds + 1)]
+            rounds[0] = (configs, rounds[0][1])
+
+        results = []
+        for i, (round_configs, n_estimators) in enumerate(rounds):
+            if round_configs is None:
+                # Promote the best 1/eta of the previous round
+                keep = max(1, len(results) // 3)
+                round_configs = [params for _, _, params in sorted(results, key=lambda r: r[0])[:keep]]
+            round_started = time.perf_counter()
+            round_results = _run_round(executor, round_configs, n_estimators, threads, workers, deadline, trials)
+            timings['rounds'].append({'round': i, 'configs': len(round_configs), 'n_estimators': n_estimators,
+                                      'completed': len(round_results),
+                                      'seconds': round(time.perf_counter() - round_started, 3)})
+            if not round_results:
+                break
+            results = round_results
+            if time.time() >= deadline:
+                print("Tuning time budget exhausted.")
+                break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if not trials:
+        print("Error: no tuning trial completed.")
+        return {'best_params': None, 'trials': [], 'timings': timings}
+
+    best = min(trials, key=lambda t: (t['val_mae'], -t['n_estimators']))
+    best_params = {**best['params'], 'n_estimators': best['best_rounds'], 'tree_method': 'hist'}
+    timings['total'] = round(time.perf_counter() - started, 3)
+    report = {
+        'strategy': strategy,
+        'best_params': best_params,
+        'best_val_mae': best['val_mae'],
+        'workers': workers,
+        'threads_per_trial': threads,
+        'trials': trials,
+        'timings': timings,
+        'tuned_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    print(f"Best validation MAE {best['val_mae']} with {best_params} "
+          f"({len(trials)} trials in {timings['total']}s)")
+    if save:
+        save_tuned_params(report)
+    return report
+
+
+def save_tuned_params(report, path=TUNED_PARAMS_PATH):
+    # Written atomically: workers load these params on every retrain
+    with atomic_write(path, 'w', encoding='utf-8') as file:
+        json.dump({'params': report['best_params'], 'best_val_mae': report['best_val_mae'],
+                   'strategy': report['strategy'], 'timings': report['timings'],
+                   'tuned_at': report['tuned_at']}, file, indent=2)
+    print(f"Tuned parameters saved to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('posts', nargs='?', default='swiggyindia_posts.json')
+    parser.add_argument('--strategy', choices=['random', 'halving'], default='halving')
+    parser.add_argument('--trials', type=int, default=TUNE_MAX_TRIALS)
+    parser.add_argument('--time-budget', type=float, default=TUNE_TIME_BUDGET_SECONDS)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+
+    X, y = prepare_data(extract_features(load_data(args.posts)))
+    if X.empty:
+        print("Error: No data available for tuning.")
+        return
+    report = tune(X, y, args.strategy, args.trials, args.time_budget, args.workers)
+    print(json.dumps(report['timings'], indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,16 @@ import json
 from pathlib import Path
 from aws_s3_storage import download_file_from_s3, fetch_folder_names_from_s3
 from config import LOCAL_DATA_DIR, LOCAL_MODEL_DIR, LOCAL_PROFILE_DIR
+from metrics import timed
+from profile_index import profile_written
+from profile_layout import profile_dir as profile_folder, resolve
 import os
 
 # Load the JSON dataset with error handling
+@timed('load_data')
 def load_data(filename='swiggyindia_posts.json'):
+    # data/profiles/<username>/<file> paths are mapped onto the active profile layout
+    filename = resolve(filename)
     try:
         with open(filename, 'r', encoding='utf-8') as file:
             data = json.load(file)
@@ -30,7 +36,7 @@ def download_data_from_server():
         return
 
     for profile in profile_folders:
-        profile_dir = data_dir / profile
+        profile_dir = profile_folder(profile, data_dir)
         if not profile_dir.exists():
             profile_dir.mkdir(parents=True)
 
@@ -44,6 +50,7 @@ def download_data_from_server():
                 print(f"Downloaded {s3_key} to {local_path}.")
             except Exception as e:
                 print(f"Failed to download {s3_key}: {e}")
-                reurn False
+                return False
+        profile_written(profile)
     print("All files downloaded successfully.")
     return True
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+Viral post detection behind /api/viral and /api/viral/<username>.
+
+Each post is compared with the profile's previous VIRAL_WINDOW posts: its
+likes and comments are divided by the trailing medians, and its likes also
+get a robust z-score against the trailing MAD. A post is viral when either
+ratio reaches VIRAL_RATIO_THRESHOLD; posts with fewer than VIRAL_MIN_HISTORY
+earlier posts are not scored. The viral posts of every profile are kept in
+VIRAL_INDEX_FILE, together with the posts.json mtime and size they were
+scored from, so only changed profiles are re-scored.
+"""
+import json
+import threading
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from config import (LOCAL_PROFILE_DIR, VIRAL_INDEX_FILE, VIRAL_INDEX_REFRESH_SECONDS, VIRAL_WINDOW,
+                    VIRAL_MIN_HISTORY, VIRAL_RATIO_THRESHOLD)
+from feature_store import FeatureStore
+from file_lock import atomic_write
+from metrics import timed
+import profile_layout
+
+# Fields of a stored viral post, in order
+FIELDS = ['id', 'timestamp', 'likes', 'comments', 'baseline_likes', 'baseline_comments',
+          'likes_ratio', 'comments_ratio', 'likes_z', 'score']
+
+
+def trailing_baseline(values, window=VIRAL_WINDOW, spread=True):
+    """
+    Median and robust spread (1.4826 * MAD) of the `window` values before each
+    position, plus how many prior values the window held. Full windows are
+    computed at once from a strided view; only the first `window` positions,
+    which see a shorter history, take the slower NaN-aware path.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    count = len(values)
+    padded = np.concatenate([np.full(window, np.nan), values])
+    windows = sliding_window_view(padded, window)[:count]
+    history = np.minimum(np.arange(count), window)
+    median = np.full(count, np.nan)
+    mad = np.full(count, np.nan)
+    full, partial = slice(window, count), slice(1, min(window, count))
+    if count > window:
+        median[full] = np.median(windows[full], axis=1)
+        if spread:
+            mad[full] = np.median(np.abs(windows[full] - median[full, None]), axis=1)
+    if count > 1:
+        median[partial] = np.nanmedian(windows[partial], axis=1)
+        if spread:
+            mad[partial] = np.nanmedian(np.abs(windows[partial] - median[partial, None]), axis=1)
+    return median, 1.4826 * mad, history
+
+
+def score_posts(columns, window=VIRAL_WINDOW, min_history=VIRAL_MIN_HISTORY):
+    """
+    Per-post likes and comments relative to the profile's trailing median, in
+    timestamp order. Posts with fewer than `min_history` earlier posts get NaN
+    scores, since their baseline would be noise.
+    """
+    order = np.argsort(columns['ts'], kind='stable')
+    likes = columns['likes'][order].astype(np.float64)
+    comments = columns['comments'][order].astype(np.float64)
+    likes_median, likes_spread, history = trailing_baseline(likes, window)
+    comments_median, _, _ = trailing_baseline(comments, window, spread=False)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        likes_ratio = likes / np.maximum(likes_median, 1)
+        comments_ratio = comments / np.maximum(comments_median, 1)
+        likes_z = np.where(likes_spread > 0, (likes - likes_median) / likes_spread, np.nan)
+    too_early = history < min_history
+    for column in (likes_ratio, comments_ratio, likes_z):
+        column[too_early] = np.nan
+    return {
+        'id': columns['post_id'][order],
+        'timestamp': columns['timestamp'][order],
+        'likes': likes,
+        'comments': comments,
+        'baseline_likes': likes_median,
+        'baseline_comments': comments_median,
+        'likes_ratio': likes_ratio,
+        'comments_ratio': comments_ratio,
+        'likes_z': likes_z,
+        'score': np.fmax(likes_ratio, comments_ratio),
+    }
+
+
+def _round(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+class ViralIndex:
+    """
+    Breakout posts across every profile under LOCAL_PROFILE_DIR: posts whose
+    likes or comments reach VIRAL_RATIO_THRESHOLD times the median of the
+    profile's previous VIRAL_WINDOW posts.
+
+    Profiles are re-scored only when their posts.json mtime or size changes.
+    A profile is scored in one vectorized pass over its feature store columns.
+    """
+
+    def __init__(self, index_file=VIRAL_INDEX_FILE, profile_dir=LOCAL_PROFILE_DIR,
+                 threshold=VIRAL_RATIO_THRESHOLD):
+        self.index_file = index_file
+        self.profile_dir = profile_dir
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.profiles = {}  # username -> {'mtime', 'size', 'scored', 'baseline_likes', 'viral': [[FIELDS...]]}
+        self.last_refresh = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            self.profiles = data.get('profiles', {}) if data.get('threshold') == self.threshold else {}
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.profiles = {}
+
+    def save(self):
+        # Every worker keeps its own index and saves it; the last save wins
+        with atomic_write(self.index_file, 'w', encoding='utf-8') as file:
+            json.dump({'threshold': self.threshold, 'profiles': self.profiles}, file)
+
+    def update_profile(self, username, save=True):
+        """Re-score one profile if its posts.json changed. Returns True if the index changed."""
+        folder = profile_layout.profile_dir(username, self.profile_dir)
+        posts_path = folder / 'posts.json'
+        if not posts_path.exists():
+            with self.lock:
+                if self.profiles.pop(username, None) is None:
+                    return False
+                if save:
+                    self.save()
+            return True
+        stat = posts_path.stat()
+        entry = self.profiles.get(username)
+        if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+            return False
+        store = FeatureStore(folder)
+        try:
+            store.sync()
+        except json.JSONDecodeError:
+            print(f"Skipping {posts_path}: invalid JSON")
+            return False
+        scores = score_posts(store.columns)
+        viral = np.flatnonzero(scores['score'] >= self.threshold)
+        entry = {
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'scored': int(np.count_nonzero(~np.isnan(scores['score']))),
+            # Baseline the next post will be measured against
+            'baseline_likes': _round(np.median(scores['likes'][-VIRAL_WINDOW:])) if len(store) else None,
+            'viral': [[str(scores['id'][i]), str(scores['timestamp'][i]), int(scores['likes'][i]),
+                       int(scores['comments'][i])] + [_round(scores[name][i]) for name in FIELDS[4:]]
+                      for i in viral],
+        }
+        with self.lock:
+            self.profiles[username] = entry
+            if save:
+                self.save()
+        return True
+
+    @timed('viral_index_refresh')
+    def refresh(self, force=False):
+        """Pick up added, changed and deleted profiles (throttled unless forced)."""
+        if not force and time.time() - self.last_refresh < VIRAL_INDEX_REFRESH_SECONDS:
+            return 0
+        self.last_refresh = time.time()
+        usernames = set(self.profiles) | set(profile_layout.list_usernames(self.profile_dir))
+        changed = sum(self.update_profile(username, save=False) for username in usernames)
+        if changed:
+            with self.lock:
+                self.save()
+            print(f"Viral index updated for {changed} profiles.")
+        return changed
+
+    def profile(self, username):
+        """Scoring summary and viral posts (newest first) for one profile, or None if it is unknown."""
+        with self.lock:
+            entry = self.profiles.get(username)
+            if entry is None:
+                return None
+            posts = [dict(zip(FIELDS, row)) for row in reversed(entry['viral'])]
+        return {'username': username, 'posts_scored': entry['scored'], 'baseline_likes': entry['baseline_likes'],
+                'threshold': self.threshold, 'viral_posts': posts}
+
+    def top(self, limit=20, since=None, min_score=None):
+        """The highest-scoring viral posts across all profiles, optionally posted at or after `since`."""
+        with self.lock:
+            rows = [(username, row) for username, entry in self.profiles.items() for row in entry['viral']
+                    if (since is None or row[1] >= since) and (min_score is None or row[-1] >= min_score)]
+        rows.sort(key=lambda item: item[1][-1], reverse=True)
+        return [{'username': username, **dict(zip(FIELDS, row))} for username, row in rows[:limit]]